@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para medir o request inteiro (inclusive sessão e autenticação)
+    'gestao.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,13 +78,131 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# O perfil vem de GESTAO_DB: 'sqlite' (padrão) ou 'postgres'. Nos dois, as
+# conexões são reaproveitadas entre requests por GESTAO_DB_CONN_MAX_AGE
+# segundos, com health check antes de reusar. Veja gestao/banco.py.
+# No ASGI (config/asgi.py) o ORM async usa uma thread por request e a conexão
+# não é reaproveitada: lá use GESTAO_DB_CONN_MAX_AGE=0 (ou o pool do PostgreSQL).
+
+GESTAO_DB = os.environ.get('GESTAO_DB', 'sqlite')
+GESTAO_DB_CONN_MAX_AGE = int(os.environ.get('GESTAO_DB_CONN_MAX_AGE', '60'))
+
+if GESTAO_DB == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('GESTAO_DB_NAME', 'gestao'),
+            'USER': os.environ.get('GESTAO_DB_USER', ''),
+            'PASSWORD': os.environ.get('GESTAO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('GESTAO_DB_HOST', ''),
+            'PORT': os.environ.get('GESTAO_DB_PORT', ''),
+            'CONN_MAX_AGE': GESTAO_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('GESTAO_DB_POOL') == '1':
+        # Pool do psycopg 3 (pip install "psycopg[pool]"); o Django exige CONN_MAX_AGE = 0 com pool
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {'min_size': 2, 'max_size': int(os.environ.get('GESTAO_DB_POOL_MAX', '10'))},
+        }
+elif GESTAO_DB == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('GESTAO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': GESTAO_DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Pega a trava de escrita no BEGIN: quem chega depois espera o busy_timeout
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'GESTAO_DB deve ser "sqlite" ou "postgres", não {GESTAO_DB!r}.')
+
+# Os PRAGMAs de cada conexão SQLite nova ficam em gestao.banco.PRAGMAS_PADRAO;
+# para mudar algum, defina aqui GESTAO_SQLITE_PRAGMAS só com as chaves novas
+# (ex.: {'busy_timeout': 5000}).
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Por padrão, cache em memória local. Para compartilhar entre processos na
+# mesma máquina, defina GESTAO_CACHE_DIR e o cache passa a ser em arquivos.
+
+if os.environ.get('GESTAO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['GESTAO_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Por quanto tempo (segundos) os fragmentos da dashboard ficam no cache.
+# A invalidação é por versão, então isso só limita o uso de memória/disco.
+GESTAO_DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# Métricas por view (gestao.metricas): 'manage.py metricas' ou /metricas/ (staff).
+# Requests acima dos limites são logados em 'gestao.metricas' com as queries
+# repetidas. Use None num limite para desligá-lo. O limite de queries vale
+# para as views de leitura; as que escrevem (saldos, registro, resumos)
+# têm o próprio, com folga sobre o que os testes medem.
+GESTAO_METRICAS = {
+    'ATIVO': os.environ.get('GESTAO_METRICAS', '1') != '0',
+    'LIMITE_QUERIES': 15,
+    'LIMITES_QUERIES_POR_VIEW': {
+        'gestao:conta_nova': 30,
+        'gestao:remover_morador': 30,
+        'usuario_delete': 30,
+        'gestao:marcar_pago': 25,
+        'gestao:confirmar_pagamento': 25,
+        'gestao:confirmar_pagamentos': 25,
+        'gestao:rejeitar_pagamento': 25,
+        'gestao:rejeitar_pagamentos': 25,
+        'gestao:conta_delete': 25,
+        'gestao:confirmar_acerto': 25,
+    },
+    'LIMITE_TEMPO_MS': 1000,
+    'INTERVALO_SNAPSHOT': 10,
+    'ESTRITO': False,
+}
+
+# Notificações ao vivo da dashboard (gestao.eventos). Com vários workers,
+# ligue a outbox (GESTAO_EVENTOS_OUTBOX=1) para todos verem os mesmos eventos.
+GESTAO_EVENTOS = {
+    'OUTBOX': os.environ.get('GESTAO_EVENTOS_OUTBOX') == '1',
+    'INTERVALO_OUTBOX': 1.0,
+    'HEARTBEAT': 15.0,
+    'RETENCAO_HORAS': 24,
+    'EMAIL': True,
 }
 
+# Fila de tarefas em segundo plano (gestao.tarefas), consumida por
+# 'manage.py run_workers'. Sem workers rodando, os emails não saem e os
+# relatórios mensais não são atualizados.
+GESTAO_TAREFAS = {
+    'LOTE': 50,
+    'INTERVALO': 1.0,
+    'MAX_TENTATIVAS': 5,
+    'ESPERA_BASE': 10,
+    'ESPERA_MAXIMA': 60 * 60,
+    'TIMEOUT_TRAVADA': 10 * 60,
+    'INTERVALO_MANUTENCAO': 5 * 60,
+    'RETENCAO_HORAS': 72,
+}
+
+# Emails das notificações. Sem GESTAO_EMAIL_BACKEND, eles só aparecem no console.
+EMAIL_BACKEND = os.environ.get('GESTAO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('GESTAO_EMAIL_REMETENTE', 'republica@localhost')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,143 @@
+"""
+Acerto de contas: as transferências que zeram o saldo de todo mundo na
+república, no lugar de cada um pagar cada conta para cada responsável.
+
+O saldo líquido de cada morador já está pronto em SaldoMorador
+(total_a_receber - total_devido, mantido por gestao.saldos), então o plano
+sai de UMA leitura pequena, uma linha por morador com saldo, e não das
+participações. A partir dele:
+
+1. quem tem a receber exatamente o que outro deve recebe dele numa
+   transferência só (cada par desses economiza uma transferência);
+2. o resto é casado guloso: o maior devedor paga ao maior credor o menor
+   dos dois valores, e quem sobrar volta para a fila (heaps).
+
+Achar o MÍNIMO de transferências é NP-difícil (é achar o maior número de
+subgrupos que somam zero); o guloso nunca passa de N - 1 transferências
+para N moradores com saldo e, na prática, fica perto do mínimo. Os
+valores são contados em centavos (int), então o plano fecha exato.
+
+O plano fica em cache por república. Quem muda saldos ('saldos.registrar',
+'saldos.reconstruir') chama 'invalidar'; a 'assinatura' do plano (um hash
+dos saldos) é o que o ADM confirma ('transicoes.quitar_acerto'), então um
+plano velho nunca quita nada: se os saldos mudaram, a assinatura não bate.
+"""
+import hashlib
+import heapq
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import SaldoMorador
+
+TIMEOUT = 60 * 60 # A invalidação é explícita; isso só limita o uso do cache
+
+Transferencia = namedtuple('Transferencia', 'de_id de para_id para valor')
+Plano = namedtuple('Plano', 'transferencias assinatura')
+
+
+def transferencias(saldos):
+    """
+    Recebe {usuario_id: centavos} (positivo = a receber, negativo = deve) e
+    retorna [(de, para, centavos)]. A ordem de desempate é pelo id, então o
+    mesmo saldo dá sempre o mesmo plano.
+    """
+    credores = {}
+    for usuario_id, valor in sorted(saldos.items()):
+        if valor > 0:
+            credores.setdefault(valor, []).append(usuario_id)
+
+    resultado = []
+    devedores = []
+    for usuario_id, valor in sorted(saldos.items()):
+        if valor >= 0:
+            continue
+        mesmos = credores.get(-valor)
+        if mesmos:
+            resultado.append((usuario_id, mesmos.pop(0), -valor))
+        else:
+            devedores.append((valor, usuario_id)) # heap de mínimo: o maior devedor sai primeiro
+    heapq.heapify(devedores)
+    credores = [(-valor, usuario_id) for valor, ids in credores.items() for usuario_id in ids]
+    heapq.heapify(credores)
+
+    while devedores and credores:
+        devido, devedor = heapq.heappop(devedores)
+        a_receber, credor = heapq.heappop(credores)
+        valor = min(-devido, -a_receber)
+        resultado.append((devedor, credor, valor))
+        if devido + valor:
+            heapq.heappush(devedores, (devido + valor, devedor))
+        if a_receber + valor:
+            heapq.heappush(credores, (a_receber + valor, credor))
+    return resultado
+
+
+def assinar(saldos):
+    """ Identifica um conjunto de saldos; o plano confirmado tem que ter a mesma. """
+    texto = ';'.join(f'{usuario_id}:{valor}' for usuario_id, valor in sorted(saldos.items()))
+    return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+
+def _consulta(republica_id):
+    return SaldoMorador.objects.filter(republica_id=republica_id).exclude(
+        total_devido=F('total_a_receber'),
+    ).values_list('usuario_id', 'usuario__username', 'total_devido', 'total_a_receber')
+
+
+def _montar(linhas):
+    saldos = {}
+    nomes = {}
+    for usuario_id, username, devido, a_receber in linhas:
+        saldos[usuario_id] = int((a_receber - devido) * 100)
+        nomes[usuario_id] = username
+    return Plano(
+        [
+            Transferencia(de, nomes[de], para, nomes[para], Decimal(valor).scaleb(-2))
+            for de, para, valor in transferencias(saldos)
+        ],
+        assinar(saldos),
+    )
+
+
+def calcular(republica_id, travar=False):
+    """ O plano a partir do banco, sem cache. 'travar' trava os saldos (SELECT ... FOR UPDATE). """
+    consulta = _consulta(republica_id)
+    if travar:
+        consulta = consulta.select_for_update()
+    return _montar(consulta)
+
+
+def _chave(republica_id):
+    return f'gestao:acerto:{republica_id}'
+
+
+def plano(republica_id):
+    """ O plano de acerto da república: do cache ou do banco (uma query). """
+    guardado = cache.get(_chave(republica_id))
+    if guardado is None:
+        guardado = calcular(republica_id)
+        cache.set(_chave(republica_id), guardado, TIMEOUT)
+    return guardado
+
+
+async def aplano(republica_id):
+    guardado = await cache.aget(_chave(republica_id))
+    if guardado is None:
+        guardado = _montar([linha async for linha in _consulta(republica_id)])
+        await cache.aset(_chave(republica_id), guardado, TIMEOUT)
+    return guardado
+
+
+def invalidar(republica_ids):
+    """
+    Tira do cache o plano dessas repúblicas. Apaga já e de novo depois do
+    commit: quem recalcular no meio ainda lia os saldos antigos.
+    """
+    chaves = [_chave(republica_id) for republica_id in set(republica_ids)]
+    if chaves:
+        cache.delete_many(chaves)
+        transaction.on_commit(lambda: cache.delete_many(chaves))
@@ -2,7 +2,10 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Republica, Conta, ParticipanteConta
+from .models import (
+    Usuario, Republica, Conta, ContaRecorrente, ParticipanteConta, Saldo, SaldoMorador,
+    ContaArquivada, ParticipanteArquivado, EventoTransicao,
+)
 
 # Para mostrar campos customizados do nosso Usuario no admin
 class CustomUserAdmin(UserAdmin):
@@ -19,15 +22,61 @@ class RepublicaAdmin(admin.ModelAdmin):
 
 @admin.register(Conta)
 class ContaAdmin(admin.ModelAdmin):
-    list_display = ('nome_conta', 'republica', 'valor_total', 'data_vencimento', 'status_conta')
+    list_display = ('nome_conta', 'republica', 'valor_total', 'data_vencimento', 'status_conta', 'qtd_pagos', 'qtd_nao_pagos')
     list_filter = ('status_conta', 'republica', 'tipo')
     search_fields = ('nome_conta',)
 
+@admin.register(ContaRecorrente)
+class ContaRecorrenteAdmin(admin.ModelAdmin):
+    list_display = ('nome_conta', 'republica', 'valor_total', 'dia_vencimento', 'ativa')
+    list_filter = ('ativa', 'republica')
+    search_fields = ('nome_conta',)
+    filter_horizontal = ('participantes',)
+
 @admin.register(ParticipanteConta)
 class ParticipanteContaAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'conta', 'valor_individual', 'status_pagamento')
     list_filter = ('status_pagamento',)
     search_fields = ('usuario__username', 'conta__nome_conta')
 
+@admin.register(Saldo)
+class SaldoAdmin(admin.ModelAdmin):
+    list_display = ('devedor', 'credor', 'republica', 'valor_devido', 'valor_em_confirmacao')
+    list_filter = ('republica',)
+    search_fields = ('devedor__username', 'credor__username')
+
+@admin.register(SaldoMorador)
+class SaldoMoradorAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'republica', 'total_devido', 'total_a_receber')
+    list_filter = ('republica',)
+    search_fields = ('usuario__username',)
+
+@admin.register(ContaArquivada)
+class ContaArquivadaAdmin(admin.ModelAdmin):
+    list_display = ('nome_conta', 'republica', 'valor_total', 'data_vencimento', 'quitada_em', 'arquivada_em')
+    list_filter = ('republica',)
+    search_fields = ('nome_conta',)
+
+@admin.register(ParticipanteArquivado)
+class ParticipanteArquivadoAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'conta', 'valor_individual')
+    search_fields = ('usuario__username', 'conta__nome_conta')
+
+@admin.register(EventoTransicao)
+class EventoTransicaoAdmin(admin.ModelAdmin):
+    # Só leitura: o registro de transições não se edita nem se apaga
+    list_display = ('id', 'tipo', 'de', 'para', 'republica_id', 'usuario_id', 'participacao_id', 'valor', 'ator_id', 'criado_em')
+    list_filter = ('tipo',)
+    search_fields = ('=usuario_id', '=participacao_id', '=republica_id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Desregistra o UserAdmin padrão e registra o nosso customizado
 admin.site.register(Usuario, CustomUserAdmin)
\ No newline at end of file
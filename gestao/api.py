@@ -0,0 +1,206 @@
+"""
+Dados da dashboard em JSON (para os clientes mobile).
+
+Cada seção devolve só os campos usados pelos clientes, com nomes curtos,
+e as listas que crescem sem limite (pendências e confirmações) são
+paginadas por cursor (gestao.paginacao).
+"""
+import hashlib
+
+from . import acerto
+from .dashboard import ORDEM_PENDENCIAS
+from .models import ParticipanteConta, Republica, Usuario
+from .paginacao import apaginar, paginar
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+ORDEM_CONFIRMACOES = ('conta__data_vencimento', 'id')
+
+
+def etag(request):
+    """
+    ETag forte derivada da versão dos dados do usuário (Usuario.versao_dados)
+    e dos parâmetros da URL. Não faz nenhuma query: 'request.user' já está
+    carregado, então um cliente que faz polling recebe 304 sem tocar nas
+    tabelas de participação.
+    """
+    user = request.user
+    consulta = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:12]
+    return f'"{user.pk}-{user.versao_dados}-{consulta}"'
+
+
+def _pendencia(linha):
+    return {
+        'id': linha['id'],
+        'conta_id': linha['conta_id'],
+        'conta': linha['conta__nome_conta'],
+        'valor_total': linha['conta__valor_total'],
+        'valor': linha['valor_individual'],
+        'vencimento': linha['conta__data_vencimento'],
+        'status': linha['status_pagamento'],
+        'versao': linha['versao'],
+        'responsavel_id': linha['conta__responsavel_id'],
+    }
+
+
+def _confirmacao(linha):
+    return {
+        'id': linha['id'],
+        'conta_id': linha['conta_id'],
+        'conta': linha['conta__nome_conta'],
+        'vencimento': linha['conta__data_vencimento'],
+        'valor': linha['valor_individual'],
+        'versao': linha['versao'],
+        'usuario_id': linha['usuario_id'],
+        'usuario': linha['usuario__username'],
+    }
+
+
+def _consulta_pendencias(user):
+    return ParticipanteConta.objects.filter(usuario=user).values(
+        'id', 'conta_id', 'conta__nome_conta', 'conta__valor_total', 'valor_individual',
+        'conta__data_vencimento', 'status_pagamento', 'versao', 'conta__responsavel_id',
+    )
+
+
+def _consulta_confirmacoes(user):
+    return ParticipanteConta.objects.filter(
+        status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        conta__responsavel=user,
+    ).values(
+        'id', 'conta_id', 'conta__nome_conta', 'conta__data_vencimento',
+        'valor_individual', 'versao', 'usuario_id', 'usuario__username',
+    )
+
+
+def _consulta_membros(user):
+    return Usuario.objects.filter(
+        republica_id=user.republica_id,
+        status_associacao__in=[
+            Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            Usuario.StatusAssociacao.APROVADO,
+        ]
+    ).order_by('username').values('id', 'username', 'apelido', 'status_associacao')
+
+
+def _separar_membros(linhas):
+    moradores = []
+    solicitacoes = []
+    for linha in linhas:
+        item = {'id': linha['id'], 'username': linha['username'], 'apelido': linha['apelido']}
+        if linha['status_associacao'] == Usuario.StatusAssociacao.APROVADO:
+            moradores.append(item)
+        else:
+            solicitacoes.append(item)
+    return moradores, solicitacoes
+
+
+def _acerto(plano):
+    return {
+        'transferencias': [
+            {
+                'de': {'id': transferencia.de_id, 'username': transferencia.de},
+                'para': {'id': transferencia.para_id, 'username': transferencia.para},
+                'valor': transferencia.valor,
+            }
+            for transferencia in plano.transferencias
+        ],
+        'assinatura': plano.assinatura,
+    }
+
+
+def _eh_adm(user):
+    return Republica.objects.filter(pk=user.republica_id, adm=user)
+
+
+def pendencias(user, cursor=None, limite=LIMITE_PADRAO):
+    pagina = paginar(_consulta_pendencias(user), ORDEM_PENDENCIAS, cursor, limite)
+    return {'itens': [_pendencia(linha) for linha in pagina], 'proximo': pagina.proximo}
+
+
+def confirmacoes(user, cursor=None, limite=LIMITE_PADRAO):
+    pagina = paginar(_consulta_confirmacoes(user), ORDEM_CONFIRMACOES, cursor, limite)
+    return {'itens': [_confirmacao(linha) for linha in pagina], 'proximo': pagina.proximo}
+
+
+def membros(user):
+    """ Moradores e solicitações de entrada; só o ADM recebe. """
+    if not (user.republica_id and _eh_adm(user).exists()):
+        return None, None
+    return _separar_membros(_consulta_membros(user))
+
+
+def plano_de_acerto(user):
+    """ As transferências que zeram os saldos da república (gestao.acerto). """
+    return _acerto(acerto.plano(user.republica_id))
+
+
+SECOES = {
+    'pendencias': pendencias,
+    'confirmacoes': confirmacoes,
+}
+
+
+def _dados(user, pendencias, confirmacoes, moradores, solicitacoes):
+    dados = {
+        'usuario': {
+            'id': user.pk,
+            'username': user.username,
+            'republica_id': user.republica_id,
+            'status_associacao': user.status_associacao,
+        },
+        'pendencias': pendencias,
+        'confirmacoes': confirmacoes,
+    }
+    if moradores is not None:
+        dados['moradores'] = moradores
+        dados['solicitacoes'] = solicitacoes
+    return dados
+
+
+def dashboard(user, limite=LIMITE_PADRAO):
+    """ Primeira página de tudo que a dashboard mostra. """
+    moradores, solicitacoes = membros(user)
+    return _dados(
+        user, pendencias(user, limite=limite), confirmacoes(user, limite=limite), moradores, solicitacoes,
+    )
+
+
+# Versões async (DashboardApiView): mesmas queries, pelo ORM async
+
+async def apendencias(user, cursor=None, limite=LIMITE_PADRAO):
+    pagina = await apaginar(_consulta_pendencias(user), ORDEM_PENDENCIAS, cursor, limite)
+    return {'itens': [_pendencia(linha) for linha in pagina], 'proximo': pagina.proximo}
+
+
+async def aconfirmacoes(user, cursor=None, limite=LIMITE_PADRAO):
+    pagina = await apaginar(_consulta_confirmacoes(user), ORDEM_CONFIRMACOES, cursor, limite)
+    return {'itens': [_confirmacao(linha) for linha in pagina], 'proximo': pagina.proximo}
+
+
+async def amembros(user):
+    if not (user.republica_id and await _eh_adm(user).aexists()):
+        return None, None
+    return _separar_membros([linha async for linha in _consulta_membros(user)])
+
+
+async def aplano_de_acerto(user):
+    return _acerto(await acerto.aplano(user.republica_id))
+
+
+ASECOES = {
+    'pendencias': apendencias,
+    'confirmacoes': aconfirmacoes,
+}
+
+
+async def adashboard(user, limite=LIMITE_PADRAO):
+    """
+    'dashboard' para views async, seção por seção: as queries do ORM async
+    rodam todas na mesma thread (thread_sensitive), então não há o que juntar.
+    """
+    moradores, solicitacoes = await amembros(user)
+    pendentes = await apendencias(user, limite=limite)
+    confirmar = await aconfirmacoes(user, limite=limite)
+    return _dados(user, pendentes, confirmar, moradores, solicitacoes)
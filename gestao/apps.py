@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GestaoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestao'
+
+    def ready(self):
+        # Mantém o índice de busca (gestao.busca) sincronizado e ajusta as conexões (gestao.banco)
+        from . import signals  # noqa: F401
@@ -0,0 +1,107 @@
+"""
+Arquivo de contas quitadas (comando 'manage.py arquivar_contas').
+
+Contas PAGAS há mais de N meses saem de Conta/ParticipanteConta e vão para
+ContaArquivada/ParticipanteArquivado, em lotes, cada um na sua transação.
+Assim as tabelas que a dashboard consulta só crescem com o que ainda está
+em aberto (ou foi pago há pouco). Conta paga não entra nos saldos, então
+arquivar não mexe em 'gestao.saldos'; cada participação que sai ganha no
+registro ('gestao.auditoria') um evento para "não existe", e o replay não
+conta mais com ela.
+
+O histórico completo só é lido quando o usuário pede ('historico').
+"""
+import calendar
+
+from django.db import transaction
+
+from . import auditoria, cache
+from .models import Conta, ContaArquivada, ParticipanteArquivado, ParticipanteConta
+from .paginacao import Pagina, codificar, paginar
+
+# Mais recentes primeiro. 'conta_id' é o mesmo nas duas tabelas (a conta
+# arquivada guarda o id original) e um usuário só participa uma vez de cada conta.
+ORDEM_HISTORICO = ('-conta__data_vencimento', '-conta_id')
+
+
+def meses_atras(agora, meses):
+    """ A mesma data/hora 'meses' meses antes (o dia é ajustado no fim do mês). """
+    total = agora.year * 12 + agora.month - 1 - meses
+    ano, mes = divmod(total, 12)
+    mes += 1
+    dia = min(agora.day, calendar.monthrange(ano, mes)[1])
+    return agora.replace(year=ano, month=mes, day=dia)
+
+
+def candidatas(quitadas_antes_de):
+    return Conta.objects.filter(status_conta=Conta.StatusConta.PAGA, quitada_em__lt=quitadas_antes_de)
+
+
+def arquivar(quitadas_antes_de, lote=500):
+    """ Move as contas quitadas antes da data. Retorna quantas foram arquivadas. """
+    arquivadas = 0
+    while True:
+        with transaction.atomic():
+            contas = list(candidatas(quitadas_antes_de).select_for_update().order_by('pk')[:lote])
+            if not contas:
+                break
+            ids = [conta.pk for conta in contas]
+            participacoes = list(ParticipanteConta.objects.filter(conta_id__in=ids))
+
+            ContaArquivada.objects.bulk_create([
+                ContaArquivada(
+                    id=conta.pk, republica_id=conta.republica_id, nome_conta=conta.nome_conta,
+                    valor_total=conta.valor_total, data_vencimento=conta.data_vencimento, tipo=conta.tipo,
+                    responsavel_id=conta.responsavel_id, recorrencia_id=conta.recorrencia_id,
+                    competencia=conta.competencia, quitada_em=conta.quitada_em,
+                )
+                for conta in contas
+            ])
+            ParticipanteArquivado.objects.bulk_create([
+                ParticipanteArquivado(
+                    conta_id=participacao.conta_id, usuario_id=participacao.usuario_id,
+                    valor_individual=participacao.valor_individual,
+                )
+                for participacao in participacoes
+            ], batch_size=500)
+
+            por_id = {conta.pk: conta for conta in contas}
+            auditoria.registrar(
+                auditoria.pagamento(
+                    participacao.pk, participacao.conta_id, por_id[participacao.conta_id].republica_id,
+                    participacao.usuario_id, por_id[participacao.conta_id].responsavel_id,
+                    participacao.valor_individual, participacao.status_pagamento, None,
+                )
+                for participacao in participacoes
+            )
+            ParticipanteConta.objects.filter(conta_id__in=ids).delete()
+            Conta.objects.filter(pk__in=ids).delete()
+            # As contas somem da lista de pendências de quem participava
+            cache.invalidar_usuarios(participacao.usuario_id for participacao in participacoes)
+        arquivadas += len(contas)
+    return arquivadas
+
+
+def historico(user, cursor=None, limite=20):
+    """
+    Todas as participações do usuário, das tabelas do dia a dia e do arquivo,
+    intercaladas por vencimento (mais recentes primeiro) e paginadas por cursor.
+    Cada tabela é lida com o mesmo cursor e no máximo 'limite' + 1 linhas.
+    """
+    recentes = paginar(
+        ParticipanteConta.objects.filter(usuario=user).select_related('conta'), ORDEM_HISTORICO, cursor, limite,
+    )
+    arquivadas = paginar(
+        ParticipanteArquivado.objects.filter(usuario=user).select_related('conta'), ORDEM_HISTORICO, cursor, limite,
+    )
+
+    def chave(participacao):
+        return participacao.conta.data_vencimento, participacao.conta_id
+
+    itens = sorted([*recentes, *arquivadas], key=chave, reverse=True)
+    proximo = None
+    if len(itens) > limite or recentes.proximo or arquivadas.proximo:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        proximo = codificar([ultimo.conta.data_vencimento, ultimo.conta_id])
+    return Pagina(itens, proximo)
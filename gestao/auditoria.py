@@ -0,0 +1,181 @@
+"""
+Registro das transições (EventoTransicao) e replay a partir dele.
+
+'status_pagamento' e 'status_associacao' são sobrescritos a cada mudança;
+o registro guarda o caminho até ali. Quem muda um status grava o evento na
+MESMA transação ('registrar', ao lado de 'saldos.registrar' e de
+'eventos.publicar'), então não há mudança sem evento nem evento de mudança
+desfeita. Os eventos de pagamento levam tudo que os saldos precisam
+(república, devedor, credor, valor, status antes e depois), com códigos
+inteiros: uma linha curta por transição, sem JSON.
+
+'replay' (comando 'manage.py replay_eventos') refaz a partir do registro o
+que é derivado dele:
+
+1. lê os eventos de pagamento em ordem de (participação, id), em pedaços
+   ('iterator'), e fica só com o último de cada participação: o estado
+   final. A memória não cresce com o tamanho do registro;
+2. corrige status_pagamento das participações que divergem do registro;
+3. regrava Saldo e SaldoMorador ('saldos.gravar') com a soma dos estados
+   finais;
+4. recalcula o resumo das contas ('Conta.atualizar_resumo', em lotes) e os
+   relatórios mensais ('relatorios.reconstruir').
+
+A leitura (passo 1) não abre transação; cada escrita depois dela é
+commitada por lote (correções e resumos de LOTE em LOTE, os saldos e os
+relatórios numa transação cada), então o lock de escrita do SQLite fica
+preso por um lote de cada vez, não pelo replay inteiro. Se o replay parar no
+meio, basta rodar de novo: cada passo recalcula do registro, sem somar ao
+que já estava lá.
+
+Contas arquivadas ('gestao.arquivo') ficam fora do replay: o arquivamento
+grava para cada participação um evento de PAGO para INEXISTENTE, e o
+arquivo (ContaArquivada/ParticipanteArquivado) não é recalculado daqui.
+
+Assim, as tabelas derivadas podem ser apagadas e recalculadas em vez de
+migradas. Rode com o app parado: uma transição no meio do replay pode ser
+sobrescrita pelos saldos que ele grava no fim.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from . import saldos
+from .models import Conta, EventoTransicao, ParticipanteConta
+
+LOTE = 2000
+
+Estado = EventoTransicao.Estado
+
+# status do banco (texto) -> código do registro; None é "não existe"
+CODIGOS = {None: Estado.INEXISTENTE, **{estado.name: estado.value for estado in Estado if estado.value}}
+STATUS = {codigo: status for status, codigo in CODIGOS.items()}
+
+
+def pagamento(participacao_id, conta_id, republica_id, usuario_id, responsavel_id, valor, de, para):
+    """ O evento de uma participação indo do status 'de' para 'para' (None = criação/exclusão). """
+    return EventoTransicao(
+        tipo=EventoTransicao.Tipo.PAGAMENTO, de=CODIGOS[de], para=CODIGOS[para],
+        republica_id=republica_id, usuario_id=usuario_id, participacao_id=participacao_id,
+        conta_id=conta_id, responsavel_id=responsavel_id, valor=valor,
+    )
+
+
+def de_participacao(participacao, de, para):
+    """ 'pagamento' a partir da instância (com a conta carregada), como 'saldos.movimento'. """
+    conta = participacao.conta
+    return pagamento(
+        participacao.pk, participacao.conta_id, conta.republica_id, participacao.usuario_id,
+        conta.responsavel_id, participacao.valor_individual, de, para,
+    )
+
+
+def membresia(usuario_id, republica_id, de, para):
+    """ O evento de um usuário mudando de status na república (None = conta apagada). """
+    return EventoTransicao(
+        tipo=EventoTransicao.Tipo.MEMBRESIA, de=CODIGOS[de], para=CODIGOS[para],
+        republica_id=republica_id, usuario_id=usuario_id,
+    )
+
+
+def registrar(eventos, ator_id=None):
+    """ Grava os eventos na transação atual (um INSERT por lote). 'ator_id' é quem fez a mudança. """
+    eventos = list(eventos)
+    for evento in eventos:
+        evento.ator_id = ator_id
+    EventoTransicao.objects.bulk_create(eventos, batch_size=LOTE)
+
+
+def estados_finais(lote=LOTE):
+    """
+    O último evento de cada participação, na ordem dos ids das participações:
+    (participacao_id, conta_id, republica_id, usuario_id, responsavel_id, valor, status).
+    """
+    linhas = EventoTransicao.objects.filter(tipo=EventoTransicao.Tipo.PAGAMENTO).order_by(
+        'participacao_id', 'id',
+    ).values_list(
+        'participacao_id', 'conta_id', 'republica_id', 'usuario_id', 'responsavel_id', 'valor', 'para',
+    ).iterator(chunk_size=lote)
+    for _, eventos in groupby(linhas, key=lambda linha: linha[0]):
+        *_, ultimo = eventos
+        yield (*ultimo[:-1], STATUS[ultimo[-1]])
+
+
+class RegistroIncompleto(Exception):
+    """ Há participações sem nenhum evento: o replay apagaria a parte delas nos saldos. """
+
+
+def _processar(pedaco, pares, divergentes, resultado):
+    """
+    Soma nos saldos os estados finais do pedaço cujas participações ainda
+    existem (as arquivadas e as apagadas ficam de fora) e junta em
+    'divergentes' ({status: [ids]}) as que diferem do registro.
+    """
+    finais = {estado[0]: estado for estado in pedaco}
+    for pk, status in ParticipanteConta.objects.filter(pk__in=finais).values_list('pk', 'status_pagamento'):
+        _, _, republica_id, devedor_id, credor_id, valor, esperado = finais[pk]
+        resultado['participacoes'] += 1
+        if esperado is None:
+            # O registro diz que ela foi apagada; a linha é que está sobrando
+            resultado['divergentes'] += 1
+            continue
+        if status != esperado:
+            divergentes[esperado].append(pk)
+        if devedor_id != credor_id:
+            devido, em_confirmacao = saldos.contribuicao(esperado, valor)
+            par = pares[(republica_id, devedor_id, credor_id)]
+            par[0] += devido
+            par[1] += em_confirmacao
+
+
+def replay(lote=LOTE, dry_run=False):
+    """
+    Refaz saldos, resumos das contas e relatórios a partir do registro (veja
+    o docstring do módulo). Com 'dry_run', só conta o que mudaria. Retorna
+    {'eventos', 'participacoes', 'divergentes', 'pares', 'contas', 'meses'}.
+    Levanta RegistroIncompleto se alguma participação não tem evento.
+    """
+    # Import tardio: relatorios -> recorrencia -> importacao, que registra eventos daqui
+    from . import relatorios
+
+    resultado = dict.fromkeys(['eventos', 'participacoes', 'divergentes', 'pares', 'contas', 'meses'], 0)
+    resultado['eventos'] = EventoTransicao.objects.count()
+    pares = defaultdict(lambda: [saldos.ZERO, saldos.ZERO])
+    divergentes = defaultdict(list)
+
+    pedaco = []
+    for estado in estados_finais(lote):
+        pedaco.append(estado)
+        if len(pedaco) == lote:
+            _processar(pedaco, pares, divergentes, resultado)
+            pedaco = []
+    _processar(pedaco, pares, divergentes, resultado)
+    resultado['divergentes'] += sum(len(ids) for ids in divergentes.values())
+
+    # Antes de escrever qualquer coisa
+    sem_registro = ParticipanteConta.objects.count() - resultado['participacoes']
+    if sem_registro:
+        raise RegistroIncompleto(f'{sem_registro} participações não têm nenhum evento no registro.')
+
+    pares = {chave: valores for chave, valores in pares.items() if any(valores)}
+    resultado['pares'] = len(pares)
+    if dry_run:
+        return resultado
+
+    for status, ids in divergentes.items():
+        for inicio in range(0, len(ids), lote):
+            ParticipanteConta.objects.filter(pk__in=ids[inicio:inicio + lote]).update(status_pagamento=status)
+    saldos.gravar(pares)
+
+    # Os resumos vêm das participações, já iguais ao registro
+    limites = Conta.objects.aggregate(primeira=Min('pk'), ultima=Max('pk'))
+    if limites['primeira'] is not None:
+        for inicio in range(limites['primeira'], limites['ultima'] + 1, lote):
+            with transaction.atomic():
+                ids = list(Conta.objects.filter(pk__gte=inicio, pk__lt=inicio + lote).values_list('pk', flat=True))
+                Conta.atualizar_resumo(ids, relatorios=False)
+            resultado['contas'] += len(ids)
+    resultado['meses'] = relatorios.reconstruir()
+    return resultado
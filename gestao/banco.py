@@ -0,0 +1,219 @@
+"""
+Ajustes do banco de dados.
+
+O perfil (SQLite ou PostgreSQL) é escolhido em config/settings.py pela
+variável de ambiente GESTAO_DB. No SQLite, toda conexão nova recebe os
+PRAGMAs de PRAGMAS_PADRAO, com o que settings.GESTAO_SQLITE_PRAGMAS
+sobrescrever (receiver em gestao.signals):
+
+- journal_mode=WAL: leitores não bloqueiam o escritor, nem o contrário;
+- synchronous=NORMAL: com WAL, só o checkpoint faz fsync (seguro contra
+  queda do processo; numa queda de energia perde no máximo os últimos commits);
+- busy_timeout: quem encontra o banco travado espera em vez de falhar
+  com "database is locked";
+- cache_size / mmap_size: mais páginas em memória.
+
+Junto com 'transaction_mode': 'IMMEDIATE' nas OPTIONS (a transação já começa
+com a trava de escrita, então o busy_timeout vale para ela; numa transação
+DEFERRED que lê e depois escreve, o SQLite devolve "locked" na hora), isso
+acaba com os erros de escrita concorrente.
+
+'medir_concorrencia' (comando 'manage.py benchmark_concorrencia') mede a
+vazão das escritas do app (as transições de pagamento) em paralelo, pelas
+conexões do Django, num banco SQLite temporário, com e sem os ajustes.
+"""
+import copy
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PRAGMAS_PADRAO = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,      # ms
+    'cache_size': -20000,       # negativo = KiB (20 MB)
+    'mmap_size': 134217728,     # 128 MB
+}
+
+
+def pragmas():
+    return {**PRAGMAS_PADRAO, **getattr(settings, 'GESTAO_SQLITE_PRAGMAS', {})}
+
+
+def aplicar_pragmas(cursor, valores):
+    for nome, valor in valores.items():
+        cursor.execute(f'PRAGMA {nome} = {valor}')
+
+
+def configurar_conexao(connection):
+    """
+    Chamado para cada conexão nova (signal connection_created). As conexões
+    do benchmark trazem os PRAGMAs do perfil em settings_dict['PRAGMAS'].
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        aplicar_pragmas(cursor, connection.settings_dict.get('PRAGMAS') or pragmas())
+
+
+# Perfis comparados pelo benchmark: o padrão do Django (journal DELETE,
+# synchronous FULL, BEGIN DEFERRED e o timeout de 5 s do módulo sqlite3) e o
+# deste projeto. None é "o que o projeto usa": pragmas() e as OPTIONS do
+# perfil SQLite em settings.DATABASES.
+PERFIS = {
+    'padrao': {'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'}, 'opcoes': {}},
+    'ajustado': {'pragmas': None, 'opcoes': None},
+}
+
+
+def _conexao(caminho, perfil):
+    """ Uma conexão do Django (sem abrir ainda) com o banco 'caminho' e os ajustes do perfil. """
+    from django.db import DEFAULT_DB_ALIAS, connections
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    projeto = connections.settings[DEFAULT_DB_ALIAS]
+    if projeto['ENGINE'] != 'django.db.backends.sqlite3':
+        raise ImproperlyConfigured('O benchmark de concorrência compara os ajustes do SQLite: use GESTAO_DB=sqlite.')
+    config = PERFIS[perfil]
+    return DatabaseWrapper({
+        **copy.deepcopy(projeto),
+        'NAME': caminho,
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': copy.deepcopy(projeto['OPTIONS'] if config['opcoes'] is None else config['opcoes']),
+        'PRAGMAS': config['pragmas'], # Lido por 'configurar_conexao'
+    })
+
+
+def _na_thread(caminho, perfil, funcao, *args):
+    """
+    Roda 'funcao' com a conexão e o cache padrão da thread apontando para os
+    do benchmark: os ids do banco temporário não podem cair no cache do
+    projeto (a membresia do usuário 1 de lá valeria para o usuário 1 de cá).
+    """
+    from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.db import DEFAULT_DB_ALIAS, connections
+
+    conexao = _conexao(caminho, perfil)
+    connections[DEFAULT_DB_ALIAS] = conexao
+    caches[DEFAULT_CACHE_ALIAS] = LocMemCache(caminho, {}) # Mesmo nome: as threads dividem o cache
+    try:
+        return funcao(*args)
+    finally:
+        conexao.close()
+
+
+def _preparar(escritores):
+    """ As tabelas do projeto e uma conta por escritor: o morador deve ao ADM. """
+    from django.apps import apps
+    from django.db import connection
+
+    from . import saldos
+    from .models import Conta, ParticipanteConta, Republica, Usuario
+
+    with connection.schema_editor() as editor:
+        for modelo in apps.get_models():
+            if modelo._meta.managed and not modelo._meta.proxy:
+                editor.create_model(modelo)
+
+    adm = Usuario.objects.create(username='adm')
+    republica = Republica.objects.create(nome='Benchmark', adm=adm)
+    Usuario.objects.filter(pk=adm.pk).update(republica=republica, status_associacao=Usuario.StatusAssociacao.APROVADO)
+    participacoes = []
+    for numero in range(escritores):
+        morador = Usuario.objects.create(
+            username=f'morador{numero}', republica=republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        conta = Conta.objects.create(
+            republica=republica, nome_conta=f'Conta {numero}', valor_total=10,
+            data_vencimento=date.today(), responsavel=adm,
+        )
+        participacoes.append(ParticipanteConta.objects.create(conta=conta, usuario=morador, valor_individual=10).pk)
+    Conta.atualizar_resumo(Conta.objects.values_list('pk', flat=True))
+    saldos.reconstruir()
+    return adm.pk, participacoes
+
+
+def medir_concorrencia(perfil='ajustado', escritores=8, transacoes=200, leitores=2):
+    """
+    Mede as escritas do app em paralelo num banco SQLite temporário, pelas
+    conexões do Django, com os ajustes do 'perfil'. Cada uma das 'escritores'
+    threads faz 'transacoes' transações numa participação só dela, como as
+    views: lê a participação e marca o pagamento ('transicoes.mudar_pagamento')
+    ou o ADM rejeita ('transicoes.mudar_pagamentos', que lê antes de
+    escrever). 'leitores' threads montam a dashboard do ADM sem parar.
+    Retorna {'commits', 'erros', 'leituras', 'segundos', 'commits_por_segundo'}.
+    """
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.db import OperationalError
+
+    from . import dashboard, transicoes
+    from .models import ParticipanteConta, Usuario
+
+    pasta = tempfile.mkdtemp()
+    caminho = os.path.join(pasta, 'concorrencia.sqlite3')
+    # Numa thread própria, para não mexer na conexão de quem chamou
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        adm_id, participacoes = executor.submit(_na_thread, caminho, perfil, _preparar, escritores).result()
+
+    contagem = {'commits': 0, 'erros': 0, 'leituras': 0}
+    trava = threading.Lock()
+    fim = threading.Event()
+    pendente = ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE
+
+    def escrever(participacao_id):
+        adm = Usuario.objects.get(pk=adm_id)
+        commits = erros = 0
+        for _ in range(transacoes):
+            try:
+                participacao = ParticipanteConta.objects.select_related('conta', 'usuario').get(pk=participacao_id)
+                if participacao.status_pagamento == pendente:
+                    transicoes.mudar_pagamentos(adm, [participacao_id], ParticipanteConta.StatusPagamento.NAO_PAGO)
+                else:
+                    transicoes.mudar_pagamento(
+                        participacao, participacao.status_pagamento, pendente, usuario_id=participacao.usuario_id,
+                    )
+                commits += 1
+            except OperationalError:
+                erros += 1
+        with trava:
+            contagem['commits'] += commits
+            contagem['erros'] += erros
+
+    def ler():
+        adm = Usuario.objects.get(pk=adm_id)
+        leituras = 0
+        while not fim.is_set():
+            try:
+                dashboard.carregar_dashboard(adm)
+                leituras += 1
+            except OperationalError:
+                pass
+        with trava:
+            contagem['leituras'] += leituras
+
+    def thread(funcao, *args):
+        return threading.Thread(target=_na_thread, args=(caminho, perfil, funcao, *args))
+
+    threads_leitura = [thread(ler) for _ in range(leitores)]
+    threads_escrita = [thread(escrever, participacao_id) for participacao_id in participacoes]
+    inicio = time.perf_counter()
+    for t in threads_leitura + threads_escrita:
+        t.start()
+    for t in threads_escrita:
+        t.join()
+    segundos = time.perf_counter() - inicio
+    fim.set()
+    for t in threads_leitura:
+        t.join()
+
+    LocMemCache(caminho, {}).clear()
+    shutil.rmtree(pasta)
+    return {**contagem, 'segundos': segundos, 'commits_por_segundo': contagem['commits'] / segundos}
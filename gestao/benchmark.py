@@ -0,0 +1,384 @@
+"""
+Dados de carga e benchmark das views.
+
+'semear' cria repúblicas, moradores, contas e participações em volume, com
+uma mistura realista de status (contas antigas quase todas pagas, as
+recentes em aberto ou esperando confirmação). Tudo que é criado tem o
+prefixo PREFIXO no username, para poder ser apagado depois ('limpar').
+
+'rodar' passa por TODAS as rotas de 'gestao.urls' com o Client de teste,
+mede tempo (p50/p95) e número de queries, e 'comparar' aponta as que
+pioraram em relação a uma baseline salva em JSON. Requests que mudam dados
+rodam dentro de uma transação desfeita no fim, então os números de uma
+rota não dependem de quais rodaram antes.
+
+'medir_vazao' compara requests por segundo de uma rota de leitura servida
+pelo handler WSGI (N threads) e pelo ASGI (N requests simultâneos no event
+loop), no mesmo processo e sem servidor na frente: mede o Django e as
+views, não o uvicorn/gunicorn.
+"""
+import asyncio
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import acerto, auditoria, busca, rateio, relatorios, saldos
+from .models import Conta, ParticipanteConta, Republica, Usuario
+
+PREFIXO = 'bench_'
+SENHA = 'benchmark'
+
+NOMES = ['Galo', 'Toca', 'Cafofo', 'Castelo', 'Colmeia', 'Senzala', 'Aquário', 'Bangalô', 'Jaula', 'Pouso']
+CONTAS = [
+    ('Aluguel', Conta.TipoConta.FIXA, 1500, 4000),
+    ('Condomínio', Conta.TipoConta.FIXA, 300, 900),
+    ('Internet', Conta.TipoConta.FIXA, 90, 200),
+    ('Luz', Conta.TipoConta.VARIAVEL, 120, 600),
+    ('Água', Conta.TipoConta.VARIAVEL, 60, 250),
+    ('Gás', Conta.TipoConta.VARIAVEL, 30, 150),
+    ('Mercado', Conta.TipoConta.VARIAVEL, 100, 1200),
+    ('Faxina', Conta.TipoConta.VARIAVEL, 80, 400),
+]
+
+
+def _status(aleatorio, vencimento, hoje):
+    """ Quanto mais antiga a conta, mais chance de já estar paga. """
+    if vencimento < hoje - timedelta(days=45):
+        pesos = (0.92, 0.03, 0.05)
+    elif vencimento < hoje:
+        pesos = (0.55, 0.20, 0.25)
+    else:
+        pesos = (0.15, 0.15, 0.70)
+    return aleatorio.choices(
+        [ParticipanteConta.StatusPagamento.PAGO, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+         ParticipanteConta.StatusPagamento.NAO_PAGO],
+        weights=pesos,
+    )[0]
+
+
+def limpar():
+    """ Apaga tudo que 'semear' criou. """
+    usuarios = Usuario.objects.filter(username__startswith=PREFIXO)
+    with transaction.atomic():
+        # Contas protegem o responsável; apagar as repúblicas leva as contas junto
+        Republica.objects.filter(adm__in=usuarios).delete()
+        return usuarios.delete()[1].get(Usuario._meta.label, 0)
+
+
+def semear(republicas=50, moradores=8, contas=200, solicitacoes=2, sem_republica=20, semente=42):
+    """
+    Cria 'republicas' repúblicas com 'moradores' moradores aprovados (o ADM
+    incluso), 'solicitacoes' pedidos de entrada pendentes e 'contas' contas
+    cada, vencendo ao longo dos últimos 12 meses. Retorna um dict com as
+    quantidades criadas.
+    """
+    aleatorio = random.Random(semente)
+    senha = make_password(SENHA) # Um hash só; calcular um por usuário levaria minutos
+    hoje = date.today()
+    inicio = Usuario.objects.filter(username__startswith=PREFIXO).count()
+    numero = iter(range(inicio, 10 ** 9))
+
+    def novos_usuarios(quantidade, **campos):
+        return Usuario.objects.bulk_create([
+            Usuario(username=f'{PREFIXO}{next(numero)}', password=senha, **campos) for _ in range(quantidade)
+        ], batch_size=500)
+
+    novos_usuarios(sem_republica)
+    staff = novos_usuarios(1, is_staff=True)[0]
+    staff.username = f'{PREFIXO}staff_{staff.pk}'
+    staff.save(update_fields=['username'])
+
+    total_contas = total_participacoes = 0
+    for _ in range(republicas):
+        with transaction.atomic():
+            adm = novos_usuarios(1)[0]
+            republica = Republica.objects.create(
+                nome=f'{aleatorio.choice(["República", "Rep", "Casa"])} {aleatorio.choice(NOMES)} {adm.pk}',
+                adm=adm,
+            )
+            busca.indexar(republica)
+            membros = [adm] + novos_usuarios(
+                moradores - 1, republica=republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            Usuario.objects.filter(pk=adm.pk).update(
+                republica=republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            pendentes = novos_usuarios(
+                solicitacoes, republica=republica, status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            )
+
+            # O último morador nunca é responsável (pode ser removido no benchmark)
+            responsaveis = membros[:-1]
+            itens = []
+            for _ in range(contas):
+                nome, tipo, minimo, maximo = aleatorio.choice(CONTAS)
+                vencimento = hoje - timedelta(days=aleatorio.randint(-30, 365))
+                responsavel = aleatorio.choice(responsaveis)
+                outros = aleatorio.sample([m for m in membros if m != responsavel], aleatorio.randint(0, len(membros) - 1))
+                valor = Decimal(aleatorio.randint(minimo * 100, maximo * 100)) / 100
+                conta = Conta(
+                    republica=republica, nome_conta=f'{nome} {vencimento:%m/%Y}', valor_total=valor,
+                    data_vencimento=vencimento, tipo=tipo, responsavel=responsavel,
+                )
+                divisao = rateio.dividir(valor, [responsavel.pk] + [m.pk for m in outros])
+                itens.append((conta, divisao))
+            Conta.objects.bulk_create([conta for conta, _ in itens], batch_size=500)
+
+            participacoes = []
+            for conta, divisao in itens:
+                for usuario_id, parte in divisao:
+                    status = _status(aleatorio, conta.data_vencimento, hoje)
+                    if usuario_id == conta.responsavel_id and status == ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE:
+                        # O responsável não precisa confirmar o próprio pagamento
+                        status = ParticipanteConta.StatusPagamento.PAGO
+                    participacoes.append(ParticipanteConta(
+                        conta=conta, usuario_id=usuario_id, valor_individual=parte, status_pagamento=status,
+                    ))
+            ParticipanteConta.objects.bulk_create(participacoes, batch_size=500)
+            auditoria.registrar([
+                *(auditoria.de_participacao(participacao, None, participacao.status_pagamento)
+                  for participacao in participacoes),
+                *(auditoria.membresia(membro.pk, republica.pk, None, Usuario.StatusAssociacao.APROVADO)
+                  for membro in membros),
+                *(auditoria.membresia(pendente.pk, republica.pk, None, Usuario.StatusAssociacao.AGUARDANDO_APROVACAO)
+                  for pendente in pendentes),
+            ])
+            Conta.atualizar_resumo((conta.pk for conta, _ in itens), relatorios=False)
+            saldos.reconstruir([republica.pk])
+        total_contas += len(itens)
+        total_participacoes += len(participacoes)
+
+    relatorios.reconstruir()
+    return {
+        'republicas': republicas,
+        'usuarios': Usuario.objects.filter(username__startswith=PREFIXO).count() - inicio,
+        'contas': total_contas,
+        'participacoes': total_participacoes,
+    }
+
+
+class Dados:
+    """ Os objetos que os cenários usam, escolhidos entre os dados semeados. """
+
+    def __init__(self):
+        pendente = ParticipanteConta.objects.filter(
+            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+            usuario__username__startswith=PREFIXO,
+        ).select_related('conta__republica', 'conta__responsavel', 'usuario').order_by('pk').first()
+        if pendente is None:
+            raise LookupError('Não há dados de benchmark; rode "manage.py seed_benchmark" antes.')
+
+        self.republica = pendente.conta.republica
+        self.adm = self.republica.adm
+        self.responsavel = pendente.conta.responsavel
+        self.pendente = pendente
+        self.nao_paga = ParticipanteConta.objects.filter(
+            conta__republica=self.republica, status_pagamento=ParticipanteConta.StatusPagamento.NAO_PAGO,
+        ).exclude(usuario=F('conta__responsavel')).select_related('usuario').order_by('pk').first()
+        self.morador = self.nao_paga.usuario
+        self.conta = Conta.objects.filter(responsavel=self.responsavel).order_by('pk').first()
+        self.candidato = Usuario.objects.filter(
+            republica=self.republica, status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+        ).order_by('pk').first()
+        self.removivel = Usuario.objects.filter(
+            republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        ).exclude(pk=self.adm.pk).exclude(contas_responsaveis__isnull=False).order_by('pk').first()
+        self.sem_republica = Usuario.objects.filter(
+            username__startswith=PREFIXO, republica__isnull=True, is_staff=False,
+        ).order_by('pk').first()
+        self.outra_republica = Republica.objects.filter(adm__username__startswith=PREFIXO).exclude(
+            pk=self.republica.pk,
+        ).order_by('pk').first() or self.republica
+        self.staff = Usuario.objects.filter(username__startswith=PREFIXO, is_staff=True).order_by('pk').first()
+        self.pendentes = list(ParticipanteConta.objects.filter(
+            conta__responsavel=self.responsavel, status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        ).values_list('pk', flat=True)[:20])
+        self.assinatura_acerto = acerto.calcular(self.republica.pk).assinatura
+
+
+def _nova_conta(d):
+    return {
+        'nome_conta': 'Benchmark', 'valor_total': '120.00', 'data_vencimento': date.today().isoformat(),
+        'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [d.removivel.pk],
+    }
+
+
+# nome da rota: função(Dados) -> (usuário, método, args da URL, dados do POST, query string)
+CENARIOS = {
+    'dashboard': lambda d: (d.morador, 'get', [], None, {}),
+    'marcar_pago': lambda d: (d.morador, 'post', [d.nao_paga.pk], {}, {}),
+    'republica_nova': lambda d: (d.sem_republica, 'get', [], None, {}),
+    'republica_list': lambda d: (d.sem_republica, 'get', [], None, {'q': 'rep galo'}),
+    'solicitar_entrada': lambda d: (d.sem_republica, 'post', [d.outra_republica.pk], {}, {}),
+    'aprovar_morador': lambda d: (d.adm, 'post', [d.candidato.pk], {}, {}),
+    'rejeitar_morador': lambda d: (d.adm, 'post', [d.candidato.pk], {}, {}),
+    'conta_nova': lambda d: (d.adm, 'post', [], _nova_conta(d), {}),
+    'confirmar_pagamento': lambda d: (d.responsavel, 'post', [d.pendente.pk], {}, {}),
+    'rejeitar_pagamento': lambda d: (d.responsavel, 'post', [d.pendente.pk], {}, {}),
+    'conta_delete': lambda d: (d.responsavel, 'post', [d.conta.pk], {}, {}),
+    'remover_morador': lambda d: (d.adm, 'post', [d.removivel.pk], {}, {}),
+    'aprovar_moradores': lambda d: (d.adm, 'post', [], {'ids': [d.candidato.pk]}, {}),
+    'confirmar_pagamentos': lambda d: (d.responsavel, 'post', [], {'ids': d.pendentes}, {}),
+    'rejeitar_pagamentos': lambda d: (d.responsavel, 'post', [], {'ids': d.pendentes}, {}),
+    'historico': lambda d: (d.morador, 'get', [], None, {}),
+    'relatorios': lambda d: (d.morador, 'get', [], None, {}),
+    'extrato_csv': lambda d: (d.morador, 'get', [], None, {}),
+    'metricas': lambda d: (d.staff, 'get', [], None, {}),
+    'api_dashboard': lambda d: (d.morador, 'get', [], None, {}),
+    'api_dashboard_secao': lambda d: (d.morador, 'get', ['pendencias'], None, {'limite': 50}),
+    'confirmar_acerto': lambda d: (d.adm, 'post', [], {'assinatura': d.assinatura_acerto}, {}),
+    'api_acerto': lambda d: (d.morador, 'get', [], None, {}),
+}
+
+
+# Rotas que não dá para medir request a request
+FORA_DO_BENCHMARK = {
+    'eventos', # Stream SSE: a resposta não termina
+}
+
+
+def rotas_sem_cenario():
+    """ Rotas de 'gestao.urls' que ainda não têm cenário (toda rota nova precisa de um). """
+    from . import urls
+    return sorted({padrao.name for padrao in urls.urlpatterns} - set(CENARIOS) - FORA_DO_BENCHMARK)
+
+
+def _percentil(valores, fracao):
+    valores = sorted(valores)
+    return valores[max(0, math.ceil(fracao * len(valores)) - 1)]
+
+
+def rodar(repeticoes=20, aquecimento=2, rotas=None):
+    """
+    Mede cada rota 'repeticoes' vezes (depois de 'aquecimento' requests
+    descartados). Retorna {rota: {'p50_ms', 'p95_ms', 'queries'}}.
+    """
+    faltando = rotas_sem_cenario()
+    if faltando:
+        raise LookupError(f'Rotas sem cenário de benchmark: {", ".join(faltando)}')
+
+    dados = Dados()
+    resultados = {}
+    # O Client usa o host 'testserver'
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for nome, cenario in CENARIOS.items():
+            if rotas and nome not in rotas:
+                continue
+            usuario, metodo, args, corpo, parametros = cenario(dados)
+            url = reverse(f'gestao:{nome}', args=args)
+            client = Client()
+            client.force_login(usuario)
+
+            tempos = []
+            queries = []
+            for i in range(aquecimento + repeticoes):
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        if metodo == 'get':
+                            response = client.get(url, parametros)
+                        else:
+                            response = client.post(url, corpo)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                        duracao = time.perf_counter() - inicio
+                    # Desfaz o que o request mudou
+                    transaction.set_rollback(True)
+                # Sem isso as mensagens do messages se acumulam no cookie a cada repetição
+                client.cookies.pop('messages', None)
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{nome}: {metodo.upper()} {url} respondeu {response.status_code}')
+                if i >= aquecimento:
+                    tempos.append(duracao * 1000)
+                    queries.append(len(ctx.captured_queries))
+
+            resultados[nome] = {
+                'p50_ms': round(_percentil(tempos, 0.5), 2),
+                'p95_ms': round(_percentil(tempos, 0.95), 2),
+                'queries': _percentil(queries, 0.5),
+            }
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia=0.25, folga_ms=2.0):
+    """
+    Lista as regressões: qualquer query a mais, ou p95 mais de 'tolerancia'
+    (fração) acima da baseline. 'folga_ms' evita falso alarme em rotas de 1-2 ms.
+    """
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = baseline.get(nome)
+        if anterior is None:
+            continue
+        if atual['queries'] > anterior['queries']:
+            regressoes.append(f'{nome}: {anterior["queries"]} -> {atual["queries"]} queries')
+        if atual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia) + folga_ms:
+            regressoes.append(f'{nome}: p95 {anterior["p95_ms"]:.1f} -> {atual["p95_ms"]:.1f} ms')
+    return regressoes
+
+
+# Rotas de leitura com view async (comando 'benchmark_asgi')
+ROTAS_VAZAO = ('dashboard', 'republica_list', 'api_dashboard', 'api_dashboard_secao')
+
+
+def _partes(total, concorrencia):
+    return [total // concorrencia + (1 if i < total % concorrencia else 0) for i in range(concorrencia)]
+
+
+def _conferir(nome, response):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{nome}: respondeu {response.status_code}')
+
+
+def medir_vazao(nome, total=200, concorrencia=10):
+    """
+    Faz 'total' GETs na rota 'nome' (uma de CENARIOS), com 'concorrencia'
+    clientes ao mesmo tempo, pelo WSGI e pelo ASGI. Retorna
+    {'wsgi': requests/s, 'asgi': requests/s}.
+    """
+    usuario, metodo, args, _, parametros = CENARIOS[nome](Dados())
+    if metodo != 'get':
+        raise ValueError(f'{nome} não é uma rota de leitura.')
+    url = reverse(f'gestao:{nome}', args=args)
+    partes = [parte for parte in _partes(total, concorrencia) if parte]
+
+    def cliente_wsgi(quantidade):
+        client = Client()
+        client.force_login(usuario)
+        try:
+            for _ in range(quantidade):
+                _conferir(nome, client.get(url, parametros))
+        finally:
+            connections.close_all()
+
+    async def cliente_asgi(quantidade):
+        client = AsyncClient()
+        await client.aforce_login(usuario)
+        for _ in range(quantidade):
+            _conferir(nome, await client.get(url, parametros))
+
+    async def todos_asgi():
+        await asyncio.gather(*(cliente_asgi(parte) for parte in partes))
+
+    resultado = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(len(partes)) as pool:
+            list(pool.map(cliente_wsgi, partes))
+        resultado['wsgi'] = total / (time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        asyncio.run(todos_asgi())
+        resultado['asgi'] = total / (time.perf_counter() - inicio)
+    return resultado
@@ -0,0 +1,94 @@
+"""
+Busca de repúblicas por nome, com índice de trigramas (TrigramaRepublica).
+
+O nome é normalizado (sem acentos, minúsculo, só letras e números) e cada
+palavra vira trigramas com espaços nas bordas, como no pg_trgm do Postgres:
+
+    "Galo" -> "  g", " ga", "gal", "alo", "lo "
+
+Os trigramas do início da palavra fazem o prefixo funcionar ("gal" acha
+"Galo"), e contar quantos trigramas a busca tem em comum com o nome dá a
+busca aproximada ("gallo" também acha "Galo") e o ranking. A consulta usa
+o índice (trigrama, república), então não varre a tabela de repúblicas.
+
+Buscas curtas (menos de 3 letras, ex: "r") têm um trigrama só, e ele está
+em quase todo nome: contar e ordenar por semelhança agregaria o índice
+inteiro antes do LIMIT. Elas viram busca por prefixo de palavra: o trigrama
+do começo da palavra ("r" -> "  r") checado com EXISTS, na ordem do índice
+único de 'nome' (ORDEM_PREFIXO). O SQLite percorre os nomes em ordem e para
+ao completar a página, sem GROUP BY nem sort.
+
+O índice é mantido pelos sinais em 'gestao.signals'.
+"""
+import math
+import re
+import unicodedata
+
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import Length
+
+from .models import Republica, TrigramaRepublica
+
+# Fração dos trigramas da busca que o nome precisa ter para aparecer
+SEMELHANCA_MINIMA = 0.5
+
+# Mais trigramas em comum primeiro; no empate, o nome mais curto (o mais
+# próximo da busca). Termina no 'id' para servir à paginação por cursor.
+ORDEM = ('-semelhanca', 'tamanho', 'nome', 'id')
+ORDEM_PREFIXO = ('nome', 'id')
+
+TAMANHO_MINIMO = 3 # Abaixo disso (normalizado), a busca é só por prefixo
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(letra for letra in texto if not unicodedata.combining(letra))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto.lower()))
+
+
+def trigramas(texto):
+    resultado = set()
+    for palavra in normalizar(texto).split():
+        palavra = f'  {palavra} '
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+
+def indexar(republica):
+    """ Refaz as linhas de índice de uma república (chamado no post_save). """
+    TrigramaRepublica.objects.filter(republica=republica).delete()
+    TrigramaRepublica.objects.bulk_create([
+        TrigramaRepublica(republica=republica, trigrama=trigrama) for trigrama in trigramas(republica.nome)
+    ])
+
+
+def curta(texto):
+    return len(normalizar(texto)) < TAMANHO_MINIMO
+
+
+def ordem(texto):
+    """ A ordem de 'buscar(texto)', para a paginação por cursor. """
+    return ORDEM_PREFIXO if curta(texto) else ORDEM
+
+
+def buscar(texto, queryset=None):
+    """
+    Repúblicas parecidas com 'texto', das mais para as menos parecidas
+    (veja ORDEM), ou, nas buscas curtas, as que têm uma palavra começando
+    por 'texto' (ORDEM_PREFIXO). Retorna um queryset, então dá para paginar.
+    """
+    queryset = Republica.objects.all() if queryset is None else queryset
+    if curta(texto):
+        palavra = normalizar(texto)
+        if not palavra:
+            return queryset.none()
+        inicio = f'  {palavra}'[-3:]
+        return queryset.filter(Exists(
+            TrigramaRepublica.objects.filter(republica=OuterRef('pk'), trigrama=inicio),
+        )).order_by(*ORDEM_PREFIXO)
+
+    procurados = trigramas(texto)
+    minimo = max(1, math.ceil(len(procurados) * SEMELHANCA_MINIMA))
+    return queryset.filter(trigramas__trigrama__in=procurados).annotate(
+        semelhanca=Count('trigramas'), tamanho=Length('nome'),
+    ).filter(semelhanca__gte=minimo).order_by(*ORDEM)
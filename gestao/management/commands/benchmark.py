@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede cada rota do app (p50/p95 e queries) sobre os dados do seed_benchmark e compara '
+        'com a baseline salva. Falha se alguma rota piorou.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20, help='Requests medidos por rota (padrão: 20).')
+        parser.add_argument('--aquecimento', type=int, default=2, help='Requests descartados antes de medir (padrão: 2).')
+        parser.add_argument('--rota', action='append', dest='rotas', help='Mede só esta rota (pode repetir).')
+        parser.add_argument(
+            '--baseline', default=str(Path(settings.BASE_DIR) / 'benchmark_baseline.json'),
+            help='Arquivo JSON da baseline (padrão: benchmark_baseline.json na raiz do projeto).',
+        )
+        parser.add_argument('--salvar', action='store_true', help='Grava os resultados como a nova baseline.')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Quanto o p95 pode subir em relação à baseline, em fração (padrão: 0.25).',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1 or options['aquecimento'] < 0:
+            raise CommandError('--repeticoes precisa ser pelo menos 1 e --aquecimento não pode ser negativo.')
+        desconhecidas = set(options['rotas'] or ()) - set(benchmark.CENARIOS)
+        if desconhecidas:
+            raise CommandError(f'Rotas sem cenário: {", ".join(sorted(desconhecidas))}')
+
+        try:
+            resultados = benchmark.rodar(options['repeticoes'], options['aquecimento'], options['rotas'])
+        except (LookupError, RuntimeError) as erro:
+            raise CommandError(str(erro))
+
+        self.stdout.write(f'{"rota":<24} {"p50 ms":>8} {"p95 ms":>8} {"queries":>8}')
+        for nome, linha in resultados.items():
+            self.stdout.write(f'{nome:<24} {linha["p50_ms"]:>8.1f} {linha["p95_ms"]:>8.1f} {linha["queries"]:>8}')
+
+        caminho = Path(options['baseline'])
+        if options['salvar']:
+            baseline = json.loads(caminho.read_text()) if caminho.exists() else {}
+            baseline.update(resultados)
+            caminho.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline gravada em {caminho}.'))
+            return
+        if not caminho.exists():
+            self.stdout.write(f'Sem baseline em {caminho}; rode com --salvar para criar uma.')
+            return
+
+        regressoes = benchmark.comparar(resultados, json.loads(caminho.read_text()), options['tolerancia'])
+        if regressoes:
+            raise CommandError('Regressões em relação à baseline:\n  ' + '\n  '.join(regressoes))
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação à baseline.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara requests por segundo das views de leitura pelo handler WSGI (threads) e pelo '
+        'ASGI (asyncio), no mesmo processo, sobre os dados do seed_benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='GETs por rota e modo (padrão: 200).')
+        parser.add_argument('--concorrencia', type=int, default=10, help='Clientes simultâneos (padrão: 10).')
+        parser.add_argument('--rota', choices=benchmark.ROTAS_VAZAO, action='append', dest='rotas',
+                            help='Mede só esta rota (pode repetir).')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concorrencia'] < 1:
+            raise CommandError('--requests e --concorrencia precisam ser pelo menos 1.')
+
+        self.stdout.write(f'{"rota":<24} {"wsgi req/s":>11} {"asgi req/s":>11}')
+        for rota in options['rotas'] or benchmark.ROTAS_VAZAO:
+            try:
+                vazao = benchmark.medir_vazao(rota, options['requests'], options['concorrencia'])
+            except (LookupError, RuntimeError) as erro:
+                raise CommandError(str(erro))
+            self.stdout.write(f'{rota:<24} {vazao["wsgi"]:>11.0f} {vazao["asgi"]:>11.0f}')
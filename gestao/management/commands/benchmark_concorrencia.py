@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import banco
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão das transições de pagamento concorrentes no SQLite (num banco temporário, pelas '
+        'conexões do Django), com os ajustes padrão do Django e com os deste projeto '
+        '(WAL, synchronous=NORMAL, busy_timeout, BEGIN IMMEDIATE).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help='Threads escrevendo (padrão: 8).')
+        parser.add_argument('--transacoes', type=int, default=200, help='Transações por escritor (padrão: 200).')
+        parser.add_argument('--leitores', type=int, default=2, help='Threads lendo ao mesmo tempo (padrão: 2).')
+        parser.add_argument('--perfil', choices=sorted(banco.PERFIS), action='append', dest='perfis',
+                            help='Perfil a medir (pode repetir). Sem isso, mede todos.')
+
+    def handle(self, *args, **options):
+        if options['escritores'] < 1 or options['transacoes'] < 1 or options['leitores'] < 0:
+            raise CommandError('Precisa de pelo menos 1 escritor e 1 transação; leitores não pode ser negativo.')
+
+        self.stdout.write(f'{"perfil":<10} {"commits":>8} {"erros":>7} {"leituras":>9} {"segundos":>9} {"commits/s":>10}')
+        for perfil in options['perfis'] or banco.PERFIS:
+            resultado = banco.medir_concorrencia(
+                perfil, options['escritores'], options['transacoes'], options['leitores'],
+            )
+            self.stdout.write(
+                f'{perfil:<10} {resultado["commits"]:>8} {resultado["erros"]:>7} {resultado["leituras"]:>9} '
+                f'{resultado["segundos"]:>9.2f} {resultado["commits_por_segundo"]:>10.0f}'
+            )
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestao import lembretes
+
+
+class Command(BaseCommand):
+    help = (
+        'Manda a cada morador um email com as contas dele que vencem nos próximos N dias ou já '
+        'venceram, sem repetir o que já foi lembrado. Feito para rodar uma vez por dia (cron); '
+        'os emails saem pelos workers (run_workers).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=3, help='Lembra contas que vencem em até N dias (padrão: 3).')
+        parser.add_argument('--data', help='Data de referência, AAAA-MM-DD (padrão: hoje).')
+        parser.add_argument('--dry-run', action='store_true', help='Só conta quantos lembretes seriam enviados.')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError('--dias não pode ser negativo.')
+        try:
+            hoje = date.fromisoformat(options['data']) if options['data'] else timezone.localdate()
+        except ValueError:
+            raise CommandError(f'Data inválida: {options["data"]} (use AAAA-MM-DD).')
+
+        usuarios, participacoes = lembretes.enviar(hoje, options['dias'], options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{usuarios} moradores receberiam lembrete de {participacoes} contas (dry-run).')
+            return
+        self.stdout.write(self.style.SUCCESS(f'{usuarios} lembretes enfileirados, cobrindo {participacoes} contas.'))
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import recorrencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera as contas FIXAS recorrentes de uma competência (por padrão, o próximo mês). '
+        'Pode rodar várias vezes (ex: no cron): contas já geradas não são duplicadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--competencia', help='Mês de referência no formato AAAA-MM.')
+        parser.add_argument('--lote', type=int, default=500, help='Recorrências por lote/transação (padrão: 500).')
+
+    def handle(self, *args, **options):
+        if options['competencia']:
+            try:
+                competencia = date.fromisoformat(f"{options['competencia']}-01")
+            except ValueError:
+                raise CommandError('--competencia precisa estar no formato AAAA-MM.')
+        else:
+            competencia = recorrencia.proxima_competencia(date.today())
+        if options['lote'] < 1:
+            raise CommandError('--lote precisa ser pelo menos 1.')
+
+        geradas, ja_existentes, conflitos = recorrencia.gerar(competencia, options['lote'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Competência {competencia:%Y-%m}: {geradas} contas geradas, {ja_existentes} já existiam.'
+        ))
+        if conflitos:
+            self.stdout.write(self.style.WARNING(
+                f'{conflitos} lote(s) conflitaram com outra execução e foram desfeitos; rode de novo.'
+            ))
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa contas em massa de arquivos CSV ou JSONL. Colunas: republica, nome_conta, '
+        'valor_total, data_vencimento (AAAA-MM-DD), tipo, responsavel, participantes '
+        '(usernames separados por ";" no CSV, ou uma lista no JSONL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivos', nargs='+', help='Arquivos .csv ou .jsonl')
+        parser.add_argument(
+            '--formato', choices=['csv', 'jsonl'],
+            help='Força o formato (por padrão, usa a extensão do arquivo).'
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Linhas por lote/transação (padrão: 500).')
+        parser.add_argument('--dry-run', action='store_true', help='Só valida, não grava nada.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote precisa ser pelo menos 1.')
+
+        total_importadas = 0
+        total_erros = 0
+        for caminho in options['arquivos']:
+            caminho = Path(caminho)
+            formato = options['formato'] or caminho.suffix.lstrip('.').lower()
+            if formato not in ('csv', 'jsonl'):
+                raise CommandError(f'Não sei ler "{caminho}". Use --formato csv ou jsonl.')
+            if not caminho.exists():
+                raise CommandError(f'Arquivo "{caminho}" não encontrado.')
+
+            with caminho.open(newline='', encoding='utf-8') as arquivo:
+                linhas = importacao.ler_linhas(arquivo, formato)
+                for lote in importacao.em_lotes(linhas, options['lote']):
+                    itens, erros = importacao.preparar_lote(lote)
+                    for numero, motivo in erros:
+                        self.stderr.write(f'{caminho}:{numero}: {motivo}')
+                    if not options['dry_run']:
+                        importacao.gravar_contas(itens)
+                    total_importadas += len(itens)
+                    total_erros += len(erros)
+
+        verbo = 'válidas' if options['dry_run'] else 'importadas'
+        mensagem = f'{total_importadas} contas {verbo}, {total_erros} linhas com erro.'
+        if total_erros:
+            self.stdout.write(self.style.WARNING(mensagem))
+        else:
+            self.stdout.write(self.style.SUCCESS(mensagem))
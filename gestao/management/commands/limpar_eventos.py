@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import eventos
+
+
+class Command(BaseCommand):
+    help = 'Apaga da outbox de notificações (EventoNotificacao) os eventos mais velhos que N horas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas', type=int, default=None,
+            help='Idade mínima, em horas (padrão: GESTAO_EVENTOS["RETENCAO_HORAS"]).',
+        )
+
+    def handle(self, *args, **options):
+        if options['horas'] is not None and options['horas'] < 0:
+            raise CommandError('--horas não pode ser negativo.')
+        total = eventos.limpar(options['horas'])
+        self.stdout.write(self.style.SUCCESS(f'{total} eventos apagados.'))
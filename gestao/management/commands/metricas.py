@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from gestao import metricas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra as métricas por view (tempo, queries, banco, template) coletadas pelo '
+        'MetricasMiddleware. Junta os processos que gravaram snapshot no cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=['tabela', 'prometheus'], default='tabela')
+
+    def handle(self, *args, **options):
+        snapshots = metricas.snapshots()
+        dados = metricas.juntar(snapshots)
+
+        if options['formato'] == 'prometheus':
+            self.stdout.write(metricas.prometheus(dados), ending='')
+            return
+
+        linhas = metricas.resumo(dados)
+        if not linhas:
+            self.stdout.write('Nenhuma métrica no cache (o servidor está com o middleware ativo e um cache compartilhado?).')
+            return
+        self.stdout.write(
+            f'{"view":<32} {"reqs":>6} {"média ms":>9} {"p95 ms":>8} {"queries":>8} '
+            f'{"p95 q":>6} {"banco ms":>9} {"templ. ms":>9}'
+        )
+        for linha in linhas:
+            self.stdout.write(
+                f'{linha["view"]:<32} {linha["requests"]:>6} {linha["media_ms"]:>9.1f} {linha["p95_ms"]:>8.0f} '
+                f'{linha["media_queries"]:>8.1f} {linha["p95_queries"]:>6} {linha["media_db_ms"]:>9.1f} '
+                f'{linha["media_template_ms"]:>9.1f}'
+            )
+        self.stdout.write(f'{len(snapshots)} processo(s).')
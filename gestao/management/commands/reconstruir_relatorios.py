@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestao import relatorios
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os resumos mensais dos relatórios a partir das contas (inclusive as arquivadas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--republica', type=int, action='append', dest='republicas',
+            help='ID da república a reconstruir (pode repetir). Sem isso, reconstrói todas.'
+        )
+
+    def handle(self, *args, **options):
+        meses = relatorios.reconstruir(options['republicas'])
+        self.stdout.write(self.style.SUCCESS(f'Relatórios reconstruídos: {meses} meses de república.'))
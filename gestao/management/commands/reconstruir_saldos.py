@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestao import saldos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os saldos (quem deve quanto para quem) a partir das participações.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--republica', type=int, action='append', dest='republicas',
+            help='ID da república a reconstruir (pode repetir). Sem isso, reconstrói todas.'
+        )
+
+    def handle(self, *args, **options):
+        pares = saldos.reconstruir(options['republicas'])
+        self.stdout.write(self.style.SUCCESS(f'Saldos reconstruídos: {pares} pares devedor/credor em aberto.'))
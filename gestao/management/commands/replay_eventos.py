@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import auditoria
+
+
+class Command(BaseCommand):
+    help = (
+        'Refaz saldos, resumos das contas e relatórios a partir do registro de transições '
+        '(EventoTransicao), corrigindo as participações cujo status diverge dele. Rode com o app parado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=auditoria.LOTE,
+            help=f'Eventos lidos e participações conferidas por vez (padrão: {auditoria.LOTE}).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Só conta o que seria corrigido.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote tem que ser positivo.')
+        try:
+            resultado = auditoria.replay(options['lote'], options['dry_run'])
+        except auditoria.RegistroIncompleto as erro:
+            raise CommandError(str(erro))
+
+        resumo = (
+            f'{resultado["eventos"]} eventos, {resultado["participacoes"]} participações, '
+            f'{resultado["divergentes"]} divergentes, {resultado["pares"]} pares devedor/credor em aberto'
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{resumo} (dry-run).')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{resumo}; {resultado["contas"]} contas e {resultado["meses"]} meses de relatório recalculados.'
+        ))
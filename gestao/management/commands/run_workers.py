@@ -0,0 +1,92 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def _processo(indice, lote, intervalo, parar):
+    # Roda no processo filho; com 'spawn' (Windows, macOS) ele começa sem o Django carregado
+    import django
+    django.setup()
+    from gestao import tarefas
+
+    # O Ctrl+C chega a todos os processos; quem para os filhos é o principal, pelo 'parar'
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    tarefas.trabalhar(tarefas.nome_do_worker(indice), lote=lote, intervalo=intervalo, parar=parar)
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda os workers da fila de tarefas (gestao.tarefas): N processos que pegam tarefas '
+        'em lotes, até receber SIGINT/SIGTERM. O processo principal reinicia worker que morrer '
+        'e agenda a manutenção periódica.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=2, help='Quantos processos workers (padrão: 2).')
+        parser.add_argument('--lote', type=int, default=None, help='Tarefas por lote (padrão: GESTAO_TAREFAS["LOTE"]).')
+        parser.add_argument(
+            '--intervalo', type=float, default=None,
+            help='Segundos de espera com a fila vazia (padrão: GESTAO_TAREFAS["INTERVALO"]).',
+        )
+        parser.add_argument(
+            '--uma-vez', action='store_true',
+            help='Roda o que estiver pendente neste processo e sai (para cron ou depuração).',
+        )
+
+    def handle(self, *args, **options):
+        from gestao import tarefas
+
+        if options['processos'] < 1:
+            raise CommandError('--processos tem que ser pelo menos 1.')
+        if options['lote'] is not None and options['lote'] < 1:
+            raise CommandError('--lote tem que ser pelo menos 1.')
+
+        if options['uma_vez']:
+            tarefas.liberar_travadas()
+            total = tarefas.trabalhar(tarefas.nome_do_worker(), lote=options['lote'], uma_vez=True)
+            self.stdout.write(self.style.SUCCESS(f'{total} tarefas concluídas.'))
+            return
+
+        config = tarefas.configuracao()
+        parar = multiprocessing.Event()
+        # O handler só marca a flag: chamar parar.set() dentro dele trava se o
+        # sinal chegar enquanto o laço espera no mesmo Event
+        sinais = []
+        signal.signal(signal.SIGTERM, lambda *_: sinais.append(True))
+        signal.signal(signal.SIGINT, lambda *_: sinais.append(True))
+
+        processos = {}
+
+        def iniciar(indice):
+            # Os filhos abrem as próprias conexões; uma herdada pelo fork não pode ser compartilhada
+            connections.close_all()
+            processo = multiprocessing.Process(
+                target=_processo, args=(indice, options['lote'], options['intervalo'], parar), daemon=True,
+            )
+            processo.start()
+            processos[indice] = processo
+
+        for indice in range(options['processos']):
+            iniciar(indice)
+        self.stdout.write(f'{options["processos"]} workers rodando. Ctrl+C para parar.')
+
+        manutencao = 0.0
+        while not sinais:
+            if time.monotonic() - manutencao >= config['INTERVALO_MANUTENCAO']:
+                tarefas.liberar_travadas()
+                tarefas.agendar_manutencao()
+                manutencao = time.monotonic()
+            for indice, processo in list(processos.items()):
+                if not processo.is_alive():
+                    self.stderr.write(f'Worker {indice} saiu com código {processo.exitcode}; reiniciando.')
+                    iniciar(indice)
+            time.sleep(1.0)
+
+        self.stdout.write('Parando: os workers terminam o lote atual.')
+        parar.set()
+        for processo in processos.values():
+            processo.join()
+        self.stdout.write(self.style.SUCCESS('Workers parados.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria dados de carga para o benchmark: repúblicas, moradores, solicitações e contas com '
+        'uma mistura realista de status. Os usuários criados começam com "bench_".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--republicas', type=int, default=50, help='Quantas repúblicas (padrão: 50).')
+        parser.add_argument('--moradores', type=int, default=8, help='Moradores aprovados por república, com o ADM (padrão: 8).')
+        parser.add_argument('--contas', type=int, default=200, help='Contas por república (padrão: 200).')
+        parser.add_argument('--solicitacoes', type=int, default=2, help='Pedidos de entrada pendentes por república (padrão: 2).')
+        parser.add_argument('--sem-republica', type=int, default=20, help='Usuários sem república (padrão: 20).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório (padrão: 42).')
+        parser.add_argument('--limpar', action='store_true', help='Apaga os dados de benchmark anteriores antes.')
+
+    def handle(self, *args, **options):
+        if options['republicas'] < 1 or options['moradores'] < 2:
+            raise CommandError('São precisos pelo menos 1 república e 2 moradores por república.')
+        if min(options['contas'], options['solicitacoes'], options['sem_republica']) < 0:
+            raise CommandError('As quantidades não podem ser negativas.')
+
+        if options['limpar']:
+            apagados = benchmark.limpar()
+            self.stdout.write(f'{apagados} usuários de benchmark apagados.')
+
+        criados = benchmark.semear(
+            republicas=options['republicas'], moradores=options['moradores'], contas=options['contas'],
+            solicitacoes=options['solicitacoes'], sem_republica=options['sem_republica'],
+            semente=options['semente'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Criados: {criados["republicas"]} repúblicas, {criados["usuarios"]} usuários, '
+            f'{criados["contas"]} contas, {criados["participacoes"]} participações. '
+            f'Senha dos usuários: "{benchmark.SENHA}".'
+        ))
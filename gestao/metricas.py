@@ -0,0 +1,355 @@
+"""
+Métricas de desempenho por view (middleware 'gestao.metricas.MetricasMiddleware').
+
+Para cada request, mede o tempo total, o número de queries e o tempo gasto
+no banco (com 'connection.execute_wrapper') e o tempo de renderização do
+template (das TemplateResponse), e soma em histogramas na memória do
+processo, agrupados pelo nome da view ('gestao:dashboard', ...).
+
+De tempos em tempos o processo grava uma cópia ("snapshot") no cache do
+Django, para o comando 'manage.py metricas' e a página 'metricas/' (só staff)
+juntarem os números de todos os processos. Cada processo ocupa uma vaga
+própria no cache (uma chave entre PROCESSOS_MAXIMOS, tomada com 'cache.add')
+e só escreve nela, então processos gravando juntos não apagam o snapshot um
+do outro. Quem lê junta as vagas com um 'get_many'. Com o cache local em
+memória (padrão), cada processo só vê os próprios números; para juntar
+vários processos, use um cache compartilhado (ex: GESTAO_CACHE_DIR). Nas
+views async, a gravação roda numa thread ('sync_to_async'), fora do event
+loop.
+
+Requests acima do orçamento de queries ou de tempo são logados em
+'gestao.metricas', com as queries que mais se repetiram (sinal de N+1).
+O orçamento de queries é LIMITE_QUERIES, ou o da view em
+LIMITES_QUERIES_POR_VIEW (as que escrevem custam mais que as de leitura).
+Com ESTRITO, o request acima do orçamento levanta OrcamentoExcedido em vez
+de só logar: os testes ligam, para uma view que passou do orçamento
+quebrar a suíte.
+
+Configuração em settings.GESTAO_METRICAS (veja PADRAO).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+PADRAO = {
+    'ATIVO': True,
+    'LIMITE_QUERIES': 30,         # Loga requests com mais queries que isso (None desliga)
+    'LIMITES_QUERIES_POR_VIEW': {}, # {nome da view: limite}, no lugar de LIMITE_QUERIES
+    'LIMITE_TEMPO_MS': 1000,      # Loga requests mais lentos que isso (None desliga)
+    'INTERVALO_SNAPSHOT': 10,     # Segundos entre gravações do snapshot no cache
+    'ESTRITO': False,             # Levanta OrcamentoExcedido em vez de só logar
+}
+
+# Limites superiores dos buckets (o último, +Inf, é implícito)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_QUERIES = (1, 2, 5, 10, 20, 50, 100)
+
+METRICAS = {
+    # nome: (descrição, buckets)
+    'duracao_segundos': ('Tempo total do request', BUCKETS_SEGUNDOS),
+    'db_segundos': ('Tempo gasto em queries', BUCKETS_SEGUNDOS),
+    'template_segundos': ('Tempo de renderização do template', BUCKETS_SEGUNDOS),
+    'queries': ('Número de queries', BUCKETS_QUERIES),
+}
+
+PROCESSOS_MAXIMOS = 256
+TIMEOUT_SNAPSHOT = 24 * 60 * 60 # A vaga de um processo que morreu fica livre depois disso
+
+
+class OrcamentoExcedido(Exception):
+    """ Request acima do orçamento com GESTAO_METRICAS['ESTRITO'] ligado. """
+
+
+def configuracao():
+    return {**PADRAO, **getattr(settings, 'GESTAO_METRICAS', {})}
+
+
+class Histograma:
+    """ Contagem por bucket + soma + total, como o histograma do Prometheus. """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def exportar(self):
+        return {'contagens': list(self.contagens), 'soma': self.soma, 'total': self.total}
+
+
+class Registro:
+    """ Histogramas por view, protegidos por um lock (servidores com threads). """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observar(self, view, valores):
+        with self.lock:
+            histogramas = self.views.get(view)
+            if histogramas is None:
+                histogramas = self.views[view] = {
+                    nome: Histograma(buckets) for nome, (_, buckets) in METRICAS.items()
+                }
+            for nome, valor in valores.items():
+                histogramas[nome].observar(valor)
+
+    def exportar(self):
+        with self.lock:
+            return {
+                view: {nome: histograma.exportar() for nome, histograma in histogramas.items()}
+                for view, histogramas in self.views.items()
+            }
+
+    def limpar(self):
+        with self.lock:
+            self.views = {}
+
+
+REGISTRO = Registro()
+
+
+def _id_processo():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _vaga(indice):
+    return f'gestao:metricas:processo:{indice}'
+
+
+VAGAS = [_vaga(indice) for indice in range(PROCESSOS_MAXIMOS)]
+_vaga_deste_processo = None
+
+
+def gravar_snapshot():
+    """
+    Grava os números deste processo na vaga dele, como (id do processo,
+    snapshot). Se a vaga venceu ou foi tomada (ex: depois de um fork, o pid
+    muda), ocupa a primeira livre: 'cache.add' e uma releitura, já que nem
+    todo backend faz o 'add' atômico.
+    """
+    global _vaga_deste_processo
+    processo = _id_processo()
+    valor = (processo, REGISTRO.exportar())
+    if _vaga_deste_processo is not None:
+        atual = cache.get(_vaga_deste_processo)
+        if atual is not None and atual[0] == processo:
+            cache.set(_vaga_deste_processo, valor, TIMEOUT_SNAPSHOT)
+            return
+    ocupadas = cache.get_many(VAGAS)
+    for vaga in VAGAS:
+        if vaga in ocupadas or not cache.add(vaga, valor, TIMEOUT_SNAPSHOT):
+            continue
+        atual = cache.get(vaga)
+        if atual is not None and atual[0] == processo:
+            _vaga_deste_processo = vaga
+            return
+    logger.warning('Sem vaga no cache para as métricas do processo %s.', processo)
+
+
+def snapshots():
+    """ Os snapshots gravados por todos os processos. """
+    return [snapshot for _, snapshot in cache.get_many(VAGAS).values()]
+
+
+def juntar(snapshots):
+    """ Soma snapshots (dicts de 'Registro.exportar') de vários processos. """
+    total = {}
+    for snapshot in snapshots:
+        for view, metricas in snapshot.items():
+            destino = total.setdefault(view, {})
+            for nome, dados in metricas.items():
+                soma = destino.setdefault(nome, {'contagens': [0] * len(dados['contagens']), 'soma': 0, 'total': 0})
+                soma['contagens'] = [a + b for a, b in zip(soma['contagens'], dados['contagens'])]
+                soma['soma'] += dados['soma']
+                soma['total'] += dados['total']
+    return total
+
+
+def coletar():
+    """ Os números de todos os processos que gravaram snapshot, com os deste atualizados. """
+    gravar_snapshot()
+    return juntar(snapshots())
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus(dados):
+    """ Formato texto do Prometheus (um histograma por métrica, com a view de label). """
+    linhas = []
+    for nome, (descricao, buckets) in METRICAS.items():
+        metrica = f'gestao_view_{nome}'
+        linhas.append(f'# HELP {metrica} {descricao}.')
+        linhas.append(f'# TYPE {metrica} histogram')
+        for view in sorted(dados):
+            if nome not in dados[view]:
+                continue
+            histograma = dados[view][nome]
+            label = f'view="{_rotulo(view)}"'
+            acumulado = 0
+            for limite, contagem in zip([*buckets, '+Inf'], histograma['contagens']):
+                acumulado += contagem
+                linhas.append(f'{metrica}_bucket{{{label},le="{limite}"}} {acumulado}')
+            linhas.append(f'{metrica}_sum{{{label}}} {histograma["soma"]}')
+            linhas.append(f'{metrica}_count{{{label}}} {histograma["total"]}')
+    return '\n'.join(linhas) + '\n'
+
+
+class _ContadorDeQueries:
+    """ execute_wrapper que conta queries, soma o tempo e guarda o SQL (sem parâmetros). """
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo = 0.0
+        self.sqls = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.quantidade += 1
+            self.sqls[sql] += 1
+
+
+class MetricasMiddleware:
+    # Funciona nos dois modos: com uma view async no ASGI, um middleware só
+    # síncrono obrigaria o Django a rodar o request inteiro numa thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = configuracao()
+        if not self.config['ATIVO']:
+            raise MiddlewareNotUsed
+        self.ultimo_snapshot = 0.0
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        contador = _ContadorDeQueries()
+        request._metricas_template = 0.0
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        if self._registrar(request, time.perf_counter() - inicio, contador):
+            gravar_snapshot()
+        return response
+
+    async def __acall__(self, request):
+        contador = _ContadorDeQueries()
+        request._metricas_template = 0.0
+        inicio = time.perf_counter()
+        # O ORM async roda as queries na thread do sync_to_async (uma por
+        # request), então o contador vai na conexão daquela thread
+        await sync_to_async(lambda: connection.execute_wrappers.append(contador))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(contador))()
+        if self._registrar(request, time.perf_counter() - inicio, contador):
+            # O cache em arquivo faria I/O bloqueante dentro do event loop
+            await sync_to_async(gravar_snapshot)()
+        return response
+
+    def _registrar(self, request, duracao, contador):
+        """ Soma o request nos histogramas; retorna True se está na hora de gravar o snapshot. """
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<sem view>'
+        REGISTRO.observar(view, {
+            'duracao_segundos': duracao,
+            'db_segundos': contador.tempo,
+            'template_segundos': request._metricas_template,
+            'queries': contador.quantidade,
+        })
+        self._verificar_limites(request, view, duracao, contador)
+
+        agora = time.monotonic()
+        if agora - self.ultimo_snapshot < self.config['INTERVALO_SNAPSHOT']:
+            return False
+        self.ultimo_snapshot = agora
+        return True
+
+    def process_template_response(self, request, response):
+        # O Django renderiza logo depois deste hook; o callback marca o fim
+        inicio = time.perf_counter()
+
+        def medir(response):
+            request._metricas_template += time.perf_counter() - inicio
+
+        response.add_post_render_callback(medir)
+        return response
+
+    def _verificar_limites(self, request, view, duracao, contador):
+        limite_queries = self.config['LIMITES_QUERIES_POR_VIEW'].get(view, self.config['LIMITE_QUERIES'])
+        limite_tempo = self.config['LIMITE_TEMPO_MS']
+        estourou_queries = limite_queries is not None and contador.quantidade > limite_queries
+        estourou_tempo = limite_tempo is not None and duracao * 1000 > limite_tempo
+        if not (estourou_queries or estourou_tempo):
+            return
+        repetidas = [
+            f'{quantidade}x {sql[:200]}' for sql, quantidade in contador.sqls.most_common(3) if quantidade > 1
+        ]
+        mensagem = 'Request acima do orçamento: %s %s (view %s) levou %.0f ms com %d queries (%.0f ms no banco).%s' % (
+            request.method, request.path, view, duracao * 1000, contador.quantidade, contador.tempo * 1000,
+            ''.join(f'\n  {linha}' for linha in repetidas),
+        )
+        if self.config['ESTRITO']:
+            raise OrcamentoExcedido(mensagem)
+        logger.warning(mensagem)
+
+def percentil(histograma, buckets, fracao):
+    """ Limite superior do bucket onde cai o percentil (aproximado, como no Prometheus). """
+    alvo = histograma['total'] * fracao
+    acumulado = 0
+    for limite, contagem in zip([*buckets, float('inf')], histograma['contagens']):
+        acumulado += contagem
+        if acumulado >= alvo:
+            return limite
+    return float('inf')
+
+
+def resumo(dados):
+    """ Uma linha por view, da que mais consumiu tempo no total para a que menos. """
+    linhas = []
+    for view, metricas in dados.items():
+        duracao = metricas['duracao_segundos']
+        if not duracao['total']:
+            continue
+        total = duracao['total']
+        linhas.append({
+            'view': view,
+            'requests': total,
+            'media_ms': duracao['soma'] / total * 1000,
+            'p95_ms': percentil(duracao, BUCKETS_SEGUNDOS, 0.95) * 1000,
+            'media_queries': metricas['queries']['soma'] / total,
+            'p95_queries': percentil(metricas['queries'], BUCKETS_QUERIES, 0.95),
+            'media_db_ms': metricas['db_segundos']['soma'] / total * 1000,
+            'media_template_ms': metricas['template_segundos']['soma'] / total * 1000,
+            'total_s': duracao['soma'],
+        })
+    return sorted(linhas, key=lambda linha: -linha['total_s'])
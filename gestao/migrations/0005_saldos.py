@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def preencher_saldos(apps, schema_editor):
+    """ Monta os saldos iniciais a partir das participações que já existem. """
+    ParticipanteConta = apps.get_model('gestao', 'ParticipanteConta')
+    Saldo = apps.get_model('gestao', 'Saldo')
+    SaldoMorador = apps.get_model('gestao', 'SaldoMorador')
+
+    pares = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+    abertas = ParticipanteConta.objects.exclude(status_pagamento='PAGO').values_list(
+        'conta__republica_id', 'usuario_id', 'conta__responsavel_id', 'valor_individual', 'status_pagamento'
+    )
+    for republica_id, devedor_id, credor_id, valor, status in abertas.iterator():
+        if devedor_id == credor_id:
+            continue
+        par = pares[(republica_id, devedor_id, credor_id)]
+        par[0] += valor
+        if status == 'CONFIRMACAO_PENDENTE':
+            par[1] += valor
+
+    totais = defaultdict(lambda: [Decimal('0.00'), Decimal('0.00')])
+    for (republica_id, devedor_id, credor_id), (devido, _) in pares.items():
+        totais[(republica_id, devedor_id)][0] += devido
+        totais[(republica_id, credor_id)][1] += devido
+
+    Saldo.objects.bulk_create([
+        Saldo(republica_id=republica_id, devedor_id=devedor_id, credor_id=credor_id,
+              valor_devido=devido, valor_em_confirmacao=em_confirmacao)
+        for (republica_id, devedor_id, credor_id), (devido, em_confirmacao) in pares.items()
+    ], batch_size=500)
+    SaldoMorador.objects.bulk_create([
+        SaldoMorador(republica_id=republica_id, usuario_id=usuario_id,
+                     total_devido=devido, total_a_receber=a_receber)
+        for (republica_id, usuario_id), (devido, a_receber) in totais.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0004_rename_status_conta_usuario_status_associacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuario',
+            name='status_associacao',
+            field=models.CharField(choices=[('AGUARDANDO_APROVACAO', 'Aguardando Aprovacao'), ('APROVADO', 'Aprovado'), ('NAO_APROVADO', 'Nao Aprovado')], default='NAO_APROVADO', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Saldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_devido', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('valor_em_confirmacao', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('credor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_a_receber', to=settings.AUTH_USER_MODEL)),
+                ('devedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_devidos', to=settings.AUTH_USER_MODEL)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='gestao.republica')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('republica', 'devedor', 'credor'), name='saldo_unico_por_par')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoMorador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_devido', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_a_receber', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_moradores', to='gestao.republica')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_morador', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('republica', 'usuario'), name='saldo_morador_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_saldos, migrations.RunPython.noop),
+    ]
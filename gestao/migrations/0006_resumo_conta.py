@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def preencher_resumo(apps, schema_editor):
+    """ Calcula status e totais das contas que já existem. """
+    Conta = apps.get_model('gestao', 'Conta')
+    ParticipanteConta = apps.get_model('gestao', 'ParticipanteConta')
+
+    pago = Q(status_pagamento='PAGO')
+    linhas = ParticipanteConta.objects.values('conta_id').annotate(
+        qtd_pagos=Count('id', filter=pago),
+        qtd_nao_pagos=Count('id', filter=~pago),
+        valor_pago=Sum('valor_individual', filter=pago),
+        valor_em_aberto=Sum('valor_individual', filter=~pago),
+    ).order_by()
+
+    contas = []
+    for linha in linhas.iterator():
+        if linha['qtd_pagos'] and not linha['qtd_nao_pagos']:
+            status = 'PAGA'
+        elif linha['qtd_pagos']:
+            status = 'PARCIALMENTE_PAGA'
+        else:
+            status = 'NAO_PAGA'
+        contas.append(Conta(
+            pk=linha['conta_id'], status_conta=status,
+            qtd_pagos=linha['qtd_pagos'], qtd_nao_pagos=linha['qtd_nao_pagos'],
+            valor_pago=linha['valor_pago'] or 0, valor_em_aberto=linha['valor_em_aberto'] or 0,
+        ))
+    Conta.objects.bulk_update(
+        contas, ['status_conta', 'qtd_pagos', 'qtd_nao_pagos', 'valor_pago', 'valor_em_aberto'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0005_saldos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conta',
+            name='qtd_nao_pagos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conta',
+            name='qtd_pagos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conta',
+            name='valor_em_aberto',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='conta',
+            name='valor_pago',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='conta',
+            index=models.Index(fields=['republica', 'status_conta'], name='conta_rep_status_idx'),
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
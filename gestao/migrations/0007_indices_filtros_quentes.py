@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('gestao', '0006_resumo_conta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participanteconta',
+            index=models.Index(fields=['usuario', 'status_pagamento'], name='pc_usuario_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participanteconta',
+            index=models.Index(condition=models.Q(('status_pagamento', 'CONFIRMACAO_PENDENTE')), fields=['conta'], name='pc_confirmacao_pendente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['republica', 'status_associacao'], name='usuario_rep_status_idx'),
+        ),
+    ]
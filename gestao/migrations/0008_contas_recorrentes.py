@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0007_indices_filtros_quentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conta',
+            name='competencia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ContaRecorrente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_conta', models.CharField(max_length=100)),
+                ('valor_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('dia_vencimento', models.PositiveSmallIntegerField()),
+                ('ativa', models.BooleanField(default=True)),
+                ('participantes', models.ManyToManyField(related_name='contas_recorrentes', to=settings.AUTH_USER_MODEL)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contas_recorrentes', to='gestao.republica')),
+                ('responsavel', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='contas_recorrentes_responsaveis', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conta',
+            name='recorrencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contas_geradas', to='gestao.contarecorrente'),
+        ),
+        migrations.AddConstraint(
+            model_name='conta',
+            constraint=models.UniqueConstraint(condition=models.Q(('recorrencia__isnull', False)), fields=('recorrencia', 'competencia'), name='conta_unica_por_competencia'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0008_contas_recorrentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='versao_dados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:33
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia de gestao.busca.normalizar/trigramas como eram nesta migração: o
+# índice montado aqui tem que ser o mesmo que o app montava na época
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(letra for letra in texto if not unicodedata.combining(letra))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto.lower()))
+
+
+def trigramas(texto):
+    resultado = set()
+    for palavra in normalizar(texto).split():
+        palavra = f'  {palavra} '
+        resultado.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return resultado
+
+
+def indexar_republicas(apps, schema_editor):
+    """ Monta o índice de busca das repúblicas que já existem. """
+    Republica = apps.get_model('gestao', 'Republica')
+    TrigramaRepublica = apps.get_model('gestao', 'TrigramaRepublica')
+    linhas = [
+        TrigramaRepublica(republica_id=pk, trigrama=trigrama)
+        for pk, nome in Republica.objects.values_list('pk', 'nome').iterator()
+        for trigrama in trigramas(nome)
+    ]
+    TrigramaRepublica.objects.bulk_create(linhas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0009_usuario_versao_dados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaRepublica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='gestao.republica')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigrama', 'republica'), name='trigrama_republica_unico')],
+            },
+        ),
+        migrations.RunPython(indexar_republicas, migrations.RunPython.noop),
+    ]
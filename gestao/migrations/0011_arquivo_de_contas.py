@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:36
+
+from datetime import datetime, time
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_quitada_em(apps, schema_editor):
+    """
+    Não se sabe quando as contas que já estão pagas foram quitadas; usa o
+    vencimento como aproximação (o comum é pagar perto dele).
+    """
+    Conta = apps.get_model('gestao', 'Conta')
+    contas = []
+    for pk, vencimento in Conta.objects.filter(status_conta='PAGA').values_list('pk', 'data_vencimento').iterator():
+        quitada_em = datetime.combine(vencimento, time())
+        if settings.USE_TZ:
+            quitada_em = timezone.make_aware(quitada_em)
+        contas.append(Conta(pk=pk, quitada_em=quitada_em))
+    Conta.objects.bulk_update(contas, ['quitada_em'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0010_busca_republicas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContaArquivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nome_conta', models.CharField(max_length=100)),
+                ('valor_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data_vencimento', models.DateField()),
+                ('tipo', models.CharField(choices=[('FIXA', 'Fixa'), ('VARIAVEL', 'Variável')], max_length=20)),
+                ('competencia', models.DateField(blank=True, null=True)),
+                ('quitada_em', models.DateTimeField()),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ParticipanteArquivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_individual', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conta',
+            name='quitada_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='conta',
+            index=models.Index(condition=models.Q(('status_conta', 'PAGA')), fields=['quitada_em'], name='conta_quitada_idx'),
+        ),
+        migrations.AddField(
+            model_name='contaarquivada',
+            name='recorrencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contas_arquivadas', to='gestao.contarecorrente'),
+        ),
+        migrations.AddField(
+            model_name='contaarquivada',
+            name='republica',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contas_arquivadas', to='gestao.republica'),
+        ),
+        migrations.AddField(
+            model_name='contaarquivada',
+            name='responsavel',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contas_arquivadas_responsaveis', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='participantearquivado',
+            name='conta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participantes', to='gestao.contaarquivada'),
+        ),
+        migrations.AddField(
+            model_name='participantearquivado',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participacoes_arquivadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(preencher_quitada_em, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def preencher_relatorios(apps, schema_editor):
+    """ Calcula os resumos mensais das contas que já existem (inclusive arquivadas). """
+    Conta = apps.get_model('gestao', 'Conta')
+    ContaArquivada = apps.get_model('gestao', 'ContaArquivada')
+    ParticipanteConta = apps.get_model('gestao', 'ParticipanteConta')
+    ParticipanteArquivado = apps.get_model('gestao', 'ParticipanteArquivado')
+    ResumoMensal = apps.get_model('gestao', 'ResumoMensal')
+    ResumoMorador = apps.get_model('gestao', 'ResumoMorador')
+
+    totais = {}
+    for modelo, pago in ((Conta, Sum('valor_pago')), (ContaArquivada, Sum('valor_total'))):
+        linhas = modelo.objects.values('republica_id', 'tipo', mes=TruncMonth('data_vencimento')).annotate(
+            qtd=Count('id'), total=Sum('valor_total'), pago=pago,
+        ).order_by()
+        for linha in linhas.iterator():
+            soma = totais.setdefault((linha['republica_id'], linha['mes'], linha['tipo']), [0, 0, 0])
+            soma[0] += linha['qtd']
+            soma[1] += linha['total']
+            soma[2] += linha['pago'] or 0
+    ResumoMensal.objects.bulk_create([
+        ResumoMensal(republica_id=republica_id, competencia=mes, tipo=tipo,
+                     qtd_contas=qtd, valor_total=total, valor_pago=pago)
+        for (republica_id, mes, tipo), (qtd, total, pago) in totais.items()
+    ], batch_size=500)
+
+    por_morador = {}
+    for modelo, pago in (
+        (ParticipanteConta, Sum('valor_individual', filter=Q(status_pagamento='PAGO'))),
+        (ParticipanteArquivado, Sum('valor_individual')),
+    ):
+        linhas = modelo.objects.values(
+            'usuario_id', republica_id=F('conta__republica_id'), mes=TruncMonth('conta__data_vencimento'),
+        ).annotate(total=Sum('valor_individual'), pago=pago).order_by()
+        for linha in linhas.iterator():
+            soma = por_morador.setdefault((linha['republica_id'], linha['usuario_id'], linha['mes']), [0, 0])
+            soma[0] += linha['total']
+            soma[1] += linha['pago'] or 0
+    ResumoMorador.objects.bulk_create([
+        ResumoMorador(republica_id=republica_id, usuario_id=usuario_id, competencia=mes,
+                      valor_total=total, valor_pago=pago)
+        for (republica_id, usuario_id, mes), (total, pago) in por_morador.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0011_arquivo_de_contas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField()),
+                ('tipo', models.CharField(choices=[('FIXA', 'Fixa'), ('VARIAVEL', 'Variável')], max_length=20)),
+                ('qtd_contas', models.PositiveIntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='gestao.republica')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('republica', 'competencia', 'tipo'), name='resumo_mensal_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoMorador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField()),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_moradores', to='gestao.republica')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'republica', 'competencia'), name='resumo_morador_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_relatorios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0012_relatorios_mensais'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participanteconta',
+            name='versao',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
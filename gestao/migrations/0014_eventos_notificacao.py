@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0013_participanteconta_versao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoNotificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=40)),
+                ('usuarios', models.JSONField()),
+                ('dados', models.JSONField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('republica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='gestao.republica')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['republica', 'id'], name='evento_republica_idx'), models.Index(fields=['criado_em'], name='evento_criado_em_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0015_tarefas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LembreteEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('A_VENCER', 'A vencer'), ('ATRASADA', 'Atrasada')], max_length=10)),
+                ('enviado_em', models.DateTimeField(auto_now_add=True)),
+                ('participacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lembretes', to='gestao.participanteconta')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('participacao', 'tipo'), name='lembrete_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:19
+
+from itertools import islice
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Os códigos de EventoTransicao.Estado/Tipo no momento desta migração
+PAGAMENTO, MEMBRESIA = 1, 2
+INEXISTENTE = 0
+ESTADOS = {
+    'NAO_PAGO': 1, 'CONFIRMACAO_PENDENTE': 2, 'PAGO': 3,
+    'AGUARDANDO_APROVACAO': 11, 'APROVADO': 12, 'NAO_APROVADO': 13,
+}
+
+
+def _gravar_em_lotes(modelo, eventos, lote=2000):
+    # bulk_create transforma tudo em lista; aqui cada lote é lido e gravado por vez
+    while True:
+        parte = list(islice(eventos, lote))
+        if not parte:
+            return
+        modelo.objects.bulk_create(parte)
+
+
+def registrar_estado_atual(apps, schema_editor):
+    """
+    O que já existe entra no registro como criado agora (INEXISTENTE -> status
+    atual), para o replay partir do mesmo estado das tabelas.
+    """
+    EventoTransicao = apps.get_model('gestao', 'EventoTransicao')
+    ParticipanteConta = apps.get_model('gestao', 'ParticipanteConta')
+    Usuario = apps.get_model('gestao', 'Usuario')
+
+    _gravar_em_lotes(EventoTransicao, (
+        EventoTransicao(
+            tipo=PAGAMENTO, de=INEXISTENTE, para=ESTADOS[status], republica_id=republica_id, usuario_id=usuario_id,
+            participacao_id=pk, conta_id=conta_id, responsavel_id=responsavel_id, valor=valor,
+        )
+        for pk, conta_id, republica_id, usuario_id, responsavel_id, valor, status in ParticipanteConta.objects.order_by(
+            'pk',
+        ).values_list(
+            'pk', 'conta_id', 'conta__republica_id', 'usuario_id', 'conta__responsavel_id',
+            'valor_individual', 'status_pagamento',
+        ).iterator(chunk_size=2000)
+    ))
+    _gravar_em_lotes(EventoTransicao, (
+        EventoTransicao(
+            tipo=MEMBRESIA, de=INEXISTENTE, para=ESTADOS[status], republica_id=republica_id, usuario_id=pk,
+        )
+        for pk, republica_id, status in Usuario.objects.filter(republica__isnull=False).order_by('pk').values_list(
+            'pk', 'republica_id', 'status_associacao',
+        ).iterator(chunk_size=2000)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0016_lembretes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoTransicao',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.PositiveSmallIntegerField(choices=[(1, 'Pagamento'), (2, 'Membresia')])),
+                ('de', models.PositiveSmallIntegerField(choices=[(0, 'Inexistente'), (1, 'Não Pago'), (2, 'Confirmação Pendente'), (3, 'Pago'), (11, 'Aguardando Aprovacao'), (12, 'Aprovado'), (13, 'Nao Aprovado')])),
+                ('para', models.PositiveSmallIntegerField(choices=[(0, 'Inexistente'), (1, 'Não Pago'), (2, 'Confirmação Pendente'), (3, 'Pago'), (11, 'Aguardando Aprovacao'), (12, 'Aprovado'), (13, 'Nao Aprovado')])),
+                ('republica_id', models.BigIntegerField(null=True)),
+                ('usuario_id', models.BigIntegerField()),
+                ('participacao_id', models.BigIntegerField(null=True)),
+                ('conta_id', models.BigIntegerField(null=True)),
+                ('responsavel_id', models.BigIntegerField(null=True)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('ator_id', models.BigIntegerField(null=True)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tipo', 'participacao_id', 'id'], name='transicao_participacao_idx'), models.Index(fields=['usuario_id', 'id'], name='transicao_usuario_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_estado_atual, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models.functions import Coalesce, TruncMonth
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 class Usuario(AbstractUser):
     class StatusAssociacao(models.TextChoices):
@@ -17,6 +21,14 @@ class Usuario(AbstractUser):
         related_name='moradores' # Nome para acessar os usuários a partir da república
     )
     status_associacao = models.CharField(max_length=20, choices=StatusAssociacao.choices, default=StatusAssociacao.NAO_APROVADO)
+    # Incrementado sempre que algo da dashboard deste usuário muda (ver gestao.cache)
+    versao_dados = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Moradores/solicitações de uma república (dashboard do ADM e ContaCreateForm)
+            models.Index(fields=['republica', 'status_associacao'], name='usuario_rep_status_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -53,10 +65,117 @@ class Conta(models.Model):
         related_name='contas_responsaveis'
     )
     status_conta = models.CharField(max_length=20, choices=StatusConta.choices, default=StatusConta.NAO_PAGA)
+    # Preenchidos quando a conta foi gerada por uma ContaRecorrente
+    recorrencia = models.ForeignKey(
+        'ContaRecorrente',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='contas_geradas'
+    )
+    competencia = models.DateField(null=True, blank=True) # Primeiro dia do mês de referência
+    # Resumo dos participantes, mantido por 'Conta.atualizar_resumo'
+    qtd_pagos = models.PositiveIntegerField(default=0)
+    qtd_nao_pagos = models.PositiveIntegerField(default=0)
+    valor_pago = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    valor_em_aberto = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Quando a conta ficou PAGA (None enquanto não está); usado pelo 'arquivar_contas'
+    quitada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Listagem de contas em aberto por república (e o list_filter do admin)
+            models.Index(fields=['republica', 'status_conta'], name='conta_rep_status_idx'),
+            # Contas quitadas há muito tempo, candidatas ao arquivo
+            models.Index(
+                fields=['quitada_em'],
+                condition=models.Q(status_conta='PAGA'),
+                name='conta_quitada_idx',
+            ),
+        ]
+        constraints = [
+            # Garante que rodar o gerador de recorrentes duas vezes não duplica contas
+            models.UniqueConstraint(
+                fields=['recorrencia', 'competencia'],
+                condition=models.Q(recorrencia__isnull=False),
+                name='conta_unica_por_competencia',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nome_conta} - {self.republica.nome}"
 
+    @classmethod
+    def atualizar_resumo(cls, conta_ids, relatorios=True):
+        """
+        Recalcula status_conta, contagens e valores das contas a partir dos
+        participantes. Deve ser chamado na MESMA transação que mudou o
+        status_pagamento (ou criou/apagou participantes). Os relatórios dos
+        meses delas (ResumoMensal) ficam para os workers ('ResumoMensal.agendar');
+        'relatorios=False' pula isso, para quem vai reconstruí-los inteiros.
+        """
+        conta_ids = set(conta_ids)
+        if not conta_ids:
+            return
+
+        # Dois UPDATEs com subqueries correlacionadas (o banco soma pelo índice
+        # de conta dos participantes), em vez de ler as somas e mandar um
+        # bulk_update: com milhares de contas (o acerto de contas quita todas
+        # de uma vez), montar o CASE de cada linha no Python levava segundos.
+        pago = models.Q(status_pagamento=ParticipanteConta.StatusPagamento.PAGO)
+        participantes = ParticipanteConta.objects.filter(conta_id=models.OuterRef('pk')).order_by().values('conta_id')
+
+        def total(agregado, filtro, output_field):
+            return Coalesce(
+                models.Subquery(participantes.filter(filtro).annotate(total=agregado).values('total')),
+                models.Value(0), output_field=output_field,
+            )
+
+        decimal = models.DecimalField(max_digits=10, decimal_places=2)
+        contas = cls.objects.filter(pk__in=conta_ids)
+        contas.update(
+            qtd_pagos=total(models.Count('id'), pago, models.IntegerField()),
+            qtd_nao_pagos=total(models.Count('id'), ~pago, models.IntegerField()),
+            valor_pago=total(models.Sum('valor_individual'), pago, decimal),
+            valor_em_aberto=total(models.Sum('valor_individual'), ~pago, decimal),
+        )
+        quitada = models.Q(qtd_pagos__gt=0, qtd_nao_pagos=0)
+        contas.update(
+            status_conta=models.Case(
+                models.When(quitada, then=models.Value(cls.StatusConta.PAGA)),
+                models.When(qtd_pagos__gt=0, then=models.Value(cls.StatusConta.PARCIALMENTE_PAGA)),
+                default=models.Value(cls.StatusConta.NAO_PAGA),
+            ),
+            # Mantém a data se ela já estava quitada
+            quitada_em=models.Case(
+                models.When(quitada, then=Coalesce(models.F('quitada_em'), models.Value(timezone.now()))),
+                default=None,
+            ),
+        )
+        # Os relatórios mensais dependem dos mesmos valores
+        if relatorios:
+            ResumoMensal.agendar(ResumoMensal.meses_das_contas(conta_ids))
+
+class ContaRecorrente(models.Model):
+    """
+    Definição de uma conta FIXA que se repete todo mês (aluguel, internet...).
+    As contas de cada mês são geradas por 'manage.py gerar_contas_recorrentes'.
+    """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='contas_recorrentes')
+    nome_conta = models.CharField(max_length=100)
+    valor_total = models.DecimalField(max_digits=10, decimal_places=2)
+    dia_vencimento = models.PositiveSmallIntegerField() # Se o mês for mais curto, vence no último dia
+    responsavel = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name='contas_recorrentes_responsaveis'
+    )
+    participantes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='contas_recorrentes')
+    ativa = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.nome_conta} (todo dia {self.dia_vencimento}) - {self.republica_id}"
+
 class ParticipanteConta(models.Model):
     class StatusPagamento(models.TextChoices):
         NAO_PAGO = 'NAO_PAGO', 'Não Pago'
@@ -67,6 +186,406 @@ class ParticipanteConta(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participacoes')
     valor_individual = models.DecimalField(max_digits=10, decimal_places=2)
     status_pagamento = models.CharField(max_length=25, choices=StatusPagamento.choices, default=StatusPagamento.NAO_PAGO)
+    # Incrementada a cada mudança de status (gestao.transicoes); o formulário
+    # manda a versão que viu, e o UPDATE só aplica se ela ainda for a atual
+    versao = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # "Minhas contas" da dashboard: filtra por usuário e ordena por status
+            models.Index(fields=['usuario', 'status_pagamento'], name='pc_usuario_status_idx'),
+            # Painel do responsável: só as participações esperando confirmação.
+            # Índice parcial, então fica pequeno mesmo com o histórico crescendo.
+            models.Index(
+                fields=['conta'],
+                condition=models.Q(status_pagamento='CONFIRMACAO_PENDENTE'),
+                name='pc_confirmacao_pendente_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario.username} na conta {self.conta.nome_conta}"
+
+class LembreteEnviado(models.Model):
+    """
+    Registro dos lembretes de vencimento já mandados (gestao.lembretes): cada
+    participação recebe no máximo um lembrete de cada tipo.
+    """
+
+    class Tipo(models.TextChoices):
+        A_VENCER = 'A_VENCER', 'A vencer'
+        ATRASADA = 'ATRASADA', 'Atrasada'
+
+    participacao = models.ForeignKey(ParticipanteConta, on_delete=models.CASCADE, related_name='lembretes')
+    tipo = models.CharField(max_length=10, choices=Tipo.choices)
+    enviado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Também é o índice da checagem "já foi lembrado?"
+            models.UniqueConstraint(fields=['participacao', 'tipo'], name='lembrete_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - participação {self.participacao_id}"
+
+
+class Saldo(models.Model):
+    """
+    Quanto o 'devedor' deve para o 'credor' (responsável pelas contas)
+    dentro de uma república. É mantido incrementalmente por 'gestao.saldos'
+    a cada mudança de status, então não é preciso varrer os ParticipanteConta.
+    """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='saldos')
+    devedor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saldos_devidos')
+    credor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saldos_a_receber')
+    # Tudo que ainda não foi confirmado como PAGO (inclui o que está em confirmação)
+    valor_devido = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Parte do valor_devido que já foi marcada como paga e espera o responsável
+    valor_em_confirmacao = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['republica', 'devedor', 'credor'], name='saldo_unico_por_par'),
+        ]
+
+    def __str__(self):
+        return f"{self.devedor_id} deve {self.valor_devido} para {self.credor_id}"
+
+
+class SaldoMorador(models.Model):
+    """ Totais por morador: quanto ele deve e quanto tem a receber na república. """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='saldos_moradores')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saldos_morador')
+    total_devido = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_a_receber = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['republica', 'usuario'], name='saldo_morador_unico'),
+        ]
+
+    def __str__(self):
+        return f"Saldo de {self.usuario_id} na república {self.republica_id}"
+
+
+class TrigramaRepublica(models.Model):
+    """
+    Índice de busca por nome de república (veja 'gestao.busca').
+    Uma linha por trigrama do nome normalizado (sem acentos, minúsculo).
+    """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='trigramas')
+    trigrama = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            # Também serve de índice: a busca filtra por trigrama e agrupa por república
+            models.UniqueConstraint(fields=['trigrama', 'republica'], name='trigrama_republica_unico'),
+        ]
 
     def __str__(self):
-        return f"{self.usuario.username} na conta {self.conta.nome_conta}"
\ No newline at end of file
+        return f"{self.trigrama!r} de {self.republica_id}"
+
+
+class ContaArquivada(models.Model):
+    """
+    Conta quitada que saiu das tabelas do dia a dia (comando 'arquivar_contas').
+    Guarda o MESMO id da Conta original, para o histórico (gestao.arquivo)
+    poder intercalar as duas tabelas na mesma ordem.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='contas_arquivadas')
+    nome_conta = models.CharField(max_length=100)
+    valor_total = models.DecimalField(max_digits=10, decimal_places=2)
+    data_vencimento = models.DateField()
+    tipo = models.CharField(max_length=20, choices=Conta.TipoConta.choices)
+    # No histórico, o responsável pode ir embora (a conta já está paga)
+    responsavel = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='contas_arquivadas_responsaveis'
+    )
+    recorrencia = models.ForeignKey(
+        ContaRecorrente,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='contas_arquivadas'
+    )
+    competencia = models.DateField(null=True, blank=True)
+    quitada_em = models.DateTimeField()
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nome_conta} (arquivada)"
+
+
+class ParticipanteArquivado(models.Model):
+    """ Participação de uma ContaArquivada. Está sempre PAGA. """
+    status_pagamento = ParticipanteConta.StatusPagamento.PAGO
+
+    conta = models.ForeignKey(ContaArquivada, on_delete=models.CASCADE, related_name='participantes')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participacoes_arquivadas')
+    valor_individual = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.usuario_id} na conta arquivada {self.conta_id}"
+
+
+def _mes_seguinte(competencia):
+    return (competencia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class ResumoMensal(models.Model):
+    """
+    Total das contas de uma república por mês (de vencimento) e tipo, para
+    os relatórios (gestao.relatorios). Junto com ResumoMorador, é recalculado
+    só para os meses que mudaram, por 'recalcular'. Quem muda contas chama
+    'agendar' ('Conta.atualizar_resumo' e onde contas são criadas ou apagadas)
+    e os workers fazem o recálculo, fora do request. Inclui as contas arquivadas.
+    """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='resumos_mensais')
+    competencia = models.DateField() # Primeiro dia do mês
+    tipo = models.CharField(max_length=20, choices=Conta.TipoConta.choices)
+    qtd_contas = models.PositiveIntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    valor_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    MESES_POR_LOTE = 200
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['republica', 'competencia', 'tipo'], name='resumo_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.republica_id} {self.competencia:%Y-%m} {self.tipo}"
+
+    @staticmethod
+    def meses_das_contas(conta_ids):
+        """ (republica_id, competencia) de cada conta. """
+        return {
+            (republica_id, vencimento.replace(day=1))
+            for republica_id, vencimento in Conta.objects.filter(pk__in=set(conta_ids))
+            .values_list('republica_id', 'data_vencimento')
+        }
+
+    @staticmethod
+    def agendar(meses):
+        """ Enfileira 'recalcular' desses meses para os workers (gestao.tarefas). """
+        meses = sorted({(republica_id, competencia.isoformat()) for republica_id, competencia in meses})
+        if meses:
+            Tarefa.enfileirar('recalcular_relatorios', [{'meses': [list(mes) for mes in meses]}])
+
+    @classmethod
+    def recalcular(cls, meses):
+        """
+        Refaz ResumoMensal e ResumoMorador dos meses (republica_id, competencia)
+        com um GROUP BY por tabela restrito a esses meses, não ao histórico todo.
+        Os meses vão em lotes de MESES_POR_LOTE: cada mês é um OR no WHERE, e o
+        SQLite recusa expressões com mais de 1000 níveis.
+        """
+        meses = sorted(set(meses))
+        for inicio in range(0, len(meses), cls.MESES_POR_LOTE):
+            cls._recalcular_lote(meses[inicio:inicio + cls.MESES_POR_LOTE])
+
+    @classmethod
+    def _recalcular_lote(cls, meses):
+        def no_periodo(prefixo=''):
+            condicao = models.Q()
+            for republica_id, competencia in meses:
+                condicao |= models.Q(**{
+                    f'{prefixo}republica_id': republica_id,
+                    f'{prefixo}data_vencimento__gte': competencia,
+                    f'{prefixo}data_vencimento__lt': _mes_seguinte(competencia),
+                })
+            return condicao
+
+        mes = TruncMonth('data_vencimento')
+        totais = {}
+        for linha in Conta.objects.filter(no_periodo()).values('republica_id', 'tipo', mes=mes).annotate(
+            qtd=models.Count('id'), total=models.Sum('valor_total'), pago=models.Sum('valor_pago'),
+        ).order_by():
+            totais[(linha['republica_id'], linha['mes'], linha['tipo'])] = [linha['qtd'], linha['total'], linha['pago']]
+        # Conta arquivada está sempre paga
+        for linha in ContaArquivada.objects.filter(no_periodo()).values('republica_id', 'tipo', mes=mes).annotate(
+            qtd=models.Count('id'), total=models.Sum('valor_total'),
+        ).order_by():
+            soma = totais.setdefault((linha['republica_id'], linha['mes'], linha['tipo']), [0, 0, 0])
+            soma[0] += linha['qtd']
+            soma[1] += linha['total']
+            soma[2] += linha['total']
+
+        mes = TruncMonth('conta__data_vencimento')
+        pago = models.Q(status_pagamento=ParticipanteConta.StatusPagamento.PAGO)
+        por_morador = {}
+        for linha in ParticipanteConta.objects.filter(no_periodo('conta__')).values(
+            'usuario_id', republica_id=models.F('conta__republica_id'), mes=mes,
+        ).annotate(
+            total=models.Sum('valor_individual'), pago=models.Sum('valor_individual', filter=pago),
+        ).order_by():
+            por_morador[(linha['republica_id'], linha['usuario_id'], linha['mes'])] = [linha['total'], linha['pago'] or 0]
+        for linha in ParticipanteArquivado.objects.filter(no_periodo('conta__')).values(
+            'usuario_id', republica_id=models.F('conta__republica_id'), mes=mes,
+        ).annotate(total=models.Sum('valor_individual')).order_by():
+            soma = por_morador.setdefault((linha['republica_id'], linha['usuario_id'], linha['mes']), [0, 0])
+            soma[0] += linha['total']
+            soma[1] += linha['total']
+
+        dos_meses = models.Q()
+        for republica_id, competencia in meses:
+            dos_meses |= models.Q(republica_id=republica_id, competencia=competencia)
+        cls.objects.filter(dos_meses).delete()
+        ResumoMorador.objects.filter(dos_meses).delete()
+        cls.objects.bulk_create([
+            cls(republica_id=republica_id, competencia=competencia, tipo=tipo,
+                qtd_contas=qtd, valor_total=total, valor_pago=valor_pago)
+            for (republica_id, competencia, tipo), (qtd, total, valor_pago) in totais.items()
+        ])
+        ResumoMorador.objects.bulk_create([
+            ResumoMorador(republica_id=republica_id, usuario_id=usuario_id, competencia=competencia,
+                          valor_total=total, valor_pago=valor_pago)
+            for (republica_id, usuario_id, competencia), (total, valor_pago) in por_morador.items()
+        ], batch_size=500)
+
+
+class ResumoMorador(models.Model):
+    """ Quanto um morador teve de contas num mês e quanto disso já pagou (veja ResumoMensal). """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='resumos_moradores')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='resumos_mensais')
+    competencia = models.DateField()
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    valor_pago = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'republica', 'competencia'], name='resumo_morador_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} em {self.competencia:%Y-%m}"
+
+    @property
+    def valor_em_aberto(self):
+        return self.valor_total - self.valor_pago
+
+
+class EventoNotificacao(models.Model):
+    """
+    Outbox das notificações ao vivo (gestao.eventos), usada quando
+    GESTAO_EVENTOS['OUTBOX'] está ligado: cada worker lê daqui os eventos
+    publicados por todos os outros.
+    """
+    republica = models.ForeignKey(Republica, on_delete=models.CASCADE, related_name='eventos')
+    tipo = models.CharField(max_length=40)
+    usuarios = models.JSONField() # ids de quem deve receber
+    dados = models.JSONField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Cada conexão lê "eventos da minha república depois do último que vi"
+            models.Index(fields=['republica', 'id'], name='evento_republica_idx'),
+            models.Index(fields=['criado_em'], name='evento_criado_em_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk}"
+
+
+class Tarefa(models.Model):
+    """
+    Fila de trabalho em segundo plano (gestao.tarefas), consumida pelos
+    processos de 'manage.py run_workers'. Como é uma tabela, enfileirar na
+    mesma transação da mudança garante que a tarefa só existe se a mudança
+    foi gravada.
+    """
+
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Pendente'
+        EXECUTANDO = 'EXECUTANDO', 'Executando'
+        CONCLUIDA = 'CONCLUIDA', 'Concluída'
+        FALHOU = 'FALHOU', 'Falhou' # Esgotou as tentativas
+
+    nome = models.CharField(max_length=50)
+    argumentos = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    executar_em = models.DateTimeField(default=timezone.now) # Adiada a cada nova tentativa
+    travada_por = models.CharField(max_length=100, blank=True) # Worker que pegou a tarefa
+    travada_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Os workers buscam "pendentes que já podem rodar, das mais antigas"
+            models.Index(fields=['status', 'executar_em'], name='tarefa_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} #{self.pk} ({self.status})"
+
+    @classmethod
+    def enfileirar(cls, nome, lista_de_argumentos):
+        """ Cria uma tarefa 'nome' para cada dicionário de argumentos (um INSERT só). """
+        return cls.objects.bulk_create([cls(nome=nome, argumentos=argumentos) for argumentos in lista_de_argumentos])
+
+
+class EventoTransicao(models.Model):
+    """
+    Registro só de inclusão de toda mudança de status de pagamento e de
+    membresia (gestao.auditoria), gravado na mesma transação da mudança.
+    As linhas são compactas (códigos inteiros, ids sem FK, nenhum JSON) e
+    ninguém as altera nem apaga: as referências são ids soltos justamente
+    para o histórico sobreviver às contas, participações e usuários apagados.
+    Os ids são BigIntegerField, da largura dos pks (BigAutoField) que copiam.
+    """
+
+    class Tipo(models.IntegerChoices):
+        PAGAMENTO = 1, 'Pagamento'
+        MEMBRESIA = 2, 'Membresia'
+
+    class Estado(models.IntegerChoices):
+        # 'de'/'para' de qualquer tipo; INEXISTENTE é criação ou exclusão
+        INEXISTENTE = 0, 'Inexistente'
+        NAO_PAGO = 1, 'Não Pago'
+        CONFIRMACAO_PENDENTE = 2, 'Confirmação Pendente'
+        PAGO = 3, 'Pago'
+        AGUARDANDO_APROVACAO = 11, 'Aguardando Aprovacao'
+        APROVADO = 12, 'Aprovado'
+        NAO_APROVADO = 13, 'Nao Aprovado'
+
+    id = models.BigAutoField(primary_key=True)
+    tipo = models.PositiveSmallIntegerField(choices=Tipo.choices)
+    de = models.PositiveSmallIntegerField(choices=Estado.choices)
+    para = models.PositiveSmallIntegerField(choices=Estado.choices)
+    republica_id = models.BigIntegerField(null=True)
+    usuario_id = models.BigIntegerField() # Quem deve (pagamento) ou quem entrou/saiu (membresia)
+    # Só nos eventos de pagamento
+    participacao_id = models.BigIntegerField(null=True)
+    conta_id = models.BigIntegerField(null=True)
+    responsavel_id = models.BigIntegerField(null=True)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    ator_id = models.BigIntegerField(null=True) # Quem fez a mudança; vazio quando foi o sistema
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # O replay lê os eventos de cada participação em ordem
+            models.Index(fields=['tipo', 'participacao_id', 'id'], name='transicao_participacao_idx'),
+            models.Index(fields=['usuario_id', 'id'], name='transicao_usuario_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk}: {self.get_de_display()} -> {self.get_para_display()}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('EventoTransicao é só de inclusão.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('EventoTransicao é só de inclusão.')
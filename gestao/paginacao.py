@@ -0,0 +1,117 @@
+"""
+Paginação por cursor (keyset).
+
+Em vez de OFFSET (que fica mais lento a cada página), a próxima página é
+"tudo que vem depois da última linha vista" na ordenação escolhida:
+
+    WHERE (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+
+Com um índice na ordenação, a página N custa o mesmo que a página 1.
+O cursor é opaco para o cliente (JSON em base64) e carrega só os valores
+da última linha. O último campo da ordenação precisa ser único (ex: 'id')
+e nenhum deles pode ser nulo.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class Pagina:
+    def __init__(self, itens, proximo):
+        self.itens = itens
+        self.proximo = proximo # cursor da próxima página, ou None se esta é a última
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __bool__(self):
+        return bool(self.itens)
+
+
+def codificar(valores):
+    def serializavel(valor):
+        if isinstance(valor, (date, datetime)):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        return valor
+    texto = json.dumps([serializavel(valor) for valor in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar(cursor, quantidade):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(texto)
+    except (ValueError, TypeError):
+        raise CursorInvalido('Cursor inválido.')
+    if not isinstance(valores, list) or len(valores) != quantidade:
+        raise CursorInvalido('Cursor inválido.')
+    return valores
+
+
+def _valor(item, campo):
+    """ Lê 'conta__data_vencimento' de um dict (values()) ou de um objeto. """
+    if isinstance(item, dict):
+        return item[campo]
+    for parte in campo.split('__'):
+        item = getattr(item, parte)
+    return item
+
+
+def _depois_de(campos, valores):
+    condicao = Q()
+    for i, campo in enumerate(campos):
+        nome = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        passo = Q(**{f'{nome}__{operador}': valores[i]})
+        for anterior, valor in zip(campos[:i], valores[:i]):
+            passo &= Q(**{anterior.lstrip('-'): valor})
+        condicao |= passo
+    return condicao
+
+
+def _consulta(queryset, campos, cursor, limite):
+    queryset = queryset.order_by(*campos)
+    if cursor:
+        try:
+            queryset = queryset.filter(_depois_de(campos, decodificar(cursor, len(campos))))
+        except (ValidationError, ValueError, TypeError):
+            # Valores que não servem para os campos (ex: data que não é data)
+            raise CursorInvalido('Cursor inválido.')
+    return queryset[:limite + 1]
+
+
+def _pagina(itens, campos, limite):
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        ultimo = itens[-1]
+        # Para dicts de values(), o nome com '-' não existe; usa o nome limpo
+        proximo = codificar([_valor(ultimo, campo.lstrip('-')) for campo in campos])
+    return Pagina(itens, proximo)
+
+
+def paginar(queryset, campos, cursor=None, limite=20):
+    """
+    Retorna a Pagina com até 'limite' itens depois do 'cursor'.
+    'campos' é a ordenação (use '-campo' para decrescente).
+    Levanta CursorInvalido se o cursor não puder ser lido.
+    """
+    return _pagina(list(_consulta(queryset, campos, cursor, limite)), campos, limite)
+
+
+async def apaginar(queryset, campos, cursor=None, limite=20):
+    """ 'paginar' para views async (ORM async). """
+    return _pagina([item async for item in _consulta(queryset, campos, cursor, limite)], campos, limite)
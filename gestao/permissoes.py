@@ -0,0 +1,157 @@
+"""
+Quem é quem na república do usuário logado: o contexto de membresia
+('Membresia'), com a república (id, nome, ADM) e os moradores aprovados e
+as solicitações pendentes dela, por id.
+
+As checagens de permissão das views (é o ADM? esse usuário é morador ou
+está aguardando aprovação aqui?) e a dashboard respondem a partir dele, em
+vez de carregar o usuário alvo e depois 'usuario.republica.adm' a cada ação.
+O contexto sai de UMA query (os membros, com a república no JOIN), é
+guardado no request e também no cache, com a mesma chave versionada da
+dashboard ('versao_dados', ver gestao.cache). Por isso, toda mudança de
+membresia (pedido de entrada, aprovação, rejeição, remoção) invalida a
+república inteira ('cache.invalidar_republica') mais quem saiu dela.
+
+O contexto é só para decidir; quem muda o banco repete as condições no
+UPDATE (ex.: só aprova quem ainda está AGUARDANDO_APROVACAO naquela
+república), então um contexto velho nunca aplica uma mudança errada.
+"""
+from django.core.cache import cache
+
+from .models import Republica, Usuario
+
+ADM = 'adm'
+MORADOR = 'morador'
+PENDENTE = 'pendente'
+
+TIMEOUT = 60 * 60 # A invalidação é por versão; isso só limita o uso do cache
+
+
+class Membresia:
+    """ A república do usuário e os membros dela. 'membros' é {id: (username, apelido, status)}. """
+
+    __slots__ = ('usuario_id', 'status', 'republica_id', 'republica_nome', 'adm_id', 'membros')
+
+    def __init__(self, usuario_id, status, republica_id=None, republica_nome=None, adm_id=None, membros=None):
+        self.usuario_id = usuario_id
+        self.status = status
+        self.republica_id = republica_id
+        self.republica_nome = republica_nome
+        self.adm_id = adm_id
+        self.membros = membros or {}
+
+    @property
+    def papel(self):
+        """ ADM, MORADOR, PENDENTE ou None (sem república). """
+        if self.republica_id is None:
+            return None
+        if self.status != Usuario.StatusAssociacao.APROVADO:
+            return PENDENTE
+        return ADM if self.adm_id == self.usuario_id else MORADOR
+
+    @property
+    def eh_adm(self):
+        return self.papel == ADM
+
+    @property
+    def eh_membro(self):
+        """ Morador aprovado (o ADM também é). """
+        return self.papel in (ADM, MORADOR)
+
+    def _com_status(self, status):
+        return {
+            usuario_id for usuario_id, (_, _, status_membro) in self.membros.items() if status_membro == status
+        }
+
+    @property
+    def moradores(self):
+        return self._com_status(Usuario.StatusAssociacao.APROVADO)
+
+    @property
+    def pendentes(self):
+        return self._com_status(Usuario.StatusAssociacao.AGUARDANDO_APROVACAO)
+
+    def administra(self, usuario_id):
+        """ O usuário logado é ADM da república em que 'usuario_id' mora ou pediu para entrar? """
+        return self.eh_adm and usuario_id in self.membros
+
+    def username(self, usuario_id):
+        return self.membros[usuario_id][0]
+
+    def republica(self):
+        """ A república como instância (não consultada), para templates e FKs. """
+        if self.republica_id is None:
+            return None
+        return Republica(pk=self.republica_id, nome=self.republica_nome, adm_id=self.adm_id)
+
+    def usuarios(self):
+        """ Os membros como instâncias de Usuario (não consultadas), por username. """
+        return [
+            Usuario(pk=usuario_id, username=username, apelido=apelido,
+                    republica_id=self.republica_id, status_associacao=status)
+            for usuario_id, (username, apelido, status) in sorted(self.membros.items(), key=lambda item: item[1][0])
+        ]
+
+    def para_cache(self):
+        return (self.republica_nome, self.adm_id, self.membros)
+
+
+def _consulta(user):
+    return Usuario.objects.filter(
+        republica_id=user.republica_id,
+        status_associacao__in=[Usuario.StatusAssociacao.APROVADO, Usuario.StatusAssociacao.AGUARDANDO_APROVACAO],
+    ).values_list('pk', 'username', 'apelido', 'status_associacao', 'republica__nome', 'republica__adm_id')
+
+
+def _montar(user, linhas):
+    membresia = Membresia(user.pk, user.status_associacao, user.republica_id)
+    for usuario_id, username, apelido, status, republica_nome, adm_id in linhas:
+        membresia.membros[usuario_id] = (username, apelido, status)
+        membresia.republica_nome = republica_nome
+        membresia.adm_id = adm_id
+    return membresia
+
+
+def _chave(user):
+    return f'gestao:membresia:{user.pk}:{user.versao_dados}:{user.republica_id}:{user.status_associacao}'
+
+
+def carregar(user):
+    """ A membresia de 'user', sem passar pelo cache (uma query; nenhuma se ele não tem república). """
+    if not user.republica_id:
+        return Membresia(user.pk, user.status_associacao)
+    return _montar(user, _consulta(user))
+
+
+async def acarregar(user):
+    if not user.republica_id:
+        return Membresia(user.pk, user.status_associacao)
+    return _montar(user, [linha async for linha in _consulta(user)])
+
+
+def membresia(request):
+    """ A membresia do usuário logado: do request, do cache ou do banco, nessa ordem. """
+    if not hasattr(request, '_membresia'):
+        user = request.user
+        guardado = cache.get(_chave(user)) if user.republica_id else None
+        if guardado is None:
+            request._membresia = carregar(user)
+            if user.republica_id:
+                cache.set(_chave(user), request._membresia.para_cache(), TIMEOUT)
+        else:
+            request._membresia = Membresia(user.pk, user.status_associacao, user.republica_id, *guardado)
+    return request._membresia
+
+
+async def amembresia(request):
+    """ 'membresia' para views async ('request.user' já carregado). """
+    if not hasattr(request, '_membresia'):
+        user = request.user
+        guardado = await cache.aget(_chave(user)) if user.republica_id else None
+        if guardado is None:
+            request._membresia = await acarregar(user)
+            if user.republica_id:
+                await cache.aset(_chave(user), request._membresia.para_cache(), TIMEOUT)
+        else:
+            request._membresia = Membresia(user.pk, user.status_associacao, user.republica_id, *guardado)
+    return request._membresia
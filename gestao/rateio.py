@@ -0,0 +1,131 @@
+"""
+Divisão (rateio) do valor de uma conta entre os participantes.
+
+Toda a conta é feita em centavos inteiros, então a soma das partes é
+SEMPRE igual ao valor total. Os centavos que sobram da divisão vão para
+quem tem o maior resto (método dos maiores restos); em caso de empate,
+para quem vem primeiro na lista (por isso as views passam o responsável
+primeiro).
+
+Estratégias disponíveis (ESTRATEGIAS):
+- 'igual': todo mundo paga o mesmo (diferença máxima de 1 centavo)
+- 'ponderado': proporcional a um peso por participante
+- 'fixo': cada participante tem um valor definido (tem que fechar o total)
+- 'percentual': percentual por participante (tem que somar 100)
+"""
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+
+CENTAVO = Decimal('0.01')
+
+
+class RateioInvalido(ValueError):
+    pass
+
+
+def _decimal(valor, nome='Valor'):
+    """ 'valor' como Decimal finito (NaN e Infinity não dividem nada). """
+    try:
+        numero = Decimal(str(valor))
+    except InvalidOperation:
+        numero = None
+    if numero is None or not numero.is_finite():
+        raise RateioInvalido(f'{nome} inválido: {valor!r}')
+    return numero
+
+
+def para_centavos(valor):
+    valor = _decimal(valor)
+    centavos = valor * 100
+    if centavos != centavos.to_integral_value():
+        raise RateioInvalido(f'Valor com mais de 2 casas decimais: {valor}')
+    return int(centavos)
+
+
+def de_centavos(centavos):
+    return (Decimal(centavos) / 100).quantize(CENTAVO)
+
+
+def _maiores_restos(total, pesos):
+    """ Divide 'total' centavos proporcionalmente aos pesos (já em Fraction). """
+    soma = sum(pesos)
+    if soma <= 0 or any(peso < 0 for peso in pesos):
+        raise RateioInvalido('Os pesos precisam ser não negativos e somar mais que zero.')
+    cotas = [total * peso / soma for peso in pesos]
+    partes = [cota.numerator // cota.denominator for cota in cotas]
+    sobra = total - sum(partes)
+    # Quem tem a maior fração perdida recebe os centavos que sobraram
+    ordem = sorted(range(len(cotas)), key=lambda i: (-(cotas[i] - partes[i]), i))
+    for i in ordem[:sobra]:
+        partes[i] += 1
+    return partes
+
+
+def igual(total, participantes, parametros=None):
+    base, sobra = divmod(total, len(participantes))
+    return [base + 1 if i < sobra else base for i in range(len(participantes))]
+
+
+def ponderado(total, participantes, parametros):
+    try:
+        pesos = [_decimal(parametros[p], 'Peso') for p in participantes]
+    except KeyError as erro:
+        raise RateioInvalido(f'Falta o peso do participante {erro.args[0]!r}.')
+    if any(peso < 0 for peso in pesos):
+        raise RateioInvalido('Os pesos não podem ser negativos.')
+    return _maiores_restos(total, [Fraction(peso) for peso in pesos])
+
+
+def fixo(total, participantes, parametros):
+    try:
+        partes = [para_centavos(parametros[p]) for p in participantes]
+    except KeyError as erro:
+        raise RateioInvalido(f'Falta o valor do participante {erro.args[0]!r}.')
+    if any(parte < 0 for parte in partes):
+        raise RateioInvalido('Os valores não podem ser negativos.')
+    if sum(partes) != total:
+        raise RateioInvalido(
+            f'Os valores somam {de_centavos(sum(partes))}, mas a conta é de {de_centavos(total)}.'
+        )
+    return partes
+
+
+def percentual(total, participantes, parametros):
+    try:
+        percentuais = [_decimal(parametros[p], 'Percentual') for p in participantes]
+    except KeyError as erro:
+        raise RateioInvalido(f'Falta o percentual do participante {erro.args[0]!r}.')
+    if sum(percentuais) != 100:
+        raise RateioInvalido(f'Os percentuais somam {sum(percentuais)}, e não 100.')
+    return _maiores_restos(total, [Fraction(p) for p in percentuais])
+
+
+ESTRATEGIAS = {
+    'igual': igual,
+    'ponderado': ponderado,
+    'fixo': fixo,
+    'percentual': percentual,
+}
+
+
+def dividir(valor_total, participantes, estrategia='igual', parametros=None):
+    """
+    Divide 'valor_total' entre 'participantes' (qualquer coisa que sirva de
+    chave em 'parametros', ex: ids). Retorna [(participante, Decimal), ...]
+    na mesma ordem, com a soma exatamente igual a 'valor_total'.
+    """
+    participantes = list(participantes)
+    if not participantes:
+        raise RateioInvalido('A conta precisa de pelo menos um participante.')
+    if len(set(participantes)) != len(participantes):
+        raise RateioInvalido('Participante repetido.')
+    try:
+        funcao = ESTRATEGIAS[estrategia]
+    except KeyError:
+        raise RateioInvalido(f'Estratégia de divisão desconhecida: {estrategia!r}')
+
+    total = para_centavos(valor_total)
+    if total < 0:
+        raise RateioInvalido('O valor da conta não pode ser negativo.')
+    partes = funcao(total, participantes, parametros or {})
+    return [(participante, de_centavos(parte)) for participante, parte in zip(participantes, partes)]
@@ -0,0 +1,115 @@
+"""
+Geração das contas FIXAS recorrentes (comando 'manage.py gerar_contas_recorrentes').
+
+Processa as recorrências em lotes por ordem de pk. Cada lote faz um número
+fixo de queries (recorrências, contas já geradas, participantes) e grava
+tudo com bulk_create, então dá para rodar no cron para milhares de repúblicas.
+É idempotente: uma recorrência nunca gera duas contas na mesma competência.
+"""
+import calendar
+from datetime import date
+
+from django.db import IntegrityError
+from django.db.models import F
+
+from . import rateio
+from .importacao import gravar_contas
+from .models import Conta, ContaArquivada, ContaRecorrente, Usuario
+
+
+def competencia_de(data):
+    """ Primeiro dia do mês da data. """
+    return data.replace(day=1)
+
+
+def proxima_competencia(data):
+    if data.month == 12:
+        return date(data.year + 1, 1, 1)
+    return date(data.year, data.month + 1, 1)
+
+
+def vencimento(competencia, dia):
+    """ O dia de vencimento dentro do mês, limitado ao último dia do mês. """
+    ultimo_dia = calendar.monthrange(competencia.year, competencia.month)[1]
+    return competencia.replace(day=min(dia, ultimo_dia))
+
+
+def gerar(competencia, lote=500):
+    """
+    Gera as contas da competência para todas as recorrências ativas.
+    Retorna (geradas, ja_existentes, lotes_com_conflito).
+    """
+    competencia = competencia_de(competencia)
+    geradas = ja_existentes = conflitos = 0
+    ultimo_pk = 0
+
+    while True:
+        # Se o responsável saiu da república, a recorrência fica parada
+        recorrencias = list(
+            ContaRecorrente.objects.filter(
+                ativa=True,
+                pk__gt=ultimo_pk,
+                responsavel__republica_id=F('republica_id'),
+                responsavel__status_associacao=Usuario.StatusAssociacao.APROVADO,
+            ).order_by('pk')[:lote]
+        )
+        if not recorrencias:
+            break
+        ultimo_pk = recorrencias[-1].pk
+        ids = [recorrencia.pk for recorrencia in recorrencias]
+
+        existentes = set(
+            Conta.objects.filter(recorrencia_id__in=ids, competencia=competencia)
+            .values_list('recorrencia_id', flat=True)
+        )
+        # Uma competência antiga já pode ter sido paga e arquivada
+        existentes.update(
+            ContaArquivada.objects.filter(recorrencia_id__in=ids, competencia=competencia)
+            .values_list('recorrencia_id', flat=True)
+        )
+        ja_existentes += len(existentes)
+
+        # Só entram moradores que AINDA são aprovados na república da recorrência
+        participantes = {}
+        vinculos = ContaRecorrente.participantes.through.objects.filter(
+            contarecorrente_id__in=[pk for pk in ids if pk not in existentes],
+            usuario__status_associacao=Usuario.StatusAssociacao.APROVADO,
+        ).filter(
+            usuario__republica_id=F('contarecorrente__republica_id')
+        ).values_list('contarecorrente_id', 'usuario_id')
+        for recorrencia_id, usuario_id in vinculos:
+            participantes.setdefault(recorrencia_id, []).append(usuario_id)
+
+        itens = []
+        for recorrencia in recorrencias:
+            if recorrencia.pk in existentes:
+                continue
+            # Igual ao formulário: o responsável sempre participa
+            ids_participantes = [recorrencia.responsavel_id] + [
+                usuario_id for usuario_id in sorted(participantes.get(recorrencia.pk, []))
+                if usuario_id != recorrencia.responsavel_id
+            ]
+            itens.append((
+                Conta(
+                    republica_id=recorrencia.republica_id,
+                    nome_conta=recorrencia.nome_conta,
+                    valor_total=recorrencia.valor_total,
+                    data_vencimento=vencimento(competencia, recorrencia.dia_vencimento),
+                    tipo=Conta.TipoConta.FIXA,
+                    responsavel_id=recorrencia.responsavel_id,
+                    recorrencia_id=recorrencia.pk,
+                    competencia=competencia,
+                ),
+                rateio.dividir(recorrencia.valor_total, ids_participantes),
+            ))
+
+        try:
+            gravar_contas(itens)
+        except IntegrityError:
+            # Outra execução gerou parte deste lote ao mesmo tempo; a
+            # transação do lote foi desfeita e a próxima execução completa.
+            conflitos += 1
+        else:
+            geradas += len(itens)
+
+    return geradas, ja_existentes, conflitos
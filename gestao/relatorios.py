@@ -0,0 +1,128 @@
+"""
+Relatórios da república: totais por mês e tipo, extrato de cada morador e
+maiores despesas do mês.
+
+Os totais e o extrato leem as tabelas de resumo (ResumoMensal e
+ResumoMorador), mantidas por 'ResumoMensal.recalcular' a cada mudança,
+então nenhum relatório soma o histórico inteiro. O CSV detalhado do extrato
+é gerado linha a linha ('linhas_extrato_csv'), para ir direto para um
+StreamingHttpResponse sem montar o arquivo na memória.
+"""
+import csv
+from collections import OrderedDict
+from decimal import Decimal
+from itertools import chain
+
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+
+from .models import (
+    Conta, ContaArquivada, ParticipanteArquivado, ParticipanteConta, ResumoMensal, ResumoMorador,
+)
+from .recorrencia import proxima_competencia
+
+MAIORES_DESPESAS = 10
+ZERO = Decimal('0.00')
+
+
+def totais_mensais(republica_id, meses=12):
+    """
+    Os últimos 'meses' meses com contas, do mais recente para o mais antigo:
+    [{'competencia', 'por_tipo': [(tipo, valor_total), ...], 'valor_total', 'valor_pago'}, ...]
+    'por_tipo' segue a ordem de Conta.TipoConta (colunas fixas na tabela).
+    """
+    linhas = ResumoMensal.objects.filter(republica_id=republica_id).order_by('-competencia')
+    resultado = OrderedDict()
+    for linha in linhas:
+        if linha.competencia not in resultado:
+            if len(resultado) == meses:
+                break
+            resultado[linha.competencia] = {
+                'competencia': linha.competencia,
+                'por_tipo': dict.fromkeys(Conta.TipoConta.values, ZERO),
+                'valor_total': ZERO,
+                'valor_pago': ZERO,
+            }
+        mes = resultado[linha.competencia]
+        mes['por_tipo'][linha.tipo] += linha.valor_total
+        mes['valor_total'] += linha.valor_total
+        mes['valor_pago'] += linha.valor_pago
+    for mes in resultado.values():
+        mes['por_tipo'] = list(mes['por_tipo'].items())
+    return list(resultado.values())
+
+
+def extrato(usuario, republica_id):
+    """ Quanto o morador teve de contas e pagou em cada mês (ResumoMorador), do mais recente. """
+    return list(
+        ResumoMorador.objects.filter(usuario=usuario, republica_id=republica_id).order_by('-competencia')
+    )
+
+
+def maiores_despesas(republica_id, competencia, limite=MAIORES_DESPESAS):
+    """ As contas mais caras do mês, incluindo as arquivadas. """
+    def do_mes(modelo):
+        return list(
+            modelo.objects.filter(
+                republica_id=republica_id,
+                data_vencimento__gte=competencia,
+                data_vencimento__lt=proxima_competencia(competencia),
+            ).order_by('-valor_total', 'id')[:limite]
+        )
+    contas = do_mes(Conta) + do_mes(ContaArquivada)
+    return sorted(contas, key=lambda conta: (-conta.valor_total, conta.pk))[:limite]
+
+
+class _Eco:
+    """ "Arquivo" que só devolve o que recebe, para o csv.writer gerar strings. """
+    def write(self, valor):
+        return valor
+
+
+CABECALHO_EXTRATO = ['vencimento', 'conta', 'tipo', 'valor_total', 'minha_parte', 'status', 'arquivada']
+
+
+def linhas_extrato_csv(usuario, republica_id):
+    """
+    Gera o CSV com todas as participações do morador na república, uma linha
+    por vez (as participações são lidas com iterator(), em blocos).
+    """
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(CABECALHO_EXTRATO)
+
+    recentes = ParticipanteConta.objects.filter(
+        usuario=usuario, conta__republica_id=republica_id,
+    ).select_related('conta').order_by('conta__data_vencimento', 'conta_id')
+    arquivadas = ParticipanteArquivado.objects.filter(
+        usuario=usuario, conta__republica_id=republica_id,
+    ).select_related('conta').order_by('conta__data_vencimento', 'conta_id')
+
+    for participacao in chain(arquivadas.iterator(chunk_size=500), recentes.iterator(chunk_size=500)):
+        conta = participacao.conta
+        yield escritor.writerow([
+            conta.data_vencimento.isoformat(), conta.nome_conta, conta.tipo, conta.valor_total,
+            participacao.valor_individual, participacao.status_pagamento,
+            'sim' if isinstance(participacao, ParticipanteArquivado) else 'não',
+        ])
+
+
+def reconstruir(republica_ids=None):
+    """ Refaz os resumos de todos os meses (comando 'reconstruir_relatorios'). """
+    meses = set()
+    for modelo in (Conta, ContaArquivada):
+        contas = modelo.objects.all()
+        if republica_ids:
+            contas = contas.filter(republica_id__in=republica_ids)
+        meses.update(
+            contas.annotate(mes=TruncMonth('data_vencimento')).values_list('republica_id', 'mes').distinct()
+        )
+    antigos = ResumoMensal.objects.all()
+    antigos_moradores = ResumoMorador.objects.all()
+    if republica_ids:
+        antigos = antigos.filter(republica_id__in=republica_ids)
+        antigos_moradores = antigos_moradores.filter(republica_id__in=republica_ids)
+    with transaction.atomic():
+        antigos.delete()
+        antigos_moradores.delete()
+        ResumoMensal.recalcular(meses)
+    return len(meses)
@@ -0,0 +1,192 @@
+"""
+Livro-razão de saldos por república ("quem deve quanto para quem").
+
+As views chamam 'registrar' com os movimentos de cada participação
+(status antes -> status depois) dentro da MESMA transação da mudança.
+'reconstruir' recalcula tudo a partir dos ParticipanteConta, para
+corrigir qualquer divergência (comando 'manage.py reconstruir_saldos'), e
+'gravar' substitui os saldos por pares já somados (o replay do registro de
+transições, gestao.auditoria, usa esse). Todos tiram do cache o plano de
+acerto das repúblicas (gestao.acerto).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+from . import acerto
+from .models import ParticipanteConta, Republica, Saldo, SaldoMorador
+
+ZERO = Decimal('0.00')
+CENTAVO = Decimal('0.01')
+# Linhas por UPDATE em '_somar' (cada uma vira um WHEN por campo)
+LOTE = 500
+
+_ABERTOS = (
+    ParticipanteConta.StatusPagamento.NAO_PAGO,
+    ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+)
+
+
+def contribuicao(status, valor):
+    """ Quanto uma participação soma em (valor_devido, valor_em_confirmacao). """
+    if status in _ABERTOS:
+        em_confirmacao = valor if status == ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE else ZERO
+        return valor, em_confirmacao
+    # PAGO ou None (participação não existe)
+    return ZERO, ZERO
+
+
+def movimento(participacao, status_antes, status_depois):
+    """
+    Descreve a mudança de uma participação para 'registrar'.
+    Use None como status para "não existia" (criação) ou "deixou de existir" (exclusão).
+    """
+    conta = participacao.conta
+    return (
+        conta.republica_id,
+        participacao.usuario_id,
+        conta.responsavel_id,
+        participacao.valor_individual,
+        status_antes,
+        status_depois,
+    )
+
+
+def registrar(movimentos):
+    """
+    Aplica os movimentos nos saldos com UPDATEs incrementais (F()): um
+    UPDATE para todos os pares devedor/credor e um para todos os moradores,
+    com um CASE por linha. O número de queries não cresce com o número de
+    participações (veja '_somar').
+    """
+    pares = defaultdict(lambda: [ZERO, ZERO])
+    for republica_id, devedor_id, credor_id, valor, antes, depois in movimentos:
+        if devedor_id == credor_id:
+            # A parte do próprio responsável não é dívida com ninguém
+            continue
+        valor = Decimal(valor).quantize(CENTAVO)
+        devido_antes, confirmacao_antes = contribuicao(antes, valor)
+        devido_depois, confirmacao_depois = contribuicao(depois, valor)
+        delta = pares[(republica_id, devedor_id, credor_id)]
+        delta[0] += devido_depois - devido_antes
+        delta[1] += confirmacao_depois - confirmacao_antes
+    pares = {chave: deltas for chave, deltas in pares.items() if any(deltas)}
+
+    moradores = defaultdict(lambda: [ZERO, ZERO])
+    for (republica_id, devedor_id, credor_id), (delta_devido, _) in pares.items():
+        moradores[(republica_id, devedor_id)][0] += delta_devido
+        moradores[(republica_id, credor_id)][1] += delta_devido
+    moradores = {chave: deltas for chave, deltas in moradores.items() if any(deltas)}
+
+    with transaction.atomic():
+        _somar(Saldo, ('republica_id', 'devedor_id', 'credor_id'), ('valor_devido', 'valor_em_confirmacao'), pares)
+        _somar(SaldoMorador, ('republica_id', 'usuario_id'), ('total_devido', 'total_a_receber'), moradores)
+        acerto.invalidar({republica_id for republica_id, _ in moradores})
+
+
+def _somar(model, chave, campos, deltas):
+    """
+    Soma 'deltas' ({valores da chave: (delta de cada campo)}) nas linhas de
+    'model': um SELECT separa as linhas que já existem, um INSERT (ignorando
+    conflitos) cria as que faltam zeradas e um UPDATE por LOTE de linhas
+    faz campo = campo + delta com um CASE pelo pk. Quem criou a mesma linha
+    ao mesmo tempo só faz o INSERT ser ignorado: ela é lida de novo e os dois
+    incrementos entram, nenhum vira erro.
+    """
+    if not deltas:
+        return
+    filtro = {f'{campo}__in': {valores[i] for valores in deltas} for i, campo in enumerate(chave)}
+
+    def existentes():
+        return {tuple(linha[1:]): linha[0] for linha in model.objects.filter(**filtro).values_list('pk', *chave)}
+
+    pks = existentes()
+    faltando = [valores for valores in deltas if valores not in pks]
+    if faltando:
+        model.objects.bulk_create(
+            [model(**dict(zip(chave, valores))) for valores in faltando], ignore_conflicts=True,
+        )
+        pks = existentes()
+
+    itens = list(deltas.items())
+    for inicio in range(0, len(itens), LOTE):
+        pedaco = itens[inicio:inicio + LOTE]
+        model.objects.filter(pk__in=[pks[valores] for valores, _ in pedaco]).update(**{
+            campo: Case(
+                *[When(pk=pks[valores], then=F(campo) + incrementos[i]) for valores, incrementos in pedaco],
+                default=F(campo), output_field=model._meta.get_field(campo),
+            )
+            for i, campo in enumerate(campos)
+        })
+
+
+def reconstruir(republica_ids=None):
+    """
+    Recalcula os saldos do zero a partir dos ParticipanteConta.
+    Se 'republica_ids' não for passado, reconstrói todas as repúblicas.
+    Retorna quantos pares (devedor, credor) foram gravados.
+    """
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    participacoes = ParticipanteConta.objects.exclude(usuario_id=F('conta__responsavel_id'))
+    if republica_ids is not None:
+        participacoes = participacoes.filter(conta__republica_id__in=republica_ids)
+
+    linhas = participacoes.values(
+        'conta__republica_id', 'usuario_id', 'conta__responsavel_id'
+    ).annotate(
+        devido=Sum(Case(
+            When(status_pagamento__in=_ABERTOS, then=F('valor_individual')),
+            default=Value(ZERO), output_field=decimal,
+        )),
+        em_confirmacao=Sum(Case(
+            When(status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE, then=F('valor_individual')),
+            default=Value(ZERO), output_field=decimal,
+        )),
+    ).filter(Q(devido__gt=0) | Q(em_confirmacao__gt=0)).order_by()
+
+    pares = {
+        (linha['conta__republica_id'], linha['usuario_id'], linha['conta__responsavel_id']):
+            (linha['devido'], linha['em_confirmacao'])
+        for linha in linhas.iterator()
+    }
+    return gravar(pares, republica_ids)
+
+
+def gravar(pares, republica_ids=None):
+    """
+    Substitui os saldos das repúblicas 'republica_ids' (ou de todas) por
+    'pares': {(republica_id, devedor_id, credor_id): (valor_devido, valor_em_confirmacao)}.
+    Os totais por morador saem da soma dos pares. Retorna quantos pares gravou.
+    """
+    saldos = []
+    totais = defaultdict(lambda: [ZERO, ZERO])
+    for (republica_id, devedor_id, credor_id), (devido, em_confirmacao) in pares.items():
+        saldos.append(Saldo(
+            republica_id=republica_id, devedor_id=devedor_id, credor_id=credor_id,
+            valor_devido=devido, valor_em_confirmacao=em_confirmacao,
+        ))
+        totais[(republica_id, devedor_id)][0] += devido
+        totais[(republica_id, credor_id)][1] += devido
+
+    with transaction.atomic():
+        saldos_antigos = Saldo.objects.all()
+        moradores_antigos = SaldoMorador.objects.all()
+        if republica_ids is not None:
+            saldos_antigos = saldos_antigos.filter(republica_id__in=republica_ids)
+            moradores_antigos = moradores_antigos.filter(republica_id__in=republica_ids)
+        saldos_antigos.delete()
+        moradores_antigos.delete()
+
+        Saldo.objects.bulk_create(saldos, batch_size=500)
+        SaldoMorador.objects.bulk_create([
+            SaldoMorador(republica_id=republica_id, usuario_id=usuario_id,
+                         total_devido=devido, total_a_receber=a_receber)
+            for (republica_id, usuario_id), (devido, a_receber) in totais.items()
+        ], batch_size=500)
+        if republica_ids is None:
+            republica_ids = Republica.objects.values_list('pk', flat=True)
+        acerto.invalidar(republica_ids)
+
+    return len(saldos)
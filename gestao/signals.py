@@ -0,0 +1,19 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import banco, busca
+from .models import Republica
+
+
+@receiver(post_save, sender=Republica)
+def indexar_republica(sender, instance, created, update_fields=None, **kwargs):
+    # Se o save() diz o que mudou e o nome não está na lista, o índice continua valendo
+    if update_fields is not None and 'nome' not in update_fields:
+        return
+    busca.indexar(instance)
+
+
+@receiver(connection_created)
+def configurar_conexao(sender, connection, **kwargs):
+    banco.configurar_conexao(connection)
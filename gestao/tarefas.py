@@ -0,0 +1,274 @@
+"""
+Trabalho em segundo plano: uma fila na tabela Tarefa, consumida pelos
+processos de 'manage.py run_workers'.
+
+Quem muda alguma coisa enfileira ('Tarefa.enfileirar') na mesma transação,
+então a tarefa só existe se a mudança foi gravada, e o request não espera
+pelo que o usuário não precisa ver na hora:
+
+- enviar_emails: as notificações de gestao.eventos por email (conta nova,
+  pagamento para confirmar, pagamento confirmado/rejeitado, entrada aprovada,
+  acerto confirmado) e os lembretes de vencimento (gestao.lembretes);
+- recalcular_relatorios: ResumoMensal/ResumoMorador dos meses que mudaram;
+- manutencao: limpa a outbox de eventos, as tarefas concluídas antigas e o
+  cache em disco vencido. O processo principal de 'run_workers' enfileira
+  uma a cada GESTAO_TAREFAS['INTERVALO_MANUTENCAO'] segundos.
+
+Cada worker pega um lote de tarefas de uma vez ('reivindicar'): SELECT ...
+FOR UPDATE SKIP LOCKED onde o banco tem (PostgreSQL), para os workers não
+esperarem uns pelos outros; no SQLite a transação já começa com o lock de
+escrita (transaction_mode IMMEDIATE), o que serializa a reivindicação. As
+tarefas do lote com o mesmo nome rodam juntas quando a função aceita lote
+(os emails saem por uma conexão SMTP só; os meses dos relatórios são
+recalculados uma vez, mesmo que várias tarefas peçam o mesmo mês).
+
+Uma função em lote pode falhar só em parte: ela retorna {índice no lote:
+erro} com as tarefas que falharam, e as outras ficam concluídas (os emails
+fazem isso, para um envio que falhou não reenviar os que já saíram).
+
+Uma tarefa que falha volta para a fila com espera exponencial
+(ESPERA_BASE * 2^(tentativas - 1), até ESPERA_MAXIMA) e vira FALHOU depois
+de MAX_TENTATIVAS. Se um worker morrer no meio, 'liberar_travadas' devolve
+as tarefas dele à fila depois de TIMEOUT_TRAVADA segundos. A entrega é
+"pelo menos uma vez": a tarefa precisa aguentar rodar de novo.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache, eventos, lembretes
+from .models import ResumoMensal, Tarefa, Usuario
+
+logger = logging.getLogger('gestao.tarefas')
+
+PADRAO = {
+    'LOTE': 50,                  # Tarefas reivindicadas de uma vez por worker
+    'INTERVALO': 1.0,            # Segundos de espera quando a fila está vazia
+    'MAX_TENTATIVAS': 5,
+    'ESPERA_BASE': 10,           # Segundos antes da 2ª tentativa; dobra a cada falha
+    'ESPERA_MAXIMA': 60 * 60,
+    'TIMEOUT_TRAVADA': 10 * 60,  # Depois disso, a tarefa de um worker que sumiu volta para a fila
+    'INTERVALO_MANUTENCAO': 5 * 60,
+    'RETENCAO_HORAS': 72,        # Tarefas concluídas mais velhas que isso são apagadas
+}
+
+ASSUNTOS = {
+    eventos.PAGAMENTO_MARCADO: 'Pagamento para confirmar',
+    eventos.PAGAMENTO_CONFIRMADO: 'Pagamento confirmado',
+    eventos.PAGAMENTO_REJEITADO: 'Pagamento rejeitado',
+    eventos.SOLICITACAO_ENTRADA: 'Nova solicitação de entrada',
+    eventos.MORADOR_APROVADO: 'Entrada aprovada',
+    eventos.CONTA_CRIADA: 'Nova conta',
+    eventos.ACERTO_CONFIRMADO: 'Acerto de contas confirmado',
+    lembretes.LEMBRETE: 'Contas a vencer e atrasadas',
+}
+
+REGISTRO = {} # nome -> (função, em_lote)
+
+
+def configuracao():
+    return {**PADRAO, **getattr(settings, 'GESTAO_TAREFAS', {})}
+
+
+def tarefa(nome, em_lote=False):
+    """
+    Registra a função que executa as tarefas 'nome'. Ela recebe os
+    argumentos da tarefa como kwargs; com 'em_lote', recebe a lista dos
+    argumentos de todas as tarefas 'nome' do lote e pode retornar {índice:
+    erro} com as que falharam.
+    """
+    def registrar(funcao):
+        REGISTRO[nome] = (funcao, em_lote)
+        return funcao
+    return registrar
+
+
+@tarefa('enviar_emails', em_lote=True)
+def enviar_emails(lista_de_argumentos):
+    """ Uma conexão SMTP para o lote; cada tarefa é enviada e falha sozinha. """
+    ids = {usuario_id for argumentos in lista_de_argumentos for usuario_id in argumentos['usuarios']}
+    enderecos = dict(Usuario.objects.filter(pk__in=ids).exclude(email='').values_list('pk', 'email'))
+    por_tarefa = [
+        [
+            mail.EmailMessage(
+                subject=f'[República] {ASSUNTOS.get(argumentos["tipo"], "Notificação")}',
+                body=argumentos['mensagem'],
+                to=[enderecos[usuario_id]],
+            )
+            for usuario_id in argumentos['usuarios'] if usuario_id in enderecos
+        ]
+        for argumentos in lista_de_argumentos
+    ]
+    falhas = {}
+    if any(por_tarefa):
+        with mail.get_connection() as conexao:
+            for indice, mensagens in enumerate(por_tarefa):
+                if not mensagens:
+                    continue
+                try:
+                    conexao.send_messages(mensagens)
+                except Exception:
+                    falhas[indice] = traceback.format_exc()
+    return falhas
+
+
+@tarefa('recalcular_relatorios', em_lote=True)
+def recalcular_relatorios(lista_de_argumentos):
+    ResumoMensal.recalcular(
+        (republica_id, date.fromisoformat(competencia))
+        for argumentos in lista_de_argumentos
+        for republica_id, competencia in argumentos['meses']
+    )
+
+
+@tarefa('manutencao')
+def manutencao():
+    retencao = timezone.now() - timedelta(hours=configuracao()['RETENCAO_HORAS'])
+    concluidas = Tarefa.objects.filter(status=Tarefa.Status.CONCLUIDA, concluida_em__lt=retencao).delete()[0]
+    logger.info(
+        'Manutenção: %s eventos, %s tarefas concluídas e %s arquivos de cache apagados.',
+        eventos.limpar(), concluidas, cache.limpar_expirados(),
+    )
+
+
+def nome_do_worker(indice=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{indice}'
+
+
+def reivindicar(worker, lote):
+    """ Marca até 'lote' tarefas pendentes como EXECUTANDO por 'worker' e as retorna. """
+    agora = timezone.now()
+    with transaction.atomic():
+        fila = Tarefa.objects.filter(
+            status=Tarefa.Status.PENDENTE, executar_em__lte=agora,
+        ).order_by('executar_em', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            fila = fila.select_for_update(skip_locked=True)
+        ids = list(fila.values_list('pk', flat=True)[:lote])
+        if not ids:
+            return []
+        # O filtro de status repete a condição: sem o lock de linha, só
+        # quem mudar a tarefa primeiro fica com ela
+        Tarefa.objects.filter(pk__in=ids, status=Tarefa.Status.PENDENTE).update(
+            status=Tarefa.Status.EXECUTANDO, travada_por=worker, travada_em=agora,
+            tentativas=F('tentativas') + 1,
+        )
+    return list(Tarefa.objects.filter(
+        pk__in=ids, status=Tarefa.Status.EXECUTANDO, travada_por=worker, travada_em=agora,
+    ).order_by('executar_em', 'id'))
+
+
+def _espera(tentativas, config):
+    return timedelta(seconds=min(config['ESPERA_BASE'] * 2 ** (tentativas - 1), config['ESPERA_MAXIMA']))
+
+
+def _falharam(tarefas, erro, config):
+    agora = timezone.now()
+    for item in tarefas:
+        item.erro = erro
+        item.travada_por = ''
+        item.travada_em = None
+        if item.tentativas >= config['MAX_TENTATIVAS']:
+            item.status = Tarefa.Status.FALHOU
+            logger.error('Tarefa %s falhou %s vezes e foi desistida:\n%s', item, item.tentativas, erro)
+        else:
+            item.status = Tarefa.Status.PENDENTE
+            item.executar_em = agora + _espera(item.tentativas, config)
+            logger.warning('Tarefa %s falhou (tentativa %s), tenta de novo às %s.', item, item.tentativas, item.executar_em)
+    Tarefa.objects.bulk_update(tarefas, ['status', 'erro', 'executar_em', 'travada_por', 'travada_em'])
+
+
+def executar(tarefas):
+    """
+    Roda as tarefas reivindicadas, agrupadas por nome, e registra o
+    resultado. Cada grupo (ou cada tarefa, se a função não for em lote)
+    roda na sua transação; se levantar exceção, o grupo inteiro volta para a
+    fila, e se retornar falhas, só as tarefas que falharam voltam.
+    """
+    config = configuracao()
+    grupos = defaultdict(list)
+    for item in tarefas:
+        grupos[item.nome].append(item)
+
+    concluidas = []
+    for nome, grupo in grupos.items():
+        if nome not in REGISTRO:
+            _falharam(grupo, f'Tarefa desconhecida: {nome}', {**config, 'MAX_TENTATIVAS': 0})
+            continue
+        funcao, em_lote = REGISTRO[nome]
+        for bloco in [grupo] if em_lote else [[item] for item in grupo]:
+            try:
+                with transaction.atomic():
+                    if em_lote:
+                        falhas = funcao([item.argumentos for item in bloco]) or {}
+                    else:
+                        falhas = {}
+                        funcao(**bloco[0].argumentos)
+            except Exception:
+                _falharam(bloco, traceback.format_exc(), config)
+                continue
+            for indice, erro in falhas.items():
+                _falharam([bloco[indice]], erro, config)
+            concluidas.extend(item.pk for indice, item in enumerate(bloco) if indice not in falhas)
+
+    Tarefa.objects.filter(pk__in=concluidas).update(
+        status=Tarefa.Status.CONCLUIDA, concluida_em=timezone.now(), erro='', travada_por='', travada_em=None,
+    )
+    return len(concluidas)
+
+
+def liberar_travadas(timeout=None):
+    """ Devolve à fila as tarefas EXECUTANDO há mais de 'timeout' segundos (o worker morreu). """
+    timeout = configuracao()['TIMEOUT_TRAVADA'] if timeout is None else timeout
+    return Tarefa.objects.filter(
+        status=Tarefa.Status.EXECUTANDO, travada_em__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Tarefa.Status.PENDENTE, travada_por='', travada_em=None)
+
+
+def agendar_manutencao():
+    """ Enfileira a manutenção, se não houver uma esperando ou rodando. """
+    ativas = Tarefa.objects.filter(
+        nome='manutencao', status__in=[Tarefa.Status.PENDENTE, Tarefa.Status.EXECUTANDO],
+    )
+    if not ativas.exists():
+        Tarefa.enfileirar('manutencao', [{}])
+
+
+def trabalhar(worker, lote=None, intervalo=None, parar=None, uma_vez=False):
+    """
+    O laço de um worker: reivindica um lote, executa, repete. Dorme
+    'intervalo' segundos quando a fila está vazia. Termina quando 'parar'
+    (um threading/multiprocessing.Event) for ligado ou, com 'uma_vez', assim
+    que não houver mais nada para rodar agora. Retorna quantas concluiu.
+    """
+    config = configuracao()
+    lote = lote or config['LOTE']
+    intervalo = config['INTERVALO'] if intervalo is None else intervalo
+    total = 0
+    while parar is None or not parar.is_set():
+        close_old_connections()
+        tarefas = reivindicar(worker, lote)
+        if tarefas:
+            total += executar(tarefas)
+        elif uma_vez:
+            break
+        elif parar is not None:
+            parar.wait(intervalo)
+        else:
+            time.sleep(intervalo)
+    return total
+
+
+def processar(lote=None):
+    """ Roda tudo que estiver pendente neste processo e retorna (para testes e cron). """
+    return trabalhar(nome_do_worker(), lote=lote, uma_vez=True)
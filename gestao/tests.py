@@ -1,3 +1,1836 @@
-from django.test import TestCase
+import io
+import json
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import acerto, arquivo, auditoria, banco, benchmark, eventos, importacao, lembretes, metricas, permissoes, rateio, saldos, tarefas
+from .models import (
+    Conta, ContaArquivada, ContaRecorrente, EventoNotificacao, EventoTransicao, LembreteEnviado, ParticipanteArquivado, ParticipanteConta, Republica, ResumoMensal,
+    ResumoMorador, Saldo, SaldoMorador, Tarefa, Usuario,
+)
+
+# Nos testes, um request acima do orçamento de queries (gestao.metricas)
+# quebra o teste em vez de só logar. O tempo depende da máquina: fica de fora.
+_orcamento_estrito = override_settings(
+    GESTAO_METRICAS={**settings.GESTAO_METRICAS, 'ESTRITO': True, 'LIMITE_TEMPO_MS': None},
+)
+
+
+def setUpModule():
+    _orcamento_estrito.enable()
+
+
+def tearDownModule():
+    _orcamento_estrito.disable()
+
+
+class DashboardQueriesTest(TestCase):
+    """
+    A dashboard tem que fazer o MESMO número de queries com 1 ou com
+    muitas participações/moradores/confirmações. Se alguém adicionar
+    um N+1 no template, este teste quebra.
+    """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm', password='senha')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.client.force_login(self.adm)
+
+    def _popular(self, quantidade, inicio=0):
+        for i in range(inicio, inicio + quantidade):
+            morador = Usuario.objects.create_user(
+                username=f'morador{i}',
+                republica=self.republica,
+                status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            Usuario.objects.create_user(
+                username=f'pendente{i}',
+                republica=self.republica,
+                status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            )
+            conta = Conta.objects.create(
+                republica=self.republica,
+                nome_conta=f'Conta {i}',
+                valor_total=Decimal('100.00'),
+                data_vencimento=date.today() + timedelta(days=i),
+                responsavel=self.adm if i % 2 else morador,
+            )
+            ParticipanteConta.objects.create(
+                conta=conta, usuario=self.adm, valor_individual=Decimal('50.00')
+            )
+            ParticipanteConta.objects.create(
+                conta=conta, usuario=morador, valor_individual=Decimal('50.00'),
+                status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+            )
+
+    def _contar_queries(self):
+        # Mede o caminho sem cache (carregar_dashboard)
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('gestao:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_numero_de_queries_nao_depende_do_volume(self):
+        self._popular(1)
+        poucas = self._contar_queries()
+
+        self._popular(20, inicio=1)
+        muitas = self._contar_queries()
+
+        self.assertEqual(poucas, muitas)
+
+    def test_numero_de_queries_limitado(self):
+        self._popular(5)
+        cache.clear()
+        # sessão + usuário + membresia (república e membros) + pendências + confirmações + saldos
+        # + saldos líquidos da república (plano de acerto)
+        with self.assertNumQueries(7):
+            self.client.get(reverse('gestao:dashboard'))
+
+
+class SaldosTest(TestCase):
+    """ O livro de saldos tem que acompanhar cada mudança feita pelas views. """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm', password='senha')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', password='senha', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+
+    def _criar_conta(self, valor='90.00'):
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Luz',
+            'valor_total': valor,
+            'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL,
+            'participantes': [self.morador.pk],
+        })
+        return Conta.objects.get(nome_conta='Luz')
+
+    def _saldo(self):
+        return Saldo.objects.get(devedor=self.morador, credor=self.adm)
+
+    def _estado(self):
+        pares = sorted(Saldo.objects.filter(valor_devido__gt=0).values_list(
+            'devedor_id', 'credor_id', 'valor_devido', 'valor_em_confirmacao'))
+        moradores = sorted(SaldoMorador.objects.exclude(
+            total_devido=0, total_a_receber=0).values_list('usuario_id', 'total_devido', 'total_a_receber'))
+        return pares, moradores
+
+    def assertIgualAReconstrucao(self):
+        incremental = self._estado()
+        saldos.reconstruir()
+        self.assertEqual(incremental, self._estado())
+
+    def test_ciclo_de_pagamento(self):
+        conta = self._criar_conta()
+        self.assertEqual(self._saldo().valor_devido, Decimal('45.00'))
+        self.assertEqual(SaldoMorador.objects.get(usuario=self.adm).total_a_receber, Decimal('45.00'))
+
+        participacao = conta.participantes.get(usuario=self.morador)
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk]))
+        self.assertEqual(self._saldo().valor_em_confirmacao, Decimal('45.00'))
+        self.assertIgualAReconstrucao()
+
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[participacao.pk]))
+        saldo = self._saldo()
+        self.assertEqual((saldo.valor_devido, saldo.valor_em_confirmacao), (Decimal('0.00'), Decimal('0.00')))
+        self.assertIgualAReconstrucao()
+
+    def test_deletar_conta_e_remover_morador(self):
+        conta = self._criar_conta()
+        agua = Conta.objects.create(
+            republica=self.republica, nome_conta='Água', valor_total=Decimal('30.00'),
+            data_vencimento=date.today(), responsavel=self.adm,
+        )
+        ParticipanteConta.objects.create(conta=agua, usuario=self.morador, valor_individual=Decimal('30.00'))
+        saldos.reconstruir()
+
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_delete', args=[conta.pk]))
+        self.assertEqual(self._saldo().valor_devido, Decimal('30.00'))
+
+        self.client.post(reverse('gestao:remover_morador', args=[self.morador.pk]))
+        self.assertEqual(self._saldo().valor_devido, Decimal('0.00'))
+        self.assertEqual(SaldoMorador.objects.get(usuario=self.adm).total_a_receber, Decimal('0.00'))
+
+    def test_criar_conta_nao_faz_uma_query_por_participante(self):
+        novos = [
+            Usuario.objects.create_user(
+                username=f'novo{i}', republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            for i in range(5)
+        ]
+        self._criar_conta() # Sessão, membresia e saldos do ADM já existem nas duas medidas
+
+        def criar(nome, participantes):
+            return self.client.post(reverse('gestao:conta_nova'), {
+                'nome_conta': nome, 'valor_total': '60.00', 'data_vencimento': date.today().isoformat(),
+                'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [usuario.pk for usuario in participantes],
+            })
+
+        # Os saldos dos participantes ainda não existem nas duas: o mesmo INSERT e o mesmo UPDATE
+        with self.assertNumQueries(24):
+            criar('Gás', novos[:1])
+        with self.assertNumQueries(24):
+            criar('Internet', novos[1:])
+        self.assertEqual(Saldo.objects.filter(credor=self.adm).count(), 6)
+        self.assertIgualAReconstrucao()
+
+    def test_primeira_escrita_concorrente_nao_quebra(self):
+        # Outra transação cria a linha entre o SELECT (não existe) e o INSERT
+        criar = QuerySet.bulk_create
+        corridas = []
+
+        def bulk_create_com_corrida(queryset, objetos, *args, **kwargs):
+            if queryset.model is Saldo and not corridas:
+                corridas.append(Saldo.objects.create(
+                    republica=self.republica, devedor=self.morador, credor=self.adm, valor_devido=Decimal('10.00'),
+                ))
+            return criar(queryset, objetos, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', bulk_create_com_corrida):
+            saldos.registrar([(self.republica.pk, self.morador.pk, self.adm.pk, Decimal('5.00'), None, 'NAO_PAGO')])
+        self.assertTrue(corridas)
+        self.assertEqual(self._saldo().valor_devido, Decimal('15.00'))
+
+
+class ResumoContaTest(TestCase):
+    """ status_conta e os totais da Conta acompanham os pagamentos. """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm', password='senha')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', password='senha', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Internet',
+            'valor_total': '100.00',
+            'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.FIXA,
+            'participantes': [self.morador.pk],
+        })
+        self.conta = Conta.objects.get(nome_conta='Internet')
+
+    def test_status_acompanha_pagamentos(self):
+        self.assertEqual(self.conta.status_conta, Conta.StatusConta.NAO_PAGA)
+        self.assertEqual((self.conta.qtd_pagos, self.conta.qtd_nao_pagos), (0, 2))
+        self.assertEqual(self.conta.valor_em_aberto, Decimal('100.00'))
+
+        minha = self.conta.participantes.get(usuario=self.adm)
+        self.client.post(reverse('gestao:marcar_pago', args=[minha.pk]))
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.status_conta, Conta.StatusConta.PARCIALMENTE_PAGA)
+        self.assertEqual((self.conta.valor_pago, self.conta.valor_em_aberto), (Decimal('50.00'), Decimal('50.00')))
+
+        dele = self.conta.participantes.get(usuario=self.morador)
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[dele.pk]))
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[dele.pk]))
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.status_conta, Conta.StatusConta.PAGA)
+        self.assertEqual((self.conta.qtd_pagos, self.conta.qtd_nao_pagos), (2, 0))
+
+    def test_remover_morador_recalcula(self):
+        minha = self.conta.participantes.get(usuario=self.adm)
+        self.client.post(reverse('gestao:marcar_pago', args=[minha.pk]))
+        self.client.post(reverse('gestao:remover_morador', args=[self.morador.pk]))
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.status_conta, Conta.StatusConta.PAGA)
+
+    def test_envio_duplicado_e_versao_antiga_nao_aplicam(self):
+        dele = self.conta.participantes.get(usuario=self.morador)
+        self.assertEqual(dele.versao, 1)
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[dele.pk]), {'versao': 1})
+        # O segundo clique não encontra mais a linha como NAO_PAGO
+        self.client.post(reverse('gestao:marcar_pago', args=[dele.pk]), {'versao': 1})
+        dele.refresh_from_db()
+        self.assertEqual((dele.status_pagamento, dele.versao), (ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE, 2))
+        self.assertEqual(Saldo.objects.get(devedor=self.morador).valor_em_confirmacao, Decimal('50.00'))
+
+        # O responsável confirma a partir de uma página velha (versão 1): não aplica
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[dele.pk]), {'versao': 1})
+        dele.refresh_from_db()
+        self.assertEqual(dele.status_pagamento, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE)
+
+        self.client.post(reverse('gestao:rejeitar_pagamento', args=[dele.pk]), {'versao': 2})
+        dele.refresh_from_db()
+        self.assertEqual((dele.status_pagamento, dele.versao), (ParticipanteConta.StatusPagamento.NAO_PAGO, 3))
+        self.assertFalse(Saldo.objects.get(devedor=self.morador).valor_em_confirmacao)
+        self.assertEqual(self.client.get(reverse('gestao:api_dashboard_secao', args=['confirmacoes'])).json()['itens'], [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN é específico do SQLite')
+class PlanoDeQueriesTest(TestCase):
+    """
+    Roda EXPLAIN QUERY PLAN em cada query da dashboard e do formulário
+    de conta e falha se alguma tabela for lida com full scan
+    (um 'SCAN tabela' sem índice).
+    """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm', password='senha')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        conta = Conta.objects.create(
+            republica=self.republica, nome_conta='Luz', valor_total=Decimal('10.00'),
+            data_vencimento=date.today(), responsavel=self.adm,
+        )
+        ParticipanteConta.objects.create(conta=conta, usuario=self.adm, valor_individual=Decimal('5.00'))
+        ParticipanteConta.objects.create(
+            conta=conta, usuario=morador, valor_individual=Decimal('5.00'),
+            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        )
+        saldos.reconstruir()
+        self.client.force_login(self.adm)
+
+    def _planos(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        planos = {}
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                # O SQL capturado já vem com os parâmetros interpolados
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                planos[sql] = [linha[-1] for linha in cursor.fetchall()]
+        self.assertTrue(planos)
+        return planos
+
+    def _verificar(self, url, indices_esperados):
+        planos = self._planos(url)
+        for sql, plano in planos.items():
+            # 'SCAN tabela' (ou o apelido dela, como 'SCAN T4') sem 'USING ... INDEX'
+            scans = [
+                passo for passo in plano
+                if re.fullmatch(r'SCAN \w+( AS \w+)?', passo) and passo != 'SCAN CONSTANT ROW'
+            ]
+            self.assertEqual(scans, [], f'Full scan em: {sql}')
+
+        passos = ' '.join(passo for plano in planos.values() for passo in plano)
+        for indice in indices_esperados:
+            self.assertIn(indice, passos)
+
+    def test_dashboard_usa_indices(self):
+        self._verificar(reverse('gestao:dashboard'), [
+            'pc_usuario_status_idx', 'gestao_usuario_republica_id', 'pc_confirmacao_pendente_idx',
+        ])
+
+    def test_formulario_de_conta_usa_indices(self):
+        self._verificar(reverse('gestao:conta_nova'), ['usuario_rep_status_idx'])
+
+
+class ImportarContasTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        Usuario.objects.create_user(username='de_fora')
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+
+    def _arquivo(self, nome, conteudo):
+        caminho = os.path.join(self.pasta.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_importa_csv_e_jsonl_reportando_erros(self):
+        csv_path = self._arquivo('contas.csv', (
+            'republica,nome_conta,valor_total,data_vencimento,tipo,responsavel,participantes\n'
+            'Galo,Aluguel,1000.00,2025-01-10,FIXA,adm,morador\n'
+            'Galo,Luz,abc,2025-01-15,VARIAVEL,adm,morador\n'
+            'Galo,Gás,60.00,2025-01-20,VARIAVEL,adm,de_fora\n'
+        ))
+        jsonl_path = self._arquivo('contas.jsonl', json.dumps({
+            'republica': 'Galo', 'nome_conta': 'Internet', 'valor_total': '99.90',
+            'data_vencimento': '2025-01-05', 'tipo': 'FIXA', 'responsavel': 'morador',
+            'participantes': ['adm'],
+        }) + '\n')
+
+        erros = io.StringIO()
+        call_command('importar_contas', csv_path, jsonl_path, lote=2, stdout=io.StringIO(), stderr=erros)
+
+        self.assertEqual(set(Conta.objects.values_list('nome_conta', flat=True)), {'Aluguel', 'Internet'})
+        self.assertIn('contas.csv:3: valor_total inválido', erros.getvalue())
+        self.assertIn("contas.csv:4: usuário 'de_fora' não é morador aprovado", erros.getvalue())
+
+        aluguel = Conta.objects.get(nome_conta='Aluguel')
+        self.assertEqual(aluguel.participantes.count(), 2)
+        self.assertEqual(aluguel.qtd_nao_pagos, 2)
+        self.assertEqual(Saldo.objects.get(devedor=self.morador, credor=self.adm).valor_devido, Decimal('500.00'))
+
+    def test_valores_e_nomes_fora_dos_limites_sao_erros_da_linha(self):
+        base = {
+            'republica': 'Galo', 'nome_conta': 'Luz', 'data_vencimento': '2025-01-15', 'responsavel': 'adm',
+        }
+        linhas = [
+            (1, {**base, 'valor_total': 'NaN'}),
+            (2, {**base, 'valor_total': 'Infinity'}),
+            (3, {**base, 'valor_total': '1e20'}),
+            (4, {**base, 'valor_total': '10.00', 'nome_conta': 'x' * 101}),
+            (5, {**base, 'valor_total': '99999999.99'}),
+            (6, {**base, 'valor_total': '10.00', 'divisao': 'ponderado', 'cotas': {'adm': 'NaN'}}),
+        ]
+        itens, erros = importacao.preparar_lote(linhas)
+        self.assertEqual([conta.valor_total for conta, _ in itens], [Decimal('99999999.99')])
+        self.assertEqual([numero for numero, _ in erros], [1, 2, 3, 4, 6])
+        self.assertIn('grande demais', erros[2][1])
+        self.assertIn('100 caracteres', erros[3][1])
+
+    def test_dry_run_nao_grava(self):
+        csv_path = self._arquivo('contas.csv', (
+            'republica,nome_conta,valor_total,data_vencimento,tipo,responsavel,participantes\n'
+            'Galo,Aluguel,1000.00,2025-01-10,FIXA,adm,morador\n'
+        ))
+        call_command('importar_contas', csv_path, dry_run=True, stdout=io.StringIO())
+        self.assertFalse(Conta.objects.exists())
+
+
+class ContasRecorrentesTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Aluguel',
+            'valor_total': '2000.00',
+            'data_vencimento': '2025-01-31',
+            'tipo': Conta.TipoConta.FIXA,
+            'participantes': [self.morador.pk],
+            'repetir_mensalmente': 'on',
+        })
+
+    def test_gera_proxima_competencia_uma_vez_so(self):
+        for _ in range(2):
+            call_command('gerar_contas_recorrentes', competencia='2025-02', stdout=io.StringIO())
+
+        fevereiro = Conta.objects.get(competencia=date(2025, 2, 1))
+        self.assertEqual(fevereiro.data_vencimento, date(2025, 2, 28))
+        self.assertEqual(fevereiro.tipo, Conta.TipoConta.FIXA)
+        self.assertEqual(
+            set(fevereiro.participantes.values_list('usuario_id', flat=True)), {self.adm.pk, self.morador.pk}
+        )
+        # Janeiro (criado pelo formulário) não é gerado de novo
+        call_command('gerar_contas_recorrentes', competencia='2025-01', stdout=io.StringIO())
+        self.assertEqual(Conta.objects.filter(nome_conta='Aluguel').count(), 2)
+
+    def test_morador_removido_sai_das_proximas(self):
+        self.client.post(reverse('gestao:remover_morador', args=[self.morador.pk]))
+        call_command('gerar_contas_recorrentes', competencia='2025-03', stdout=io.StringIO())
+        marco = Conta.objects.get(competencia=date(2025, 3, 1))
+        self.assertEqual(list(marco.participantes.values_list('usuario_id', flat=True)), [self.adm.pk])
+
+
+class RateioTest(SimpleTestCase):
+    """
+    Testes de propriedade com entradas aleatórias (semente fixa): em qualquer
+    estratégia, as partes somam EXATAMENTE o total e nunca são negativas.
+    """
+    CASOS = 500
+
+    def setUp(self):
+        self.aleatorio = random.Random(2024)
+
+    def _total(self):
+        return Decimal(self.aleatorio.randint(0, 10_000_000)) / 100
+
+    def _participantes(self):
+        return list(range(self.aleatorio.randint(1, 60)))
+
+    def assertFechaOTotal(self, total, divisao):
+        valores = [valor for _, valor in divisao]
+        self.assertEqual(sum(valores), total)
+        self.assertTrue(all(valor >= 0 for valor in valores))
+        self.assertTrue(all(valor == valor.quantize(Decimal('0.01')) for valor in valores))
+
+    def test_igual(self):
+        for _ in range(self.CASOS):
+            total, participantes = self._total(), self._participantes()
+            divisao = rateio.dividir(total, participantes)
+            self.assertFechaOTotal(total, divisao)
+            valores = [valor for _, valor in divisao]
+            self.assertLessEqual(max(valores) - min(valores), Decimal('0.01'))
+
+    def test_ponderado_fica_a_menos_de_um_centavo_do_exato(self):
+        for _ in range(self.CASOS):
+            total, participantes = self._total(), self._participantes()
+            pesos = {p: Decimal(self.aleatorio.randint(0, 500)) / 10 for p in participantes}
+            pesos[participantes[0]] += 1  # pelo menos um peso positivo
+            divisao = rateio.dividir(total, participantes, 'ponderado', pesos)
+            self.assertFechaOTotal(total, divisao)
+            soma_pesos = sum(pesos.values())
+            for participante, valor in divisao:
+                exato = total * pesos[participante] / soma_pesos
+                self.assertLess(abs(valor - exato), Decimal('0.01'))
+
+    def test_percentual(self):
+        for _ in range(self.CASOS):
+            total, participantes = self._total(), self._participantes()
+            cortes = sorted(self.aleatorio.randint(0, 10000) for _ in participantes[1:])
+            limites = [0] + cortes + [10000]
+            percentuais = {
+                p: Decimal(limites[i + 1] - limites[i]) / 100 for i, p in enumerate(participantes)
+            }
+            self.assertFechaOTotal(total, rateio.dividir(total, participantes, 'percentual', percentuais))
+
+    def test_fixo(self):
+        divisao = rateio.dividir(Decimal('100.00'), ['a', 'b'], 'fixo', {'a': '70.00', 'b': '30.00'})
+        self.assertEqual(divisao, [('a', Decimal('70.00')), ('b', Decimal('30.00'))])
+        with self.assertRaises(rateio.RateioInvalido):
+            rateio.dividir(Decimal('100.00'), ['a', 'b'], 'fixo', {'a': '70.00', 'b': '20.00'})
+
+    def test_numeros_nao_finitos_sao_rateio_invalido(self):
+        for estrategia, parametros in [
+            ('ponderado', {'a': 'NaN', 'b': 1}),
+            ('ponderado', {'a': 'Infinity', 'b': 1}),
+            ('ponderado', {'a': '-1', 'b': 2}),
+            ('percentual', {'a': 'Infinity', 'b': '-Infinity'}),
+            ('fixo', {'a': 'Infinity', 'b': '0'}),
+        ]:
+            with self.assertRaises(rateio.RateioInvalido):
+                rateio.dividir('10.00', ['a', 'b'], estrategia, parametros)
+        with self.assertRaises(rateio.RateioInvalido):
+            rateio.dividir('NaN', ['a', 'b'])
+
+    def test_sobra_vai_para_os_primeiros(self):
+        divisao = rateio.dividir(Decimal('100.00'), ['responsavel', 'b', 'c'])
+        self.assertEqual([valor for _, valor in divisao], [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')])
+
+
+class DashboardCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Luz', 'valor_total': '50.00', 'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [self.morador.pk],
+        })
+
+    def test_segunda_visita_nao_consulta_o_app(self):
+        self.client.get(reverse('gestao:dashboard'))
+        # Só sessão + usuário (feitos pelos middlewares de autenticação)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('gestao:dashboard'))
+        self.assertContains(response, 'Luz')
+
+    def test_mudanca_de_estado_invalida(self):
+        participacao = ParticipanteConta.objects.get(usuario=self.morador)
+        self.assertNotContains(self.client.get(reverse('gestao:dashboard')), 'Pagamentos para Confirmar')
+        self.client.force_login(self.morador)
+        self.assertContains(self.client.get(reverse('gestao:dashboard')), 'Pagar')
+
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk]))
+        self.assertContains(self.client.get(reverse('gestao:dashboard')), 'Aguardando...')
+
+        # O responsável vê a confirmação pendente, mesmo com a visita anterior em cache
+        self.client.force_login(self.adm)
+        self.assertContains(self.client.get(reverse('gestao:dashboard')), 'Pagamentos para Confirmar')
+
+
+class DashboardCacheEmArquivoTest(DashboardCacheTest):
+    """ Os mesmos testes com o backend de cache em arquivos. """
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': pasta.name,
+        }})
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        super().setUp()
+        self.pasta = pasta.name
+
+    def test_manutencao_apaga_so_os_arquivos_vencidos(self):
+        from . import cache as cache_da_dashboard
+        self.client.get(reverse('gestao:dashboard'))
+        arquivos = [os.path.join(self.pasta, nome) for nome in os.listdir(self.pasta)]
+        self.assertTrue(arquivos)
+        antigo = time.time() - cache_da_dashboard.timeout_maximo() - 60
+        os.utime(arquivos[0], (antigo, antigo))
+        with open(os.path.join(self.pasta, 'outro.txt'), 'w') as outro:
+            outro.write('não é do cache')
+        os.utime(outro.name, (antigo, antigo))
+
+        self.assertEqual(cache_da_dashboard.limpar_expirados(), 1)
+        self.assertEqual(sorted(os.listdir(self.pasta)), sorted([*map(os.path.basename, arquivos[1:]), 'outro.txt']))
+
+
+class DashboardApiTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+        for i in range(5):
+            self.client.post(reverse('gestao:conta_nova'), {
+                'nome_conta': f'Conta {i}', 'valor_total': '30.00',
+                'data_vencimento': (date.today() + timedelta(days=i % 2)).isoformat(),
+                'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [self.morador.pk],
+            })
+
+    def test_estrutura(self):
+        dados = self.client.get(reverse('gestao:api_dashboard')).json()
+        self.assertEqual(dados['usuario']['id'], self.adm.pk)
+        self.assertEqual(len(dados['pendencias']['itens']), 5)
+        self.assertIsNone(dados['pendencias']['proximo'])
+        self.assertEqual([m['username'] for m in dados['moradores']], ['adm', 'morador'])
+        self.assertEqual(dados['pendencias']['itens'][0]['valor'], '15.00')
+
+    def test_if_none_match_responde_304_sem_consultar_o_app(self):
+        url = reverse('gestao:api_dashboard')
+        etag = self.client.get(url)['ETag']
+        # Só sessão + usuário (feitos pelos middlewares de autenticação)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        participacao = ParticipanteConta.objects.filter(usuario=self.morador).first()
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk]))
+        self.client.force_login(self.adm)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['confirmacoes']['itens']), 1)
+
+    def test_paginacao_por_cursor(self):
+        url = reverse('gestao:api_dashboard_secao', args=['pendencias'])
+        vistos = []
+        cursor = ''
+        while True:
+            dados = self.client.get(url, {'limite': 2, 'cursor': cursor}).json()
+            self.assertLessEqual(len(dados['itens']), 2)
+            vistos += [item['id'] for item in dados['itens']]
+            cursor = dados['proximo']
+            if not cursor:
+                break
+        esperados = list(ParticipanteConta.objects.filter(usuario=self.adm).order_by(
+            'status_pagamento', 'conta__data_vencimento', 'id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_erros(self):
+        url = reverse('gestao:api_dashboard_secao', args=['pendencias'])
+        self.assertEqual(self.client.get(url, {'cursor': 'lixo!'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limite': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('gestao:api_dashboard_secao', args=['nada'])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class AcoesEmLoteTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.moradores = [
+            Usuario.objects.create_user(
+                username=f'morador{i}', republica=self.republica,
+                status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            for i in range(3)
+        ]
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Luz', 'valor_total': '40.00', 'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [m.pk for m in self.moradores],
+        })
+        self.conta = Conta.objects.get()
+        ParticipanteConta.objects.filter(usuario__in=self.moradores).update(
+            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        )
+        saldos.reconstruir()
+
+    def test_confirma_em_lote_com_contagem_por_resultado(self):
+        pendentes = list(ParticipanteConta.objects.filter(usuario__in=self.moradores).values_list('pk', flat=True))
+        propria = ParticipanteConta.objects.get(usuario=self.adm).pk
+        outro = Usuario.objects.create_user(username='outro')
+        alheia = ParticipanteConta.objects.create(conta=Conta.objects.create(
+            republica=self.republica, nome_conta='Gás', valor_total=10,
+            data_vencimento=date.today(), responsavel=self.moradores[0],
+        ), usuario=outro, valor_individual=10, status_pagamento='CONFIRMACAO_PENDENTE').pk
+
+        response = self.client.post(
+            reverse('gestao:confirmar_pagamentos'),
+            {'ids': [*pendentes, propria, alheia, 999999, 'x']},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json(), {
+            'aplicados': 3, 'sem_permissao': 1, 'status_invalido': 1, 'inexistentes': 2,
+        })
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.qtd_pagos, 3)
+        self.assertFalse(Saldo.objects.filter(credor=self.adm, valor_devido__gt=0).exists())
+
+        # Repetir não muda nada
+        response = self.client.post(reverse('gestao:confirmar_pagamentos'), {'ids': pendentes})
+        self.assertRedirects(response, reverse('gestao:dashboard'))
+        self.assertEqual(ParticipanteConta.objects.filter(status_pagamento='PAGO').count(), 3)
+
+    def test_rejeita_em_lote_e_aprova_moradores(self):
+        pendentes = list(ParticipanteConta.objects.filter(usuario__in=self.moradores).values_list('pk', flat=True))
+        self.client.post(reverse('gestao:rejeitar_pagamentos'), {'ids': pendentes[:2]})
+        self.assertEqual(ParticipanteConta.objects.filter(
+            usuario__in=self.moradores, status_pagamento='NAO_PAGO').count(), 2)
+        saldo = Saldo.objects.get(devedor=self.moradores[0], credor=self.adm)
+        self.assertEqual(saldo.valor_em_confirmacao, 0)
+        self.assertEqual(saldo.valor_devido, Decimal('10.00'))
+
+        candidatos = [
+            Usuario.objects.create_user(
+                username=f'candidato{i}', republica=self.republica,
+                status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            )
+            for i in range(2)
+        ]
+        response = self.client.post(
+            reverse('gestao:aprovar_moradores'),
+            {'ids': [c.pk for c in candidatos] + [self.moradores[0].pk]},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json()['aplicados'], 2)
+        self.assertEqual(response.json()['status_invalido'], 1)
+
+        self.client.force_login(self.moradores[0])
+        response = self.client.post(
+            reverse('gestao:aprovar_moradores'), {'ids': [c.pk for c in candidatos]}, HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json()['sem_permissao'], 2)
+
+
+class BuscaRepublicasTest(TestCase):
+
+    def setUp(self):
+        for i, nome in enumerate(['República Galo', 'Galo Doido', 'Toca do Lobo', 'Ágape', 'Republica Cruzeiro']):
+            Republica.objects.create(nome=nome, adm=Usuario.objects.create_user(username=f'adm{i}'))
+        self.usuario = Usuario.objects.create_user(username='procurando')
+        self.client.force_login(self.usuario)
+
+    def _nomes(self, q):
+        response = self.client.get(reverse('gestao:republica_list'), {'q': q})
+        return [republica.nome for republica in response.context['republicas']]
+
+    def test_ignora_acentos_e_acha_por_prefixo(self):
+        self.assertEqual(self._nomes('republica'), ['República Galo', 'Republica Cruzeiro'])
+        self.assertEqual(self._nomes('agape'), ['Ágape'])
+        self.assertEqual(self._nomes('tOc'), ['Toca do Lobo'])
+
+    def test_busca_aproximada_com_ranking(self):
+        self.assertEqual(self._nomes('gallo')[:2], ['Galo Doido', 'República Galo'])
+        self.assertEqual(self._nomes('república galo')[0], 'República Galo')
+        self.assertEqual(self._nomes('xyzw'), [])
+
+    def test_indice_acompanha_o_nome(self):
+        republica = Republica.objects.get(nome='Toca do Lobo')
+        republica.nome = 'Canil'
+        republica.save()
+        self.assertEqual(self._nomes('toca'), [])
+        self.assertEqual(self._nomes('canil'), ['Canil'])
+        republica.delete()
+        self.assertEqual(self._nomes('canil'), [])
+
+    def test_busca_curta_e_por_prefixo_de_palavra(self):
+        self.assertEqual(self._nomes('g'), ['Galo Doido', 'República Galo'])
+        self.assertEqual(self._nomes('Á'), ['Ágape'])
+        self.assertEqual(self._nomes('lo'), ['Toca do Lobo'])
+        self.assertEqual(self._nomes('?'), [])
+        from . import busca
+        # Percorre o índice de nomes e para no LIMIT: nada de agregar o índice todo
+        plano = busca.buscar('r')[:10].explain()
+        self.assertIn('USING INDEX sqlite_autoindex_gestao_republica', plano)
+        self.assertNotIn('TEMP B-TREE', plano)
+
+    def test_usa_o_indice_de_trigramas(self):
+        from . import busca
+        plano = busca.buscar('galo').explain()
+        # A constraint única vira um índice automático do SQLite (sqlite_autoindex_...)
+        self.assertIn('SEARCH gestao_trigramarepublica USING COVERING INDEX', plano)
+        self.assertNotRegex(plano, r'SCAN gestao_republica\b(?! USING)')
+
+
+class PaginacaoPorCursorTest(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='procurando')
+        self.client.force_login(self.usuario)
+
+    def _percorrer(self, url, parametros, chave):
+        vistos = []
+        cursor = ''
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, {**parametros, 'cursor': cursor})
+            sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+            # Nem o COUNT(*) nem o OFFSET do Paginator
+            self.assertNotIn('COUNT(*)', sql)
+            self.assertNotIn('OFFSET', sql)
+            vistos += [item.pk for item in response.context[chave]]
+            cursor = response.context[chave].proximo
+            if not cursor:
+                return vistos
+
+    def test_lista_e_busca_de_republicas(self):
+        for i in range(23):
+            Republica.objects.create(nome=f'Rep {i:02d}', adm=Usuario.objects.create_user(username=f'adm{i}'))
+        url = reverse('gestao:republica_list')
+
+        vistos = self._percorrer(url, {}, 'republicas')
+        self.assertEqual(vistos, list(Republica.objects.order_by('nome', 'id').values_list('pk', flat=True)))
+
+        vistos = self._percorrer(url, {'q': 'rep 1'}, 'republicas')
+        self.assertEqual(len(vistos), len(set(vistos)))
+        self.assertEqual(vistos[:10], list(Republica.objects.filter(nome__startswith='Rep 1')
+                                           .order_by('nome').values_list('pk', flat=True)))
+
+        response = self.client.get(url, {'cursor': 'lixo'})
+        self.assertRedirects(response, url)
+
+    def test_pendencias_da_dashboard(self):
+        republica = Republica.objects.create(nome='Galo', adm=self.usuario)
+        self.usuario.republica = republica
+        self.usuario.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.usuario.save()
+        for i in range(45):
+            conta = Conta.objects.create(
+                republica=republica, nome_conta=f'Conta {i}', valor_total=Decimal('10.00'),
+                data_vencimento=date.today() + timedelta(days=i % 7), responsavel=self.usuario,
+            )
+            ParticipanteConta.objects.create(
+                conta=conta, usuario=self.usuario, valor_individual=Decimal('10.00'),
+                status_pagamento=random.Random(i).choice(ParticipanteConta.StatusPagamento.values),
+            )
+        cache.clear()
+
+        vistos = self._percorrer(reverse('gestao:dashboard'), {}, 'lista_pendencias')
+        esperados = ParticipanteConta.objects.order_by('status_pagamento', 'conta__data_vencimento', 'id')
+        self.assertEqual(vistos, list(esperados.values_list('pk', flat=True)))
+
+        response = self.client.get(reverse('gestao:dashboard'), {'cursor': 'lixo'})
+        self.assertRedirects(response, reverse('gestao:dashboard'))
+
+
+class ArquivoTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        for i in range(7):
+            conta = Conta.objects.create(
+                republica=self.republica, nome_conta=f'Conta {i}', valor_total=Decimal('20.00'),
+                data_vencimento=date(2025, 1, 1) + timedelta(days=30 * i), responsavel=self.adm,
+            )
+            for usuario in (self.adm, self.morador):
+                ParticipanteConta.objects.create(conta=conta, usuario=usuario, valor_individual=Decimal('10.00'))
+        # As 5 primeiras ficam pagas
+        ParticipanteConta.objects.filter(conta__nome_conta__in=[f'Conta {i}' for i in range(5)]).update(
+            status_pagamento=ParticipanteConta.StatusPagamento.PAGO,
+        )
+        Conta.atualizar_resumo(Conta.objects.values_list('pk', flat=True))
+
+    def test_quitada_em_so_muda_quando_a_conta_fica_paga(self):
+        conta = Conta.objects.get(nome_conta='Conta 0')
+        quitada_em = conta.quitada_em
+        self.assertIsNotNone(quitada_em)
+        Conta.atualizar_resumo([conta.pk])
+        conta.refresh_from_db()
+        self.assertEqual(conta.quitada_em, quitada_em)
+        self.assertIsNone(Conta.objects.get(nome_conta='Conta 6').quitada_em)
+
+    def test_arquiva_as_antigas_e_o_historico_junta_tudo(self):
+        # 3 quitadas há um ano, 2 há pouco tempo
+        Conta.objects.filter(nome_conta__in=['Conta 0', 'Conta 1', 'Conta 2']).update(
+            quitada_em=timezone.now() - timedelta(days=365),
+        )
+        saida = io.StringIO()
+        call_command('arquivar_contas', '--meses', '6', '--lote', '2', stdout=saida)
+        self.assertIn('3 contas', saida.getvalue())
+        self.assertEqual(ContaArquivada.objects.count(), 3)
+        self.assertEqual(ParticipanteArquivado.objects.count(), 6)
+        self.assertEqual(Conta.objects.count(), 4)
+        self.assertEqual(list(ContaArquivada.objects.values_list('nome_conta', flat=True).order_by('id')),
+                         ['Conta 0', 'Conta 1', 'Conta 2'])
+
+        # Rodar de novo não faz nada
+        call_command('arquivar_contas', stdout=io.StringIO())
+        self.assertEqual(ContaArquivada.objects.count(), 3)
+
+        self.client.force_login(self.morador)
+        cache.clear()
+        self.assertNotContains(self.client.get(reverse('gestao:dashboard')), 'Conta 0')
+
+        nomes = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('gestao:historico'), {'cursor': cursor})
+            pagina = response.context['participacoes']
+            nomes += [participacao.conta.nome_conta for participacao in pagina]
+            cursor = pagina.proximo
+            if not cursor:
+                break
+        self.assertEqual(nomes, [f'Conta {i}' for i in reversed(range(7))])
+
+    def test_recorrencia_arquivada_nao_e_gerada_de_novo(self):
+        recorrente = ContaRecorrente.objects.create(
+            republica=self.republica, nome_conta='Aluguel', valor_total=Decimal('100.00'),
+            dia_vencimento=5, responsavel=self.adm,
+        )
+        call_command('gerar_contas_recorrentes', '--competencia', '2025-01', stdout=io.StringIO())
+        ParticipanteConta.objects.filter(conta__recorrencia=recorrente).update(status_pagamento='PAGO')
+        Conta.atualizar_resumo(Conta.objects.filter(recorrencia=recorrente).values_list('pk', flat=True))
+        arquivo.arquivar(timezone.now() + timedelta(days=1))
+
+        call_command('gerar_contas_recorrentes', '--competencia', '2025-01', stdout=io.StringIO())
+        self.assertFalse(Conta.objects.filter(recorrencia=recorrente).exists())
+        self.assertEqual(ContaArquivada.objects.filter(recorrencia=recorrente).count(), 1)
+
+
+class RelatoriosTest(TestCase):
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+
+    def _nova_conta(self, nome, valor, vencimento, tipo=Conta.TipoConta.VARIAVEL):
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': nome, 'valor_total': valor, 'data_vencimento': vencimento.isoformat(),
+            'tipo': tipo, 'participantes': [self.morador.pk],
+        })
+        return Conta.objects.get(nome_conta=nome)
+
+    def _resumos(self):
+        return (
+            sorted(ResumoMensal.objects.values_list('competencia', 'tipo', 'qtd_contas', 'valor_total', 'valor_pago')),
+            sorted(ResumoMorador.objects.values_list('usuario_id', 'competencia', 'valor_total', 'valor_pago')),
+        )
+
+    def test_resumos_incrementais_batem_com_a_reconstrucao(self):
+        luz = self._nova_conta('Luz', '100.00', date(2026, 3, 10))
+        self._nova_conta('Aluguel', '900.00', date(2026, 3, 5), Conta.TipoConta.FIXA)
+        agua = self._nova_conta('Água', '60.00', date(2026, 4, 10))
+        self._nova_conta('Gás', '30.00', date(2026, 4, 20))
+
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[luz.participantes.get(usuario=self.morador).pk]))
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[luz.participantes.get(usuario=self.morador).pk]))
+        self.client.post(reverse('gestao:conta_delete', args=[agua.pk]))
+        ParticipanteConta.objects.filter(conta=luz).update(status_pagamento='PAGO')
+        Conta.atualizar_resumo([luz.pk])
+        arquivo.arquivar(timezone.now() + timedelta(days=1))
+
+        # Os relatórios são recalculados pelos workers
+        self.assertEqual(self._resumos(), ([], []))
+        tarefas.processar()
+        incrementais = self._resumos()
+        call_command('reconstruir_relatorios', stdout=io.StringIO())
+        self.assertEqual(incrementais, self._resumos())
+
+        marco = ResumoMensal.objects.get(competencia=date(2026, 3, 1), tipo=Conta.TipoConta.VARIAVEL)
+        self.assertEqual((marco.qtd_contas, marco.valor_total, marco.valor_pago), (1, Decimal('100.00'), Decimal('100.00')))
+        abril = ResumoMorador.objects.get(usuario=self.morador, competencia=date(2026, 4, 1))
+        self.assertEqual((abril.valor_total, abril.valor_em_aberto), (Decimal('15.00'), Decimal('15.00')))
+
+    def test_recalcula_milhares_de_meses_em_lotes(self):
+        self._nova_conta('Luz', '100.00', date(2026, 3, 10))
+        tarefas.processar()
+        esperado = self._resumos()
+        # Um OR por mês num WHERE só passaria do limite de profundidade do SQLite
+        meses = [(self.republica.pk, date(1900 + ano, mes, 1)) for ano in range(130) for mes in range(1, 13)]
+        ResumoMensal.recalcular(meses)
+        self.assertEqual(self._resumos(), esperado)
+
+    def test_pagina_e_csv(self):
+        self._nova_conta('Luz', '100.00', date(2026, 3, 10))
+        self._nova_conta('Aluguel', '900.00', date(2026, 3, 5), Conta.TipoConta.FIXA)
+        tarefas.processar()
+
+        response = self.client.get(reverse('gestao:relatorios'), {'mes': '2026-03'})
+        self.assertEqual([conta.nome_conta for conta in response.context['maiores_despesas']], ['Aluguel', 'Luz'])
+        self.assertEqual(response.context['totais_mensais'][0]['valor_total'], Decimal('1000.00'))
+        self.assertEqual(response.context['extrato'][0].valor_total, Decimal('500.00'))
+
+        response = self.client.get(reverse('gestao:extrato_csv'))
+        self.assertTrue(response.streaming)
+        linhas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(linhas[0], 'vencimento,conta,tipo,valor_total,minha_parte,status,arquivada')
+        self.assertEqual(linhas[1:], [
+            '2026-03-05,Aluguel,FIXA,900.00,450.00,NAO_PAGO,não',
+            '2026-03-10,Luz,VARIAVEL,100.00,50.00,NAO_PAGO,não',
+        ])
+
+        sem_republica = Usuario.objects.create_user(username='sozinho')
+        self.client.force_login(sem_republica)
+        self.assertRedirects(self.client.get(reverse('gestao:relatorios')), reverse('gestao:dashboard'))
+
+
+class MetricasTest(TestCase):
+
+    def setUp(self):
+        metricas.REGISTRO.limpar()
+        cache.clear()
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.client.force_login(self.adm)
+
+    def test_registra_tempo_e_queries_por_view(self):
+        self.client.get(reverse('gestao:dashboard'))
+        self.client.get(reverse('gestao:dashboard'))
+        dados = metricas.REGISTRO.exportar()['gestao:dashboard']
+        self.assertEqual(dados['duracao_segundos']['total'], 2)
+        # 7 queries na primeira visita, 2 na segunda (cache)
+        self.assertEqual(dados['queries']['soma'], 9)
+        self.assertGreater(dados['template_segundos']['soma'], 0)
+
+        self.assertEqual(self.client.get(reverse('gestao:metricas')).status_code, 403)
+        self.adm.is_staff = True
+        self.adm.save()
+        texto = self.client.get(reverse('gestao:metricas')).content.decode()
+        self.assertIn('# TYPE gestao_view_queries histogram', texto)
+        self.assertIn('gestao_view_queries_bucket{view="gestao:dashboard",le="+Inf"} 2', texto)
+        self.assertIn('gestao_view_queries_sum{view="gestao:dashboard"} 9', texto)
+
+        saida = io.StringIO()
+        call_command('metricas', stdout=saida)
+        self.assertIn('gestao:dashboard', saida.getvalue())
+
+    def test_cada_processo_grava_na_propria_vaga(self):
+        self.addCleanup(setattr, metricas, '_vaga_deste_processo', None)
+        vagas = {} # O estado de cada processo simulado
+        for processo in ['web:1', 'web:2', 'web:1', 'web:2']:
+            metricas._vaga_deste_processo = vagas.get(processo)
+            with mock.patch.object(metricas, '_id_processo', return_value=processo):
+                metricas.gravar_snapshot()
+            vagas[processo] = metricas._vaga_deste_processo
+        self.assertNotEqual(vagas['web:1'], vagas['web:2'])
+        self.assertEqual(
+            sorted(processo for processo, _ in cache.get_many(metricas.VAGAS).values()), ['web:1', 'web:2'],
+        )
+        self.assertEqual(len(metricas.snapshots()), 2)
+
+    async def test_snapshot_das_views_async_sai_do_event_loop(self):
+        threads = []
+        await self.async_client.aforce_login(self.adm)
+        with mock.patch.object(metricas, 'gravar_snapshot', lambda: threads.append(threading.current_thread())):
+            await self.async_client.get(reverse('gestao:dashboard'))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_loga_request_acima_do_orcamento(self):
+        with override_settings(GESTAO_METRICAS={'LIMITE_QUERIES': 3, 'LIMITE_TEMPO_MS': None}):
+            self.client.handler.load_middleware()
+            with self.assertLogs('gestao.metricas', 'WARNING') as logs:
+                self.client.get(reverse('gestao:dashboard'))
+        self.assertIn('view gestao:dashboard', logs.output[0])
+        self.assertIn('queries', logs.output[0])
+
+    def test_orcamento_por_view_e_modo_estrito(self):
+        config = {'LIMITE_QUERIES': 3, 'LIMITES_QUERIES_POR_VIEW': {'gestao:dashboard': 50}, 'LIMITE_TEMPO_MS': None}
+        with override_settings(GESTAO_METRICAS=config):
+            self.client.handler.load_middleware()
+            with self.assertNoLogs('gestao.metricas', 'WARNING'):
+                self.client.get(reverse('gestao:dashboard'))
+        with override_settings(GESTAO_METRICAS={**config, 'LIMITE_QUERIES': 0, 'LIMITES_QUERIES_POR_VIEW': {}, 'ESTRITO': True}):
+            self.client.handler.load_middleware()
+            with self.assertRaisesMessage(metricas.OrcamentoExcedido, 'view gestao:dashboard'):
+                self.client.get(reverse('gestao:dashboard'))
+
+
+class BenchmarkTest(TestCase):
+
+    def test_toda_rota_tem_cenario(self):
+        self.assertEqual(benchmark.rotas_sem_cenario(), [])
+
+    def test_semeia_mede_e_acusa_regressao(self):
+        criados = benchmark.semear(republicas=2, moradores=4, contas=30, sem_republica=2)
+        self.assertEqual(criados['contas'], 60)
+        # Os resumos e saldos saem consistentes com as participações criadas
+        conta = Conta.objects.filter(republica__adm__username__startswith=benchmark.PREFIXO).first()
+        pagos = conta.participantes.filter(status_pagamento=ParticipanteConta.StatusPagamento.PAGO).count()
+        self.assertEqual(conta.qtd_pagos, pagos)
+        self.assertTrue(ResumoMensal.objects.exists())
+
+        caminho = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        rotas = ['dashboard', 'confirmar_pagamentos', 'extrato_csv']
+        argumentos = ['--repeticoes', '1', '--aquecimento', '0', '--baseline', caminho]
+        for rota in rotas:
+            argumentos += ['--rota', rota]
+        pendentes = ParticipanteConta.objects.filter(
+            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        ).count()
+        call_command('benchmark', *argumentos, '--salvar', stdout=io.StringIO())
+        # As ações medidas são desfeitas
+        self.assertEqual(ParticipanteConta.objects.filter(
+            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
+        ).count(), pendentes)
+
+        with open(caminho) as arquivo_baseline:
+            baseline = json.load(arquivo_baseline)
+        self.assertEqual(sorted(baseline), sorted(rotas))
+        baseline['dashboard']['queries'] -= 1
+        with open(caminho, 'w') as arquivo_baseline:
+            json.dump(baseline, arquivo_baseline)
+        # Mesmo ponto de partida da primeira medição (a membresia ficou no cache)
+        cache.clear()
+        with self.assertRaisesMessage(CommandError, 'dashboard:'):
+            call_command('benchmark', *argumentos, '--tolerancia', '100', stdout=io.StringIO())
+
+        self.assertEqual(benchmark.limpar(), 15)
+        self.assertFalse(Usuario.objects.filter(username__startswith=benchmark.PREFIXO).exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Ajustes só do SQLite')
+class BancoSqliteTest(TestCase):
+
+    def test_pragmas_aplicados_na_conexao(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1) # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 20000)
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -20000)
+
+    @override_settings(GESTAO_SQLITE_PRAGMAS={'busy_timeout': 5000})
+    def test_settings_sobrescrevem_so_as_chaves_que_definem(self):
+        self.assertEqual(banco.pragmas(), {**banco.PRAGMAS_PADRAO, 'busy_timeout': 5000})
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Ajustes só do SQLite')
+class ConcorrenciaSqliteTest(TransactionTestCase):
+    """ As transições de pagamento em paralelo, pelas conexões do Django, com e sem os ajustes. """
+
+    def test_ajustes_acabam_com_database_locked(self):
+        # A república 1 do banco temporário não é a daqui: o plano dela fica no cache
+        cache.set(acerto._chave(1), 'plano')
+        medidas = {
+            perfil: banco.medir_concorrencia(perfil, escritores=3, transacoes=20, leitores=1)
+            for perfil in ('padrao', 'ajustado')
+        }
+        ajustado, padrao = medidas['ajustado'], medidas['padrao']
+        self.assertEqual((ajustado['commits'], ajustado['erros']), (60, 0))
+        self.assertGreater(ajustado['leituras'], 0)
+        # Com BEGIN DEFERRED, quem lê e depois escreve leva "database is locked"
+        self.assertTrue(
+            padrao['erros'] > 0 or padrao['commits_por_segundo'] < ajustado['commits_por_segundo'], medidas,
+        )
+        self.assertEqual(cache.get(acerto._chave(1)), 'plano')
+        cache.clear()
+
+
+class ViewsAsyncTest(TestCase):
+    """ As views de leitura async, pelo handler ASGI (AsyncClient). """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.sem_republica = Usuario.objects.create_user(username='sozinho')
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Internet', 'valor_total': '100.00', 'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.FIXA, 'participantes': [self.morador.pk],
+        })
+
+    async def test_dashboard_e_api(self):
+        await self.async_client.aforce_login(self.adm)
+        response = await self.async_client.get(reverse('gestao:dashboard'))
+        self.assertContains(response, 'Internet')
+        self.assertContains(response, 'morador')
+
+        dados = (await self.async_client.get(reverse('gestao:api_dashboard'))).json()
+        self.assertEqual([morador['username'] for morador in dados['moradores']], ['adm', 'morador'])
+        self.assertEqual(len(dados['pendencias']['itens']), 1)
+        response = await self.async_client.get(reverse('gestao:api_dashboard_secao', args=['confirmacoes']))
+        self.assertEqual(response.json(), {'itens': [], 'proximo': None})
+
+        response = await self.async_client.get(reverse('gestao:dashboard'), {'cursor': 'lixo'})
+        self.assertRedirects(response, reverse('gestao:dashboard'), fetch_redirect_response=False)
+
+    async def test_lista_de_republicas_e_login(self):
+        response = await self.async_client.get(reverse('gestao:republica_list'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await self.async_client.get(reverse('gestao:api_dashboard'))).status_code, 403)
+
+        await self.async_client.aforce_login(self.sem_republica)
+        response = await self.async_client.get(reverse('gestao:republica_list'), {'q': 'galo'})
+        self.assertContains(response, 'Galo')
+
+
+class EventosTest(TestCase):
+    """ Notificações ao vivo: quem recebe o quê, pelo barramento e pela outbox. """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.novato = Usuario.objects.create_user(username='novato')
+
+    def _fluxo(self):
+        """ Conta nova, pagamento marcado e confirmado, pedido de entrada. """
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Luz', 'valor_total': '80.00', 'data_vencimento': date(2026, 3, 10).isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [self.morador.pk],
+        })
+        participacao = ParticipanteConta.objects.get(usuario=self.morador)
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk]))
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk])) # repetido: não publica de novo
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[participacao.pk]))
+        self.client.force_login(self.novato)
+        self.client.post(reverse('gestao:solicitar_entrada', args=[self.republica.pk]))
+
+    def test_barramento_entrega_para_os_destinatarios(self):
+        filas = {usuario.pk: queue.Queue() for usuario in (self.adm, self.morador)}
+        for usuario_id, fila in filas.items():
+            eventos.BARRAMENTO.inscrever(usuario_id, fila)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._fluxo()
+        finally:
+            for usuario_id, fila in filas.items():
+                eventos.BARRAMENTO.cancelar(usuario_id, fila)
+
+        def tipos(fila):
+            return [fila.get_nowait()['tipo'] for _ in range(fila.qsize())]
+        self.assertEqual(tipos(filas[self.adm.pk]), [eventos.PAGAMENTO_MARCADO, eventos.SOLICITACAO_ENTRADA])
+        self.assertEqual(tipos(filas[self.morador.pk]), [eventos.CONTA_CRIADA, eventos.PAGAMENTO_CONFIRMADO])
+        self.assertFalse(EventoNotificacao.objects.exists())
+
+    @override_settings(GESTAO_EVENTOS={'OUTBOX': True, 'INTERVALO_OUTBOX': 0.01, 'HEARTBEAT': 15})
+    def test_outbox_e_stream(self):
+        self._fluxo()
+        self.assertEqual(EventoNotificacao.objects.count(), 4)
+
+        self.client.force_login(self.morador)
+        response = self.client.get(reverse('gestao:eventos'), headers={'Last-Event-ID': '0'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        primeiro = next(iter(response.streaming_content)).decode()
+        response.close()
+        conta_criada = EventoNotificacao.objects.get(tipo=eventos.CONTA_CRIADA)
+        self.assertTrue(primeiro.startswith(f'id: {conta_criada.pk}\n'))
+        self.assertIn('"mensagem":"Nova conta: \\"Luz\\", vence em 10/03."', primeiro)
+
+        # Ao reconectar, continua depois do último visto
+        stream = eventos.stream_sincrono(self.morador, conta_criada.pk)
+        self.assertIn('"tipo":"pagamento_confirmado"', next(stream))
+        stream.close()
+
+        EventoNotificacao.objects.update(criado_em=timezone.now() - timedelta(hours=25))
+        self.assertEqual(eventos.limpar(), 4)
+
+
+class TarefasTest(TestCase):
+    """ Fila de tarefas: emails das notificações, lotes, novas tentativas e o comando dos workers. """
+
+    def setUp(self):
+        cache.clear() # A membresia em cache de outro teste teria os mesmos ids
+        self.adm = Usuario.objects.create_user(username='adm', email='adm@example.com')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', email='morador@example.com', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.novato = Usuario.objects.create_user(
+            username='novato', email='novato@example.com', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+        )
+
+    def test_emails_saem_pelos_workers_em_lote(self):
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Luz', 'valor_total': '80.00', 'data_vencimento': date(2026, 3, 10).isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [self.morador.pk],
+        })
+        self.client.post(reverse('gestao:aprovar_morador', args=[self.novato.pk]))
+        self.client.force_login(self.morador)
+        self.client.post(reverse('gestao:marcar_pago', args=[ParticipanteConta.objects.get(usuario=self.morador).pk]))
+        # Nada sai durante o request
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(tarefas.processar(), 5) # 3 emails + 2 recálculos de relatórios
+        self.assertEqual(
+            sorted((email.to[0], email.subject) for email in mail.outbox),
+            [
+                ('adm@example.com', '[República] Pagamento para confirmar'),
+                ('morador@example.com', '[República] Nova conta'),
+                ('novato@example.com', '[República] Entrada aprovada'),
+            ],
+        )
+        self.assertTrue(ResumoMensal.objects.filter(competencia=date(2026, 3, 1)).exists())
+        self.assertFalse(Tarefa.objects.exclude(status=Tarefa.Status.CONCLUIDA).exists())
+
+    def test_email_que_falha_nao_reenvia_os_outros_do_lote(self):
+        argumentos = [
+            {'tipo': 'teste', 'usuarios': [usuario.pk], 'mensagem': 'Oi'}
+            for usuario in (self.adm, self.morador, self.novato)
+        ]
+        Tarefa.enfileirar('enviar_emails', argumentos)
+        enviar = locmem.EmailBackend.send_messages
+        falhar = [True]
+
+        def send_messages(conexao, mensagens):
+            if mensagens[0].to == ['morador@example.com'] and falhar:
+                falhar.pop()
+                raise OSError('conexão caiu')
+            return enviar(conexao, mensagens)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', send_messages):
+            with self.assertLogs('gestao.tarefas', 'WARNING'):
+                self.assertEqual(tarefas.processar(), 2)
+            self.assertEqual(sorted(email.to[0] for email in mail.outbox), ['adm@example.com', 'novato@example.com'])
+            pendente = Tarefa.objects.get(status=Tarefa.Status.PENDENTE)
+            self.assertIn('conexão caiu', pendente.erro)
+
+            # Na nova tentativa, só o email que falhou sai
+            Tarefa.objects.update(executar_em=timezone.now())
+            self.assertEqual(tarefas.processar(), 1)
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            ['adm@example.com', 'morador@example.com', 'novato@example.com'],
+        )
+
+    def test_mesmo_mes_recalculado_uma_vez_por_lote(self):
+        chamadas = []
+        original = tarefas.REGISTRO['recalcular_relatorios']
+        tarefas.REGISTRO['recalcular_relatorios'] = (chamadas.append, True)
+        try:
+            for _ in range(3):
+                ResumoMensal.agendar([(self.republica.pk, date(2026, 3, 1))])
+            tarefas.processar()
+        finally:
+            tarefas.REGISTRO['recalcular_relatorios'] = original
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(len(chamadas[0]), 3)
+
+    @override_settings(GESTAO_TAREFAS={'MAX_TENTATIVAS': 2, 'ESPERA_BASE': 30})
+    def test_falha_tenta_de_novo_com_espera_e_desiste(self):
+        def falha():
+            raise ValueError('SMTP fora do ar')
+        tarefas.REGISTRO['falha_teste'] = (falha, False)
+        try:
+            tarefa, = Tarefa.enfileirar('falha_teste', [{}])
+            with self.assertLogs('gestao.tarefas', 'WARNING'):
+                tarefas.processar()
+            tarefa.refresh_from_db()
+            self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.Status.PENDENTE, 1))
+            self.assertIn('SMTP fora do ar', tarefa.erro)
+            self.assertGreater(tarefa.executar_em, timezone.now() + timedelta(seconds=25))
+
+            # Ainda não é hora: ninguém pega
+            self.assertEqual(tarefas.reivindicar('outro', 10), [])
+            Tarefa.objects.update(executar_em=timezone.now())
+            with self.assertLogs('gestao.tarefas', 'ERROR'):
+                tarefas.processar()
+            tarefa.refresh_from_db()
+            self.assertEqual((tarefa.status, tarefa.tentativas), (Tarefa.Status.FALHOU, 2))
+        finally:
+            del tarefas.REGISTRO['falha_teste']
+
+    def test_reivindicacao_e_tarefas_travadas(self):
+        Tarefa.enfileirar('manutencao', [{}, {}, {}])
+        primeiro = tarefas.reivindicar('worker-1', 2)
+        segundo = tarefas.reivindicar('worker-2', 2)
+        self.assertEqual(len(primeiro), 2)
+        self.assertEqual(len(segundo), 1)
+        self.assertEqual(tarefas.reivindicar('worker-3', 2), [])
+
+        # worker-1 morreu: as tarefas dele voltam para a fila depois do timeout
+        Tarefa.objects.filter(travada_por='worker-1').update(travada_em=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tarefas.liberar_travadas(), 2)
+        out = io.StringIO()
+        call_command('run_workers', '--uma-vez', stdout=out)
+        self.assertIn('2 tarefas concluídas', out.getvalue())
+
+
+class LembretesTest(TestCase):
+    """ Lembretes de vencimento: um email por morador, sem repetir o que já foi lembrado. """
+
+    def setUp(self):
+        self.adm = Usuario.objects.create_user(username='adm', email='adm@example.com')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.morador = Usuario.objects.create_user(username='morador', email='morador@example.com')
+        self.sem_email = Usuario.objects.create_user(username='sem_email')
+        self.hoje = date(2026, 3, 10)
+
+    def _conta(self, nome, vencimento, status=ParticipanteConta.StatusPagamento.NAO_PAGO):
+        conta = Conta.objects.create(
+            republica=self.republica, nome_conta=nome, valor_total=Decimal('90.00'),
+            data_vencimento=vencimento, responsavel=self.adm,
+        )
+        for usuario in (self.adm, self.morador, self.sem_email):
+            ParticipanteConta.objects.create(
+                conta=conta, usuario=usuario, valor_individual=Decimal('30.00'), status_pagamento=status,
+            )
+        Conta.atualizar_resumo([conta.pk], relatorios=False)
+        return conta
+
+    def test_digest_por_morador_sem_repetir(self):
+        self._conta('Luz', date(2026, 3, 1))          # atrasada
+        self._conta('Água', date(2026, 3, 12))        # vence em 2 dias
+        self._conta('Aluguel', date(2026, 3, 30))     # longe demais
+        self._conta('Gás', date(2026, 3, 5), ParticipanteConta.StatusPagamento.PAGO)
+        morador = ParticipanteConta.objects.filter(usuario=self.morador, conta__nome_conta='Água')
+        morador.update(status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE)
+
+        with self.assertNumQueries(5): # a varredura, e o lote: savepoint, tarefas, registro, release
+            self.assertEqual(lembretes.enviar(self.hoje, dias=3), (2, 3))
+        tarefas.processar()
+        emails = {email.to[0]: email.body for email in mail.outbox}
+        self.assertEqual(sorted(emails), ['adm@example.com', 'morador@example.com'])
+        self.assertIn('Contas atrasadas:\n- Luz (Galo): R$ 30.00, vence em 01/03/2026', emails['adm@example.com'])
+        self.assertIn('próximos 3 dias:\n- Água (Galo)', emails['adm@example.com'])
+        self.assertNotIn('Água', emails['morador@example.com'])
+
+        # No dia seguinte só o que mudou de tipo: a Água venceu
+        self.assertEqual(lembretes.enviar(self.hoje, dias=3), (0, 0))
+        self.assertEqual(lembretes.enviar(date(2026, 3, 13), dias=3), (1, 1))
+        self.assertEqual(LembreteEnviado.objects.filter(tipo=LembreteEnviado.Tipo.ATRASADA).count(), 3)
+
+    def test_comando_e_plano(self):
+        self._conta('Luz', date(2026, 3, 1))
+        out = io.StringIO()
+        call_command('enviar_lembretes', '--data', '2026-03-10', '--dry-run', stdout=out)
+        self.assertIn('2 moradores receberiam lembrete de 2 contas', out.getvalue())
+        self.assertFalse(LembreteEnviado.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('enviar_lembretes', '--data', '10/03/2026')
+
+        if connection.vendor == 'sqlite':
+            plano = lembretes.pendentes(self.hoje, 3).explain()
+            self.assertIn('pc_usuario_status_idx', plano)
+
+
+class PermissoesTest(TestCase):
+    """ Checagens de ADM a partir da membresia (gestao.permissoes), sem carregar o usuário alvo. """
+
+    def setUp(self):
+        cache.clear()
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.morador = Usuario.objects.create_user(
+            username='morador', republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.novato = Usuario.objects.create_user(
+            username='novato', republica=self.republica,
+            status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+        )
+        outra = Republica.objects.create(nome='Toca', adm=Usuario.objects.create_user(username='outro_adm'))
+        self.de_fora = Usuario.objects.create_user(
+            username='de_fora', republica=outra, status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+        )
+
+    def _membresia(self, usuario):
+        return permissoes.carregar(Usuario.objects.get(pk=usuario.pk))
+
+    def test_papeis(self):
+        membresia = self._membresia(self.adm)
+        self.assertEqual(membresia.papel, permissoes.ADM)
+        self.assertEqual(membresia.moradores, {self.adm.pk, self.morador.pk})
+        self.assertEqual(membresia.pendentes, {self.novato.pk})
+        self.assertTrue(membresia.administra(self.novato.pk))
+        self.assertFalse(membresia.administra(self.de_fora.pk))
+        self.assertEqual(self._membresia(self.morador).papel, permissoes.MORADOR)
+        self.assertFalse(self._membresia(self.morador).administra(self.novato.pk))
+        self.assertEqual(self._membresia(self.novato).papel, permissoes.PENDENTE)
+        self.assertIsNone(self._membresia(Usuario.objects.create_user(username='solto')).papel)
+
+    def test_aprovar_responde_da_membresia_em_cache(self):
+        self.client.force_login(self.adm)
+        self.client.get(reverse('gestao:dashboard')) # Deixa a membresia no cache
+        # sessão + usuário + UPDATE condicional + evento no registro + invalidação
+        # + tarefa de email (e o SAVEPOINT da transação em volta)
+        with self.assertNumQueries(8):
+            self.client.post(reverse('gestao:aprovar_morador', args=[self.novato.pk]))
+        self.novato.refresh_from_db()
+        self.assertEqual(self.novato.status_associacao, Usuario.StatusAssociacao.APROVADO)
+
+        # A invalidação chega a todos da república: o morador já vê o novato como morador
+        self.client.force_login(self.morador)
+        self.client.get(reverse('gestao:dashboard'))
+        self.assertIn(self.novato.pk, self._membresia(self.morador).moradores)
+
+        # Sem permissão fora da própria república; repetir só avisa
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:aprovar_morador', args=[self.de_fora.pk]))
+        self.client.post(reverse('gestao:rejeitar_morador', args=[self.novato.pk]))
+        self.de_fora.refresh_from_db()
+        self.novato.refresh_from_db()
+        self.assertEqual(self.de_fora.status_associacao, Usuario.StatusAssociacao.AGUARDANDO_APROVACAO)
+        self.assertEqual(self.novato.status_associacao, Usuario.StatusAssociacao.APROVADO)
+
+    def test_contexto_velho_nao_aplica_mudanca(self):
+        self.client.force_login(self.adm)
+        self.client.get(reverse('gestao:dashboard'))
+        # Outra aba rejeitou o novato sem passar pela invalidação
+        Usuario.objects.filter(pk=self.novato.pk).update(
+            republica=None, status_associacao=Usuario.StatusAssociacao.NAO_APROVADO,
+        )
+        response = self.client.post(reverse('gestao:aprovar_morador', args=[self.novato.pk]), follow=True)
+        self.assertContains(response, 'Esta ação não pôde ser executada.')
+        self.novato.refresh_from_db()
+        self.assertEqual(self.novato.status_associacao, Usuario.StatusAssociacao.NAO_APROVADO)
+
+        self.client.post(reverse('gestao:remover_morador', args=[self.morador.pk]))
+        self.morador.refresh_from_db()
+        self.assertIsNone(self.morador.republica_id)
+        self.assertNotIn(self.morador.pk, self._membresia(self.adm).membros)
+
+
+class AcertoTest(TestCase):
+    """ Plano de acerto (gestao.acerto): poucas transferências, cache invalidado e quitação em lote. """
+
+    def setUp(self):
+        cache.clear()
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.ana, self.bia = [
+            Usuario.objects.create_user(
+                username=username, republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+            )
+            for username in ['ana', 'bia']
+        ]
+        # ana e bia devem 30 ao adm; bia deve 30 à ana: no líquido, só bia paga 60 ao adm
+        self._conta(self.adm, 'Aluguel', '90.00', [self.ana, self.bia])
+        self._conta(self.ana, 'Luz', '60.00', [self.bia])
+
+    def _conta(self, responsavel, nome, valor, participantes):
+        self.client.force_login(responsavel)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': nome, 'valor_total': valor, 'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.VARIAVEL, 'participantes': [usuario.pk for usuario in participantes],
+        })
+
+    def _plano(self, usuario):
+        self.client.force_login(usuario)
+        return self.client.get(reverse('gestao:api_acerto')).json()
+
+    def test_transferencias_zeram_todos_os_saldos(self):
+        sorteio = random.Random(7)
+        saldos = {usuario_id: sorteio.randint(-50000, 50000) for usuario_id in range(1, 300)}
+        saldos[300] = -sum(saldos.values())
+        saldos.update({301: 1234, 302: -1234}) # par exato: uma transferência só
+        plano = acerto.transferencias(saldos)
+
+        self.assertLessEqual(len(plano), len(saldos) - 1)
+        self.assertIn((302, 301, 1234), plano)
+        restante = dict(saldos)
+        for de, para, valor in plano:
+            self.assertGreater(valor, 0)
+            restante[de] += valor
+            restante[para] -= valor
+        self.assertEqual(set(restante.values()), {0})
+        self.assertEqual(acerto.transferencias(saldos), plano)
+
+    def test_plano_acompanha_os_saldos(self):
+        dados = self._plano(self.ana)
+        self.assertEqual(dados['transferencias'], [
+            {'de': {'id': self.bia.pk, 'username': 'bia'}, 'para': {'id': self.adm.pk, 'username': 'adm'}, 'valor': '60.00'},
+        ])
+        response = self.client.get(reverse('gestao:dashboard'))
+        self.assertContains(response, 'Acerto de contas')
+        self.assertNotContains(response, 'Confirmar acerto')
+
+        # bia paga a ana por fora do acerto: o plano em cache é invalidado
+        self.client.force_login(self.bia)
+        participacao = ParticipanteConta.objects.get(usuario=self.bia, conta__nome_conta='Luz')
+        self.client.post(reverse('gestao:marcar_pago', args=[participacao.pk]))
+        self.client.force_login(self.ana)
+        self.client.post(reverse('gestao:confirmar_pagamento', args=[participacao.pk]))
+        dados = self._plano(self.adm)
+        self.assertEqual(
+            sorted((item['de']['username'], item['valor']) for item in dados['transferencias']),
+            [('ana', '30.00'), ('bia', '30.00')],
+        )
+        with self.assertNumQueries(2): # Só sessão + usuário: o plano está em cache
+            self.client.get(reverse('gestao:api_acerto'))
+
+    def test_confirmar_quita_tudo_de_uma_vez(self):
+        assinatura = self._plano(self.adm)['assinatura']
+        abertas = ParticipanteConta.objects.exclude(status_pagamento=ParticipanteConta.StatusPagamento.PAGO)
+
+        # Só o ADM confirma, e só o plano que ainda vale
+        self.client.force_login(self.ana)
+        self.client.post(reverse('gestao:confirmar_acerto'), {'assinatura': assinatura})
+        self.client.force_login(self.adm)
+        response = self.client.post(reverse('gestao:confirmar_acerto'), {'assinatura': 'velha'}, follow=True)
+        self.assertContains(response, 'Os saldos mudaram')
+        self.assertEqual(abertas.count(), 5)
+
+        response = self.client.post(
+            reverse('gestao:confirmar_acerto'), {'assinatura': assinatura}, HTTP_ACCEPT='application/json',
+        )
+        # Inclusive a parte de cada responsável na própria conta: as contas fecham
+        self.assertEqual(response.json(), {'quitadas': 5})
+        self.assertEqual(abertas.count(), 0)
+        for conta in Conta.objects.all():
+            self.assertEqual(conta.status_conta, Conta.StatusConta.PAGA)
+            self.assertIsNotNone(conta.quitada_em)
+        self.assertFalse(Saldo.objects.filter(valor_devido__gt=0).exists())
+        self.assertFalse(SaldoMorador.objects.exclude(total_devido=0, total_a_receber=0).exists())
+        self.assertEqual(Conta.objects.get(nome_conta='Luz').qtd_pagos, 2)
+        self.assertEqual(self._plano(self.bia)['transferencias'], [])
+        self.assertEqual(
+            Tarefa.objects.get(argumentos__tipo=eventos.ACERTO_CONFIRMADO).argumentos['usuarios'],
+            [self.ana.pk, self.bia.pk],
+        )
+
+        # O livro-razão bate com a reconstrução
+        saldos.reconstruir([self.republica.pk])
+        self.assertFalse(Saldo.objects.exists())
+
+
+class AuditoriaTest(TestCase):
+    """ Registro de transições (gestao.auditoria): um evento por mudança e o replay a partir dele. """
+
+    def setUp(self):
+        cache.clear()
+        self.adm = Usuario.objects.create_user(username='adm')
+        self.republica = Republica.objects.create(nome='Galo', adm=self.adm)
+        self.adm.republica = self.republica
+        self.adm.status_associacao = Usuario.StatusAssociacao.APROVADO
+        self.adm.save()
+        self.ana = Usuario.objects.create_user(
+            username='ana', republica=self.republica, status_associacao=Usuario.StatusAssociacao.APROVADO,
+        )
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:conta_nova'), {
+            'nome_conta': 'Aluguel', 'valor_total': '90.00', 'data_vencimento': date.today().isoformat(),
+            'tipo': Conta.TipoConta.FIXA, 'participantes': [self.ana.pk],
+        })
+        self.participacao = ParticipanteConta.objects.get(usuario=self.ana)
+
+    def _saldos(self):
+        return (
+            sorted(Saldo.objects.values_list('devedor_id', 'credor_id', 'valor_devido', 'valor_em_confirmacao')),
+            sorted(SaldoMorador.objects.values_list('usuario_id', 'total_devido', 'total_a_receber')),
+        )
+
+    def test_cada_transicao_vira_um_evento(self):
+        Estado = EventoTransicao.Estado
+        self.client.force_login(self.ana)
+        self.client.post(reverse('gestao:marcar_pago', args=[self.participacao.pk]))
+        self.client.post(reverse('gestao:marcar_pago', args=[self.participacao.pk])) # Repetido: não muda nada
+
+        eventos_da_ana = EventoTransicao.objects.filter(participacao_id=self.participacao.pk).order_by('id')
+        self.assertEqual(
+            list(eventos_da_ana.values_list('de', 'para', 'ator_id', 'responsavel_id', 'valor')),
+            [
+                (Estado.INEXISTENTE, Estado.NAO_PAGO, self.adm.pk, self.adm.pk, Decimal('45.00')),
+                (Estado.NAO_PAGO, Estado.CONFIRMACAO_PENDENTE, self.ana.pk, self.adm.pk, Decimal('45.00')),
+            ],
+        )
+
+        # Pedido de entrada e aprovação ficam no registro de membresia
+        novato = Usuario.objects.create_user(username='novato')
+        self.client.force_login(novato)
+        self.client.post(reverse('gestao:solicitar_entrada', args=[self.republica.pk]))
+        self.client.force_login(self.adm)
+        self.client.post(reverse('gestao:aprovar_morador', args=[novato.pk]))
+        self.assertEqual(
+            list(EventoTransicao.objects.filter(tipo=EventoTransicao.Tipo.MEMBRESIA).values_list('de', 'para', 'ator_id')),
+            [
+                (Estado.INEXISTENTE, Estado.AGUARDANDO_APROVACAO, novato.pk),
+                (Estado.AGUARDANDO_APROVACAO, Estado.APROVADO, self.adm.pk),
+            ],
+        )
+
+        # Só de inclusão
+        evento = eventos_da_ana.first()
+        with self.assertRaises(ValueError):
+            evento.save()
+        with self.assertRaises(ValueError):
+            evento.delete()
+
+    def test_ids_do_registro_tem_a_largura_dos_pks(self):
+        origens = {
+            'republica_id': Republica, 'usuario_id': Usuario, 'participacao_id': ParticipanteConta,
+            'conta_id': Conta, 'responsavel_id': Usuario, 'ator_id': Usuario,
+        }
+        for campo, modelo in origens.items():
+            with self.subTest(campo=campo):
+                self.assertEqual(
+                    EventoTransicao._meta.get_field(campo).db_type(connection),
+                    modelo._meta.pk.rel_db_type(connection),
+                )
+
+    def test_replay_refaz_saldos_resumos_e_relatorios(self):
+        self.client.force_login(self.ana)
+        self.client.post(reverse('gestao:marcar_pago', args=[self.participacao.pk]))
+        tarefas.processar() # Relatórios
+        esperado = self._saldos()
+        resumos = list(ResumoMensal.objects.values_list('republica_id', 'competencia', 'valor_total'))
+        self.assertTrue(resumos)
+
+        # Um status mexido por fora do app e as tabelas derivadas apagadas
+        ParticipanteConta.objects.filter(pk=self.participacao.pk).update(
+            status_pagamento=ParticipanteConta.StatusPagamento.PAGO,
+        )
+        Saldo.objects.all().delete()
+        SaldoMorador.objects.all().delete()
+        ResumoMensal.objects.all().delete()
+
+        saida = io.StringIO()
+        call_command('replay_eventos', '--dry-run', stdout=saida)
+        self.assertIn('1 divergentes', saida.getvalue())
+        self.assertFalse(Saldo.objects.exists())
+
+        call_command('replay_eventos', '--lote', '1', stdout=io.StringIO())
+        self.participacao.refresh_from_db()
+        self.assertEqual(self.participacao.status_pagamento, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE)
+        self.assertEqual(self._saldos(), esperado)
+        self.assertEqual(list(ResumoMensal.objects.values_list('republica_id', 'competencia', 'valor_total')), resumos)
+        self.assertEqual(Conta.objects.get().qtd_nao_pagos, 2)
+
+    def test_replay_depois_do_acerto_e_recusa_registro_incompleto(self):
+        self.client.force_login(self.adm)
+        assinatura = self.client.get(reverse('gestao:api_acerto')).json()['assinatura']
+        self.client.post(reverse('gestao:confirmar_acerto'), {'assinatura': assinatura})
+        self.assertEqual(
+            EventoTransicao.objects.filter(participacao_id=self.participacao.pk).latest('id').para,
+            EventoTransicao.Estado.PAGO,
+        )
+        self.assertEqual(auditoria.replay()['divergentes'], 0)
+        self.assertEqual(self._saldos(), ([], [])) # Como 'saldos.reconstruir', sem as linhas zeradas
+
+        # Arquivada, a conta sai do replay com um evento por participação
+        arquivo.arquivar(timezone.now() + timedelta(days=1))
+        ultimo = EventoTransicao.objects.filter(participacao_id=self.participacao.pk).latest('id')
+        self.assertEqual((ultimo.de, ultimo.para), (EventoTransicao.Estado.PAGO, EventoTransicao.Estado.INEXISTENTE))
+        resultado = auditoria.replay()
+        self.assertEqual((resultado['participacoes'], resultado['divergentes'], resultado['contas']), (0, 0, 0))
+        self.assertEqual(ParticipanteArquivado.objects.count(), 2)
+        self.assertEqual(self._saldos(), ([], []))
+
+        # Uma participação criada sem evento sumiria dos saldos: o replay não roda
+        conta = Conta.objects.create(
+            republica=self.republica, nome_conta='Luz', valor_total=1, data_vencimento=date.today(), responsavel=self.adm,
+        )
+        ParticipanteConta.objects.create(conta=conta, usuario=self.adm, valor_individual=1)
+        with self.assertRaises(CommandError):
+            call_command('replay_eventos', stdout=io.StringIO())
@@ -0,0 +1,225 @@
+"""
+Mudanças de status (pagar, confirmar/rejeitar pagamentos, aprovar moradores,
+quitar o acerto de contas).
+
+Toda mudança é feita com UM UPDATE cujo WHERE já tem a checagem de
+permissão e o status esperado, por exemplo:
+
+    UPDATE participanteconta SET status_pagamento = 'PAGO', versao = versao + 1
+    WHERE id IN (...) AND status_pagamento = 'CONFIRMACAO_PENDENTE'
+      AND conta.responsavel_id = <eu>
+
+Assim dois cliques ao mesmo tempo (ou um formulário enviado duas vezes)
+não se sobrescrevem: o segundo UPDATE não encontra mais a linha no status
+esperado e não muda nada. 'mudar_pagamento' faz isso para uma participação
+(views de uma linha) e ainda aceita a 'versao' que o formulário viu; as
+funções em lote retornam quantos ids caíram em cada resultado (RESULTADOS).
+
+Cada mudança aplicada grava os eventos dela no registro de transições
+(gestao.auditoria) na mesma transação, com quem fez a mudança ('ator').
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import acerto, auditoria, cache, eventos, saldos
+from .models import Conta, ParticipanteConta, Republica, Saldo, SaldoMorador, Usuario
+
+APLICADOS = 'aplicados'
+SEM_PERMISSAO = 'sem_permissao'
+STATUS_INVALIDO = 'status_invalido'
+INEXISTENTES = 'inexistentes'
+RESULTADOS = (APLICADOS, SEM_PERMISSAO, STATUS_INVALIDO, INEXISTENTES)
+
+IDS_POR_UPDATE = 1000 # Fica longe do limite de parâmetros por query do SQLite
+
+
+def ler_ids(valores):
+    """ Converte os ids recebidos; o que não é número conta como inexistente. """
+    ids = set()
+    invalidos = 0
+    for valor in valores:
+        try:
+            ids.add(int(valor))
+        except (TypeError, ValueError):
+            invalidos += 1
+    return ids, invalidos
+
+
+def ler_versao(valor):
+    """ A versão enviada pelo formulário, ou None se não veio (ou não é número). """
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def mudar_pagamento(participacao, de, para, versao=None, ator_id=None, **condicoes):
+    """
+    Leva 'participacao' de 'de' para 'para' se ela ainda estiver em 'de' (e na
+    'versao', se informada) e atender 'condicoes' (filtros de permissão, ex:
+    usuario=eu). Retorna True se mudou; False se outra requisição chegou antes.
+    Saldos, resumo da conta, cache e registro só são atualizados quando mudou.
+    """
+    filtro = {'pk': participacao.pk, 'status_pagamento': de, **condicoes}
+    if versao is not None:
+        filtro['versao'] = versao
+    with transaction.atomic():
+        if not ParticipanteConta.objects.filter(**filtro).update(status_pagamento=para, versao=F('versao') + 1):
+            return False
+        conta = participacao.conta
+        saldos.registrar([saldos.movimento(participacao, de, para)])
+        auditoria.registrar([auditoria.de_participacao(participacao, de, para)], ator_id)
+        Conta.atualizar_resumo([participacao.conta_id])
+        cache.invalidar_usuarios([participacao.usuario_id, conta.responsavel_id])
+        eventos.publicar([eventos.pagamento(
+            conta.republica_id, participacao.pk, participacao.usuario_id, participacao.usuario.username,
+            conta.responsavel_id, conta.nome_conta, participacao.valor_individual, de, para,
+        )])
+    participacao.status_pagamento = para
+    return True
+
+
+def _contagem():
+    return dict.fromkeys(RESULTADOS, 0)
+
+
+def mudar_pagamentos(responsavel, ids, novo_status):
+    """
+    Leva as participações 'ids' de CONFIRMACAO_PENDENTE para 'novo_status'
+    (PAGO para confirmar, NAO_PAGO para rejeitar). Só vale para contas em
+    que 'responsavel' é o responsável.
+    """
+    pendente = ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE
+    resultado = _contagem()
+
+    with transaction.atomic():
+        linhas = ParticipanteConta.objects.select_for_update().filter(pk__in=ids).values(
+            'id', 'conta_id', 'usuario_id', 'valor_individual', 'status_pagamento',
+            'conta__republica_id', 'conta__responsavel_id', 'conta__nome_conta', 'usuario__username',
+        )
+        aptas = []
+        for linha in linhas:
+            if linha['conta__responsavel_id'] != responsavel.pk:
+                resultado[SEM_PERMISSAO] += 1
+            elif linha['status_pagamento'] != pendente:
+                resultado[STATUS_INVALIDO] += 1
+            else:
+                aptas.append(linha)
+        resultado[INEXISTENTES] = len(ids) - sum(resultado.values()) - len(aptas)
+        if not aptas:
+            return resultado
+
+        resultado[APLICADOS] = ParticipanteConta.objects.filter(
+            pk__in=[linha['id'] for linha in aptas],
+            status_pagamento=pendente,
+            conta__responsavel=responsavel,
+        ).update(status_pagamento=novo_status, versao=F('versao') + 1)
+
+        saldos.registrar(
+            (linha['conta__republica_id'], linha['usuario_id'], responsavel.pk,
+             linha['valor_individual'], pendente, novo_status)
+            for linha in aptas
+        )
+        auditoria.registrar((
+            auditoria.pagamento(
+                linha['id'], linha['conta_id'], linha['conta__republica_id'], linha['usuario_id'],
+                responsavel.pk, linha['valor_individual'], pendente, novo_status,
+            )
+            for linha in aptas
+        ), responsavel.pk)
+        Conta.atualizar_resumo(linha['conta_id'] for linha in aptas)
+        cache.invalidar_usuarios([responsavel.pk, *(linha['usuario_id'] for linha in aptas)])
+        eventos.publicar(
+            eventos.pagamento(
+                linha['conta__republica_id'], linha['id'], linha['usuario_id'], linha['usuario__username'],
+                responsavel.pk, linha['conta__nome_conta'], linha['valor_individual'], pendente, novo_status,
+            )
+            for linha in aptas
+        )
+    return resultado
+
+
+def aprovar_moradores(adm, ids):
+    """ Aprova as solicitações de entrada 'ids' na república de que 'adm' é ADM. """
+    aguardando = Usuario.StatusAssociacao.AGUARDANDO_APROVACAO
+    resultado = _contagem()
+
+    with transaction.atomic():
+        linhas = Usuario.objects.select_for_update().filter(pk__in=ids).values(
+            'id', 'status_associacao', 'republica_id', 'republica__nome', 'republica__adm_id',
+        )
+        aptos = []
+        for linha in linhas:
+            if linha['republica__adm_id'] != adm.pk:
+                resultado[SEM_PERMISSAO] += 1
+            elif linha['status_associacao'] != aguardando:
+                resultado[STATUS_INVALIDO] += 1
+            else:
+                aptos.append(linha)
+        resultado[INEXISTENTES] = len(ids) - sum(resultado.values()) - len(aptos)
+        if not aptos:
+            return resultado
+
+        resultado[APLICADOS] = Usuario.objects.filter(
+            pk__in=[linha['id'] for linha in aptos], status_associacao=aguardando, republica__adm=adm,
+        ).update(status_associacao=Usuario.StatusAssociacao.APROVADO)
+        auditoria.registrar((
+            auditoria.membresia(linha['id'], linha['republica_id'], aguardando, Usuario.StatusAssociacao.APROVADO)
+            for linha in aptos
+        ), adm.pk)
+        # A membresia de todos da república muda (gestao.permissoes)
+        cache.invalidar_republica(adm.republica_id)
+        eventos.publicar(
+            eventos.morador_aprovado(linha['republica_id'], linha['republica__nome'], linha['id'])
+            for linha in aptos
+        )
+    return resultado
+
+
+def quitar_acerto(adm, republica_id, assinatura):
+    """
+    Confirma o plano de acerto (gestao.acerto) que o ADM viu: as
+    transferências foram feitas, então todas as participações em aberto da
+    república viram PAGO, inclusive a parte de cada responsável na própria
+    conta (não entra nos saldos, mas o acerto fecha a conta inteira: ela
+    fica PAGA e pode ser arquivada). Só aplica se 'adm' ainda é o ADM
+    e os saldos ainda são os do plano ('assinatura'). Retorna quantas
+    participações quitou, ou None se não pôde aplicar.
+    """
+    pago = ParticipanteConta.StatusPagamento.PAGO
+    abertos = [ParticipanteConta.StatusPagamento.NAO_PAGO, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE]
+
+    with transaction.atomic():
+        republica = Republica.objects.filter(pk=republica_id, adm=adm).values_list('nome', flat=True).first()
+        # Trava os saldos: um pagamento no meio muda a assinatura ou espera o acerto terminar
+        if republica is None or acerto.calcular(republica_id, travar=True).assinatura != assinatura:
+            return None
+
+        linhas = list(ParticipanteConta.objects.select_for_update().filter(
+            conta__republica_id=republica_id, status_pagamento__in=abertos,
+        ).values_list(
+            'id', 'conta_id', 'usuario_id', 'conta__responsavel_id', 'valor_individual', 'status_pagamento',
+        ))
+        if not linhas:
+            return 0
+        ids = [linha[0] for linha in linhas]
+        for inicio in range(0, len(ids), IDS_POR_UPDATE):
+            ParticipanteConta.objects.filter(
+                pk__in=ids[inicio:inicio + IDS_POR_UPDATE], status_pagamento__in=abertos,
+            ).update(status_pagamento=pago, versao=F('versao') + 1)
+
+        # Sem participação em aberto, todos os saldos da república zeram: dois
+        # UPDATEs no lugar de um 'saldos.registrar' por par devedor/credor
+        Saldo.objects.filter(republica_id=republica_id).update(valor_devido=0, valor_em_confirmacao=0)
+        SaldoMorador.objects.filter(republica_id=republica_id).update(total_devido=0, total_a_receber=0)
+        acerto.invalidar([republica_id])
+        auditoria.registrar((
+            auditoria.pagamento(pk, conta_id, republica_id, usuario_id, responsavel_id, valor, status, pago)
+            for pk, conta_id, usuario_id, responsavel_id, valor, status in linhas
+        ), adm.pk)
+
+        Conta.atualizar_resumo(linha[1] for linha in linhas)
+        envolvidos = {usuario_id for linha in linhas for usuario_id in linha[2:4]}
+        cache.invalidar_usuarios(envolvidos)
+        eventos.publicar([eventos.acerto_confirmado(republica_id, republica, adm.pk, envolvidos)])
+    return len(linhas)
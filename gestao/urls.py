@@ -12,7 +12,18 @@ from .views import (
     ConfirmarPagamentoView,
     RejeitarPagamentoView,
     ContaDeleteView,
-    RemoverMoradorView
+    RemoverMoradorView,
+    DashboardApiView,
+    AprovarMoradoresView,
+    ConfirmarPagamentosView,
+    RejeitarPagamentosView,
+    ConfirmarAcertoView,
+    AcertoApiView,
+    HistoricoView,
+    RelatoriosView,
+    ExtratoCsvView,
+    MetricasView,
+    EventosView,
 )
 
 app_name = 'gestao'
@@ -30,4 +41,16 @@ urlpatterns = [
     path('rejeitar-pagamento/<int:pk>/', RejeitarPagamentoView.as_view(), name='rejeitar_pagamento'),
     path('conta/deletar/<int:pk>/', ContaDeleteView.as_view(), name='conta_delete'),
     path('remover-morador/<int:pk>/', RemoverMoradorView.as_view(), name='remover_morador'),
+    path('aprovar-moradores/', AprovarMoradoresView.as_view(), name='aprovar_moradores'),
+    path('confirmar-pagamentos/', ConfirmarPagamentosView.as_view(), name='confirmar_pagamentos'),
+    path('rejeitar-pagamentos/', RejeitarPagamentosView.as_view(), name='rejeitar_pagamentos'),
+    path('confirmar-acerto/', ConfirmarAcertoView.as_view(), name='confirmar_acerto'),
+    path('historico/', HistoricoView.as_view(), name='historico'),
+    path('relatorios/', RelatoriosView.as_view(), name='relatorios'),
+    path('relatorios/extrato.csv', ExtratoCsvView.as_view(), name='extrato_csv'),
+    path('metricas/', MetricasView.as_view(), name='metricas'),
+    path('api/dashboard/', DashboardApiView.as_view(), name='api_dashboard'),
+    path('api/dashboard/<str:secao>/', DashboardApiView.as_view(), name='api_dashboard_secao'),
+    path('api/acerto/', AcertoApiView.as_view(), name='api_acerto'),
+    path('eventos/', EventosView.as_view(), name='eventos'),
 ]
\ No newline at end of file
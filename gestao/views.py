@@ -1,14 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.generic import ListView, CreateView, View , DeleteView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import ListView, CreateView, View , DeleteView, TemplateView
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.contrib import messages 
-from .models import Conta, ParticipanteConta, Republica, Usuario
+from .models import Conta, ContaRecorrente, ParticipanteConta, Republica, ResumoMensal, Usuario
 from .forms import CustomUserCreationForm ,ContaCreateForm
-from datetime import date
 from django.db.models import Q 
 from django.contrib.auth import logout
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from . import acerto, api, arquivo, auditoria, busca, cache, eventos, metricas, permissoes, rateio, relatorios, saldos, transicoes
+from .paginacao import CursorInvalido, apaginar
+from .recorrencia import competencia_de
+from datetime import date
 
 class RegisterView(CreateView):
     form_class = CustomUserCreationForm
@@ -16,84 +22,66 @@ class RegisterView(CreateView):
     template_name = 'registration/register.html'
 
 
-class DashboardView(LoginRequiredMixin, ListView):
-    model = ParticipanteConta
-    template_name = 'gestao/dashboard.html'
-    context_object_name = 'lista_pendencias'
+class LoginRequiredAsyncMixin(AccessMixin):
+    """
+    LoginRequiredMixin para views async. O usuário vem de 'request.auser()'
+    (ORM async) e fica em 'request.user', para o resto da view e os
+    templates não dispararem query síncrona dentro do event loop.
+    """
 
-    def get_queryset(self):
-        """
-        MUDANÇA: Busca TODAS as participações do usuário,
-        e não apenas as 'NAO_PAGO'.
-        Ordena por status e depois por vencimento.
-        """
-        queryset = ParticipanteConta.objects.filter(
-            usuario=self.request.user
-        ).select_related('conta').order_by('status_pagamento', 'conta__data_vencimento')
-        # 'status_pagamento' vai ordenar 'CONFIRMACAO_PENDENTE' e 'NAO_PAGO' primeiro
-        
-        return queryset
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        """ Adiciona dados extras ao template """
-        context = super().get_context_data(**kwargs)
-        context['hoje'] = date.today()
-        
-        user = self.request.user
 
-        # Painel do ADM (aprovar novos moradores)
-        if user.republica and user == user.republica.adm:
-            solicitacoes = Usuario.objects.filter(
-                republica=user.republica,
-                status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO
-            )
-            context['lista_solicitacoes'] = solicitacoes
-
-            # Busca moradores ATUAIS (aprovados)
-            moradores_atuais = Usuario.objects.filter(
-                republica=user.republica,
-                status_associacao=Usuario.StatusAssociacao.APROVADO
-            ).order_by('username')
-            context['lista_moradores'] = moradores_atuais
-
-        # Painel do RESPONSÁVEL (confirmar pagamentos)
-        # Busca todas as participações onde:
-        # 1. O status é 'CONFIRMACAO_PENDENTE'
-        # 2. O usuário logado (user) é o 'responsavel' da conta associada
-        confirmacoes_pendentes = ParticipanteConta.objects.filter(
-            status_pagamento=ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE,
-            conta__responsavel=user
-        ).select_related('usuario', 'conta')
-        # .select_related() é para performance, para buscar dados do usuário e da conta
-        
-        context['lista_confirmacoes_pendentes'] = confirmacoes_pendentes
+class DashboardView(LoginRequiredAsyncMixin, TemplateView):
+    template_name = 'gestao/dashboard.html'
 
-        return context
+    async def get(self, request, *args, **kwargs):
+        """
+        Os fragmentos vêm do cache por usuário (gestao.cache). Quando não
+        estão lá, 'acarregar_dashboard' monta tudo com um número fixo de queries.
+        O plano de acerto é da república inteira e muda com o saldo de
+        qualquer morador, então tem o cache próprio (gestao.acerto).
+        """
+        try:
+            contexto = await cache.adashboard(request)
+        except CursorInvalido:
+            # Link velho ou adulterado: volta para a primeira página
+            messages.warning(request, 'Página inválida, mostrando o início da lista.')
+            return redirect('gestao:dashboard')
+        if request.user.republica_id and request.user.status_associacao == Usuario.StatusAssociacao.APROVADO:
+            contexto['plano_acerto'] = await acerto.aplano(request.user.republica_id)
+        return self.render_to_response(self.get_context_data(**kwargs, **contexto))
 
 
 class MarcarComoPagoView(LoginRequiredMixin, View):
     
     def post(self, request, *args, **kwargs):
         pk_participacao = self.kwargs.get('pk')
-        participacao = get_object_or_404(ParticipanteConta, pk=pk_participacao)
+        participacao = get_object_or_404(ParticipanteConta.objects.select_related('conta', 'usuario'), pk=pk_participacao)
 
-        if participacao.usuario != request.user:
+        if participacao.usuario_id != request.user.pk:
             messages.error(request, 'Acesso não autorizado.')
             return redirect('gestao:dashboard')
 
-        if participacao.status_pagamento == 'NAO_PAGO':
-            
-            # O usuário logado é o responsável (dono) da conta?
-            if request.user == participacao.conta.responsavel:
-                participacao.status_pagamento = ParticipanteConta.StatusPagamento.PAGO
-                participacao.save()
-                messages.success(request, 'Seu pagamento (como responsável) foi confirmado.')
-            else:
-                # Se não for o dono, entra na fila de confirmação
-                participacao.status_pagamento = ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE
-                participacao.save()
-                messages.success(request, 'Pagamento marcado! Aguardando confirmação do responsável.')
-        
+        # O usuário logado é o responsável (dono) da conta?
+        if request.user.pk == participacao.conta.responsavel_id:
+            novo_status = ParticipanteConta.StatusPagamento.PAGO
+            mensagem = 'Seu pagamento (como responsável) foi confirmado.'
+        else:
+            # Se não for o dono, entra na fila de confirmação
+            novo_status = ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE
+            mensagem = 'Pagamento marcado! Aguardando confirmação do responsável.'
+
+        # Só muda se ainda estiver NAO_PAGO (um segundo clique não faz nada)
+        if transicoes.mudar_pagamento(
+            participacao, ParticipanteConta.StatusPagamento.NAO_PAGO, novo_status,
+            versao=transicoes.ler_versao(request.POST.get('versao')), ator_id=request.user.pk, usuario=request.user,
+        ):
+            messages.success(request, mensagem)
         else:
             messages.warning(request, 'Esta ação não pôde ser executada.')
 
@@ -105,6 +93,7 @@ class RepublicaCreateView(LoginRequiredMixin, CreateView):
     template_name = 'gestao/republica_form.html'
     success_url = reverse_lazy('gestao:dashboard') # Volta para a dashboard
 
+    @transaction.atomic
     def form_valid(self, form):
         # 1. Antes de salvar, define o usuário logado como ADM
         form.instance.adm = self.request.user
@@ -117,43 +106,55 @@ class RepublicaCreateView(LoginRequiredMixin, CreateView):
         user = self.request.user
         user.republica = self.object # 'self.object' é a república recém-criada
         user.status_associacao = Usuario.StatusAssociacao.APROVADO
-        user.save()
+        user.save(update_fields=['republica', 'status_associacao'])
+        auditoria.registrar(
+            [auditoria.membresia(user.pk, self.object.pk, None, Usuario.StatusAssociacao.APROVADO)], user.pk,
+        )
+        cache.invalidar_usuarios([user.pk])
         
         messages.success(self.request, f'República "{self.object.nome}" criada com sucesso!')
         return response
 
     def get(self, request, *args, **kwargs):
         # Se o usuário já tem uma república, não pode criar outra
-        if request.user.republica:
+        if request.user.republica_id:
             messages.error(request, 'Você já faz parte de uma república.')
             return redirect('gestao:dashboard')
         return super().get(request, *args, **kwargs)
     
 
-class RepublicaListView(LoginRequiredMixin, ListView):
+class RepublicaListView(LoginRequiredAsyncMixin, ListView):
     model = Republica
     template_name = 'gestao/republica_list.html'
     context_object_name = 'republicas'
-    paginate_by = 10
+    por_pagina = 10 # Paginação por cursor (gestao.paginacao), sem COUNT nem OFFSET
 
     def get_queryset(self):
         # Pega o parâmetro 'q' da URL (ex: /republicas/?q=Galo)
         query = self.request.GET.get('q')
         
-        # Filtra apenas por repúblicas que tenham um nome parecido
+        # Filtra apenas por repúblicas que tenham um nome parecido,
+        # das mais para as menos parecidas (ignora acentos e erros pequenos)
         if query:
-            object_list = Republica.objects.filter(nome__icontains=query)
-        else:
-            object_list = Republica.objects.all()
-            
-        return object_list.order_by('nome')
+            return busca.buscar(query).select_related('adm')
 
-    def get(self, request, *args, **kwargs):
+        return Republica.objects.select_related('adm')
+
+    async def get(self, request, *args, **kwargs):
         # Se o usuário já tem uma república, não pode procurar outra
-        if request.user.republica:
+        if request.user.republica_id:
             messages.error(request, 'Você já faz parte de uma república.')
             return redirect('gestao:dashboard')
-        return super().get(request, *args, **kwargs)
+
+        self.object_list = self.get_queryset()
+        query = request.GET.get('q')
+        ordem = busca.ordem(query) if query else ('nome', 'id')
+        try:
+            pagina = await apaginar(self.object_list, ordem, request.GET.get('cursor'), self.por_pagina)
+        except CursorInvalido:
+            messages.warning(request, 'Página inválida, mostrando o início da lista.')
+            return redirect('gestao:republica_list')
+        return self.render_to_response(self.get_context_data(object_list=pagina, proximo=pagina.proximo))
 
 
 # Processar a solicitação de entrada
@@ -165,14 +166,24 @@ class SolicitarEntradaRepublicaView(LoginRequiredMixin, View):
         user = request.user
         
         # não pode solicitar se já está em uma
-        if user.republica:
+        if user.republica_id:
             messages.error(request, 'Você já está em uma república.')
             return redirect('gestao:dashboard')
             
         # Atualiza o usuário, ligando-o à república e marcando como pendente
-        user.republica = republica
-        user.status_associacao = Usuario.StatusAssociacao.AGUARDANDO_APROVACAO
-        user.save()
+        with transaction.atomic():
+            user.republica = republica
+            user.status_associacao = Usuario.StatusAssociacao.AGUARDANDO_APROVACAO
+            user.save(update_fields=['republica', 'status_associacao'])
+            auditoria.registrar([auditoria.membresia(
+                user.pk, republica.pk, None, Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            )], user.pk)
+            # A membresia de todos da república muda (gestao.permissoes)
+            cache.invalidar_republica(republica.pk)
+            eventos.publicar([eventos.novo(
+                eventos.SOLICITACAO_ENTRADA, republica.pk, [republica.adm_id],
+                f'{user.username} pediu para entrar na república.', usuario_id=user.pk,
+            )])
         
         messages.success(request, f'Solicitação para entrar em "{republica.nome}" foi enviada ao administrador!')
         
@@ -185,24 +196,37 @@ class AprovarMoradorView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         # O 'pk' da URL é o ID do usuário que quer ser aprovado (o Alexandre)
         usuario_a_aprovar_pk = self.kwargs.get('pk')
-        usuario_a_aprovar = get_object_or_404(Usuario, pk=usuario_a_aprovar_pk)
-        
-        # O usuário logado (o Gustavo)
-        adm = request.user
+        # A república do usuário logado (o Gustavo) e quem mora ou pediu para entrar nela
+        membresia = permissoes.membresia(request)
 
-        # 1. O usuário a aprovar tem que estar ligado a uma república
-        # 2. O usuário logado (adm) tem que ser o ADM dessa república
-        if not usuario_a_aprovar.republica or adm != usuario_a_aprovar.republica.adm:
+        # O usuário a aprovar tem que estar ligado à república
+        # de que o usuário logado é o ADM
+        if not membresia.administra(usuario_a_aprovar_pk):
             messages.error(request, 'Você não tem permissão para esta ação.')
             return redirect('gestao:dashboard')
 
-        # Se tudo estiver ok, aprova o usuário
-        if usuario_a_aprovar.status_associacao == Usuario.StatusAssociacao.AGUARDANDO_APROVACAO:
-            usuario_a_aprovar.status_associacao = Usuario.StatusAssociacao.APROVADO
-            usuario_a_aprovar.save()
-            messages.success(request, f'{usuario_a_aprovar.username} foi aprovado na república!')
-        else:
+        # Se tudo estiver ok, aprova o usuário (só se ainda estiver aguardando)
+        if usuario_a_aprovar_pk not in membresia.pendentes:
             messages.warning(request, 'Este usuário não estava aguardando aprovação.')
+            return redirect('gestao:dashboard')
+        with transaction.atomic():
+            aprovado = Usuario.objects.filter(
+                pk=usuario_a_aprovar_pk, republica_id=membresia.republica_id,
+                status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            ).update(status_associacao=Usuario.StatusAssociacao.APROVADO)
+            if aprovado:
+                auditoria.registrar([auditoria.membresia(
+                    usuario_a_aprovar_pk, membresia.republica_id,
+                    Usuario.StatusAssociacao.AGUARDANDO_APROVACAO, Usuario.StatusAssociacao.APROVADO,
+                )], request.user.pk)
+                cache.invalidar_republica(membresia.republica_id)
+                eventos.publicar([eventos.morador_aprovado(
+                    membresia.republica_id, membresia.republica_nome, usuario_a_aprovar_pk,
+                )])
+        if aprovado:
+            messages.success(request, f'{membresia.username(usuario_a_aprovar_pk)} foi aprovado na república!')
+        else:
+            messages.warning(request, 'Esta ação não pôde ser executada.')
 
         return redirect('gestao:dashboard')
 
@@ -213,25 +237,35 @@ class RejeitarMoradorView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         # O 'pk' da URL é o ID do usuário a ser rejeitado
         usuario_a_rejeitar_pk = self.kwargs.get('pk')
-        usuario_a_rejeitar = get_object_or_404(Usuario, pk=usuario_a_rejeitar_pk)
-        
-        adm = request.user
+        membresia = permissoes.membresia(request)
 
-        if not usuario_a_rejeitar.republica or adm != usuario_a_rejeitar.republica.adm:
+        if not membresia.administra(usuario_a_rejeitar_pk):
             messages.error(request, 'Você não tem permissão para esta ação.')
             return redirect('gestao:dashboard')
 
         # Se ok, rejeita o usuário (desvincula ele da república)
-        if usuario_a_rejeitar.status_associacao == Usuario.StatusAssociacao.AGUARDANDO_APROVACAO:
-            republica_nome = usuario_a_rejeitar.republica.nome # Salva o nome para a msg
-            
-            usuario_a_rejeitar.status_associacao = Usuario.StatusAssociacao.NAO_APROVADO
-            usuario_a_rejeitar.republica = None # Desvincula da república
-            usuario_a_rejeitar.save()
-            
-            messages.warning(request, f'{usuario_a_rejeitar.username} foi rejeitado da república {republica_nome}.')
-        else:
+        if usuario_a_rejeitar_pk not in membresia.pendentes:
             messages.warning(request, 'Este usuário não estava aguardando aprovação.')
+            return redirect('gestao:dashboard')
+        with transaction.atomic():
+            rejeitado = Usuario.objects.filter(
+                pk=usuario_a_rejeitar_pk, republica_id=membresia.republica_id,
+                status_associacao=Usuario.StatusAssociacao.AGUARDANDO_APROVACAO,
+            ).update(status_associacao=Usuario.StatusAssociacao.NAO_APROVADO, republica=None)
+            if rejeitado:
+                auditoria.registrar([auditoria.membresia(
+                    usuario_a_rejeitar_pk, membresia.republica_id,
+                    Usuario.StatusAssociacao.AGUARDANDO_APROVACAO, Usuario.StatusAssociacao.NAO_APROVADO,
+                )], request.user.pk)
+                cache.invalidar_republica(membresia.republica_id)
+                cache.invalidar_usuarios([usuario_a_rejeitar_pk])
+        if rejeitado:
+            messages.warning(
+                request,
+                f'{membresia.username(usuario_a_rejeitar_pk)} foi rejeitado da república {membresia.republica_nome}.',
+            )
+        else:
+            messages.warning(request, 'Esta ação não pôde ser executada.')
 
         return redirect('gestao:dashboard')
     
@@ -249,36 +283,38 @@ class ContaCreateView(LoginRequiredMixin, CreateView):
         return kwargs
 
     def get(self, request, *args, **kwargs):
-        if not request.user.republica or request.user.status_associacao != 'APROVADO':
+        if not permissoes.membresia(request).eh_membro:
             messages.error(request, 'Você precisa ser um membro aprovado de uma república para criar contas.')
             return redirect('gestao:dashboard')
         return super().get(request, *args, **kwargs)
 
+    @transaction.atomic
     def form_valid(self, form):
         user = self.request.user
         
         form.instance.responsavel = user
-        form.instance.republica = user.republica
+        form.instance.republica_id = user.republica_id
         
         response = super().form_valid(form)
 
         nova_conta = self.object
         participantes_selecionados_do_form = form.cleaned_data['participantes']
         
-        # Pega o próprio usuário logado como um QuerySet
-        criador_como_queryset = Usuario.objects.filter(pk=user.pk)
+        # O criador sempre participa e vem primeiro (fica com os centavos
+        # que sobrarem da divisão), sem duplicatas.
+        participantes_finais = [user] + [
+            morador for morador in participantes_selecionados_do_form if morador.pk != user.pk
+        ]
         
-        # Isso garante que o criador esteja na lista, sem duplicatas.
-        participantes_finais = participantes_selecionados_do_form | criador_como_queryset
-        
-        total_participantes = participantes_finais.count()
+        total_participantes = len(participantes_finais)
         
         if total_participantes > 0:
-            # Divide o valor apenas entre os selecionados (e o criador)
-            valor_individual = nova_conta.valor_total / total_participantes
+            # Divide o valor apenas entre os selecionados (e o criador),
+            # em centavos exatos: a soma das partes fecha o valor total.
+            divisao = rateio.dividir(nova_conta.valor_total, participantes_finais)
             
             participantes_para_criar = []
-            for morador in participantes_finais:
+            for morador, valor_individual in divisao:
                 participantes_para_criar.append(
                     ParticipanteConta(
                         conta=nova_conta,
@@ -288,6 +324,31 @@ class ContaCreateView(LoginRequiredMixin, CreateView):
                 )
             
             ParticipanteConta.objects.bulk_create(participantes_para_criar)
+            saldos.registrar(
+                saldos.movimento(participacao, None, participacao.status_pagamento)
+                for participacao in participantes_para_criar
+            )
+            auditoria.registrar((
+                auditoria.de_participacao(participacao, None, participacao.status_pagamento)
+                for participacao in participantes_para_criar
+            ), user.pk)
+            Conta.atualizar_resumo([nova_conta.pk])
+            cache.invalidar_usuarios(morador.pk for morador in participantes_finais)
+            eventos.publicar([eventos.conta_criada(nova_conta, [morador.pk for morador in participantes_finais])])
+
+            if form.cleaned_data.get('repetir_mensalmente'):
+                # Cria a recorrência; esta conta já conta como a do mês atual
+                recorrencia = ContaRecorrente.objects.create(
+                    republica_id=nova_conta.republica_id,
+                    nome_conta=nova_conta.nome_conta,
+                    valor_total=nova_conta.valor_total,
+                    dia_vencimento=nova_conta.data_vencimento.day,
+                    responsavel=user,
+                )
+                recorrencia.participantes.set(participantes_finais)
+                nova_conta.recorrencia = recorrencia
+                nova_conta.competencia = competencia_de(nova_conta.data_vencimento)
+                nova_conta.save(update_fields=['recorrencia', 'competencia'])
             
             messages.success(self.request, f'Conta "{nova_conta.nome_conta}" criada para {total_participantes} participantes.')
         else:
@@ -300,19 +361,23 @@ class ConfirmarPagamentoView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         # 'pk' é o ID do 'ParticipanteConta' (a participação do Alexandre)
         participacao_pk = self.kwargs.get('pk')
-        participacao = get_object_or_404(ParticipanteConta, pk=participacao_pk)
+        participacao = get_object_or_404(
+            ParticipanteConta.objects.select_related('conta', 'usuario'), pk=participacao_pk,
+        )
         
         responsavel = request.user
 
         # O usuário logado é o 'responsavel' (dono) desta conta?
-        if participacao.conta.responsavel != responsavel:
+        if participacao.conta.responsavel_id != responsavel.pk:
             messages.error(request, 'Você não tem permissão para confirmar este pagamento.')
             return redirect('gestao:dashboard')
 
-        # Se for o dono, confirma o pagamento
-        if participacao.status_pagamento == ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE:
-            participacao.status_pagamento = ParticipanteConta.StatusPagamento.PAGO
-            participacao.save()
+        # Se for o dono e o pagamento ainda estiver pendente, confirma
+        if transicoes.mudar_pagamento(
+            participacao, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE, ParticipanteConta.StatusPagamento.PAGO,
+            versao=transicoes.ler_versao(request.POST.get('versao')), ator_id=responsavel.pk,
+            conta__responsavel=responsavel,
+        ):
             messages.success(request, f'Pagamento de {participacao.usuario.username} confirmado!')
         else:
             messages.warning(request, 'Esta ação não pôde ser executada.')
@@ -325,18 +390,22 @@ class RejeitarPagamentoView(LoginRequiredMixin, View):
 
     def post(self, request, *args, **kwargs):
         participacao_pk = self.kwargs.get('pk')
-        participacao = get_object_or_404(ParticipanteConta, pk=participacao_pk)
+        participacao = get_object_or_404(
+            ParticipanteConta.objects.select_related('conta', 'usuario'), pk=participacao_pk,
+        )
         responsavel = request.user
 
         # Mesma checagem de segurança
-        if participacao.conta.responsavel != responsavel:
+        if participacao.conta.responsavel_id != responsavel.pk:
             messages.error(request, 'Você não tem permissão para esta ação.')
             return redirect('gestao:dashboard')
 
         # Se for o dono, rejeita (volta para 'NAO_PAGO')
-        if participacao.status_pagamento == ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE:
-            participacao.status_pagamento = ParticipanteConta.StatusPagamento.NAO_PAGO
-            participacao.save()
+        if transicoes.mudar_pagamento(
+            participacao, ParticipanteConta.StatusPagamento.CONFIRMACAO_PENDENTE, ParticipanteConta.StatusPagamento.NAO_PAGO,
+            versao=transicoes.ler_versao(request.POST.get('versao')), ator_id=responsavel.pk,
+            conta__responsavel=responsavel,
+        ):
             messages.warning(request, f'Pagamento de {participacao.usuario.username} rejeitado. O status voltou para "Não Pago".')
         else:
             messages.warning(request, 'Esta ação não pôde ser executada.')
@@ -357,9 +426,25 @@ class ContaDeleteView(LoginRequiredMixin, DeleteView):
         """
         return Conta.objects.filter(responsavel=self.request.user)
 
+    @transaction.atomic
     def form_valid(self, form):
+        # Tira as participações da conta do livro de saldos antes de deletar
+        conta = self.object
+        participacoes = list(conta.participantes.all())
+        saldos.registrar(
+            saldos.movimento(participacao, participacao.status_pagamento, None)
+            for participacao in participacoes
+        )
+        auditoria.registrar((
+            auditoria.de_participacao(participacao, participacao.status_pagamento, None)
+            for participacao in participacoes
+        ), self.request.user.pk)
+        cache.invalidar_usuarios([conta.responsavel_id] + [participacao.usuario_id for participacao in participacoes])
         messages.success(self.request, f"A conta '{self.object.nome_conta}' foi deletada com sucesso.")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # Depois de deletar, o mês dela nos relatórios fica sem a conta
+        ResumoMensal.agendar([(conta.republica_id, conta.data_vencimento.replace(day=1))])
+        return response
     
 
 class UsuarioDeleteView(LoginRequiredMixin, DeleteView):
@@ -388,7 +473,26 @@ class UsuarioDeleteView(LoginRequiredMixin, DeleteView):
             return redirect('gestao:dashboard')
         
         # 1. PRIMEIRO, deletamos o usuário do banco de dados
-        user.delete()
+        #    (as participações dele saem junto, então saem também dos saldos)
+        with transaction.atomic():
+            participacoes = list(ParticipanteConta.objects.filter(usuario=user).select_related('conta'))
+            saldos.registrar(
+                saldos.movimento(participacao, participacao.status_pagamento, None)
+                for participacao in participacoes
+            )
+            registro = [
+                auditoria.de_participacao(participacao, participacao.status_pagamento, None)
+                for participacao in participacoes
+            ]
+            if user.republica_id:
+                registro.append(auditoria.membresia(user.pk, user.republica_id, user.status_associacao, None))
+            auditoria.registrar(registro, user.pk)
+            # A membresia de todos da república muda (e o ADM vê a lista de moradores)
+            republica_id = user.republica_id
+            user.delete()
+            Conta.atualizar_resumo(participacao.conta_id for participacao in participacoes)
+            cache.invalidar_republica(republica_id)
+            cache.invalidar_usuarios(participacao.conta.responsavel_id for participacao in participacoes)
         
         # 2. SEGUNDO, fazemos o logout da sessão atual
         logout(request)
@@ -404,34 +508,285 @@ class RemoverMoradorView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         # 'pk' é o ID do usuário a ser removido
         morador_pk = self.kwargs.get('pk')
-        morador_a_remover = get_object_or_404(Usuario, pk=morador_pk)
-        
         # 'adm' é o usuário logado
         adm = request.user
+        membresia = permissoes.membresia(request)
 
         # O usuário logado é o ADM?
-        if not morador_a_remover.republica or morador_a_remover.republica.adm != adm:
+        if not membresia.administra(morador_pk):
             messages.error(request, 'Você não tem permissão para remover este usuário.')
             return redirect('gestao:dashboard')
 
         # O ADM está tentando se remover?
-        if adm == morador_a_remover:
+        if adm.pk == morador_pk:
             messages.error(request, 'Você não pode remover a si mesmo como administrador.')
             return redirect('gestao:dashboard')
             
         # O morador é responsável por alguma conta?
-        if morador_a_remover.contas_responsaveis.exists():
-            messages.error(request, f'{morador_a_remover.username} é responsável por uma ou mais contas. Delete essas contas primeiro antes de removê-lo.')
+        username = membresia.username(morador_pk)
+        if Conta.objects.filter(responsavel_id=morador_pk).exists():
+            messages.error(request, f'{username} é responsável por uma ou mais contas. Delete essas contas primeiro antes de removê-lo.')
             return redirect('gestao:dashboard')
 
         # Se passou por tudo, hora de remover.
-        # Primeiro, deletamos todas as participações dele em contas
-        ParticipanteConta.objects.filter(usuario=morador_a_remover).delete()
-        
-        # Agora, desvinculamos ele da república
-        morador_a_remover.republica = None
-        morador_a_remover.status_associacao = Usuario.StatusAssociacao.NAO_APROVADO
-        morador_a_remover.save()
+        with transaction.atomic():
+            # Desvincula ele da república, se ainda estiver nela
+            if not Usuario.objects.filter(pk=morador_pk, republica_id=membresia.republica_id).update(
+                republica=None, status_associacao=Usuario.StatusAssociacao.NAO_APROVADO,
+            ):
+                messages.warning(request, 'Esta ação não pôde ser executada.')
+                return redirect('gestao:dashboard')
+
+            # E deletamos todas as participações dele em contas
+            participacoes = list(ParticipanteConta.objects.filter(usuario_id=morador_pk).select_related('conta'))
+            saldos.registrar(
+                saldos.movimento(participacao, participacao.status_pagamento, None)
+                for participacao in participacoes
+            )
+            auditoria.registrar([
+                auditoria.membresia(
+                    morador_pk, membresia.republica_id, membresia.membros[morador_pk][2],
+                    Usuario.StatusAssociacao.NAO_APROVADO,
+                ),
+                *(auditoria.de_participacao(participacao, participacao.status_pagamento, None)
+                  for participacao in participacoes),
+            ], adm.pk)
+            ParticipanteConta.objects.filter(pk__in=[participacao.pk for participacao in participacoes]).delete()
+            Conta.atualizar_resumo(participacao.conta_id for participacao in participacoes)
+            cache.invalidar_republica(membresia.republica_id)
+            cache.invalidar_usuarios(
+                [morador_pk] + [participacao.conta.responsavel_id for participacao in participacoes]
+            )
         
-        messages.success(request, f'{morador_a_remover.username} foi removido da república.')
-        return redirect('gestao:dashboard')
\ No newline at end of file
+        messages.success(request, f'{username} foi removido da república.')
+        return redirect('gestao:dashboard')
+
+
+class HistoricoView(LoginRequiredMixin, TemplateView):
+    """ Todas as contas do usuário, inclusive as já arquivadas (gestao.arquivo). """
+    template_name = 'gestao/historico.html'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except CursorInvalido:
+            messages.warning(request, 'Página inválida, mostrando o início da lista.')
+            return redirect('gestao:historico')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['participacoes'] = arquivo.historico(self.request.user, self.request.GET.get('cursor'))
+        return context
+
+
+class MoradorAprovadoMixin:
+    """ Só deixa passar quem é morador aprovado de uma república. """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and (
+            not request.user.republica_id
+            or request.user.status_associacao != Usuario.StatusAssociacao.APROVADO
+        ):
+            messages.error(request, 'Você precisa fazer parte de uma república para ver os relatórios.')
+            return redirect('gestao:dashboard')
+        return super().dispatch(request, *args, **kwargs)
+
+
+class RelatoriosView(LoginRequiredMixin, MoradorAprovadoMixin, TemplateView):
+    """ Totais por mês, extrato do usuário e maiores despesas (gestao.relatorios). """
+    template_name = 'gestao/relatorios.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        republica_id = self.request.user.republica_id
+        try:
+            # ?mes=AAAA-MM escolhe o mês das maiores despesas
+            mes = date.fromisoformat(f"{self.request.GET['mes']}-01")
+        except (KeyError, ValueError):
+            mes = competencia_de(date.today())
+
+        context['totais_mensais'] = relatorios.totais_mensais(republica_id)
+        context['extrato'] = relatorios.extrato(self.request.user, republica_id)
+        context['mes'] = mes
+        context['maiores_despesas'] = relatorios.maiores_despesas(republica_id, mes)
+        context['tipos'] = Conta.TipoConta.choices
+        return context
+
+
+class ExtratoCsvView(LoginRequiredMixin, MoradorAprovadoMixin, View):
+    """ Todas as participações do usuário em CSV, gerado enquanto é enviado. """
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            relatorios.linhas_extrato_csv(request.user, request.user.republica_id),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="extrato-{request.user.username}.csv"'
+        return response
+
+
+class AcaoEmLoteView(LoginRequiredMixin, View):
+    """
+    Base das ações em lote: recebe 'ids' (vários valores) no POST e aplica a
+    transição de 'gestao.transicoes' de uma vez. Responde JSON com a contagem
+    por resultado se o cliente pedir (Accept: application/json); senão, volta
+    para a dashboard com uma mensagem.
+    """
+    mensagem = ''
+    # A transição (adm, ids, *argumentos) -> contagem por resultado
+    transicao = None
+    argumentos = ()
+
+    def post(self, request, *args, **kwargs):
+        ids, invalidos = transicoes.ler_ids(request.POST.getlist('ids'))
+        resultado = self.transicao(request.user, ids, *self.argumentos)
+        resultado[transicoes.INEXISTENTES] += invalidos
+
+        if request.get_preferred_type(['text/html', 'application/json']) == 'application/json':
+            return JsonResponse(resultado)
+
+        ignorados = sum(resultado.values()) - resultado[transicoes.APLICADOS]
+        if resultado[transicoes.APLICADOS]:
+            messages.success(request, self.mensagem.format(resultado[transicoes.APLICADOS]))
+        if ignorados:
+            messages.warning(request, f'{ignorados} item(ns) não puderam ser processados.')
+        return redirect('gestao:dashboard')
+
+
+class AprovarMoradoresView(AcaoEmLoteView):
+    mensagem = '{} morador(es) aprovado(s)!'
+    transicao = staticmethod(transicoes.aprovar_moradores)
+
+
+class ConfirmarPagamentosView(AcaoEmLoteView):
+    mensagem = '{} pagamento(s) confirmado(s)!'
+    transicao = staticmethod(transicoes.mudar_pagamentos)
+    argumentos = (ParticipanteConta.StatusPagamento.PAGO,)
+
+
+class RejeitarPagamentosView(AcaoEmLoteView):
+    mensagem = '{} pagamento(s) rejeitado(s). O status voltou para "Não Pago".'
+    transicao = staticmethod(transicoes.mudar_pagamentos)
+    argumentos = (ParticipanteConta.StatusPagamento.NAO_PAGO,)
+
+
+class ConfirmarAcertoView(LoginRequiredMixin, View):
+    """
+    O ADM confirma que as transferências do plano de acerto foram feitas e
+    as participações em aberto da república viram PAGO de uma vez. O POST
+    traz a 'assinatura' do plano que ele viu (gestao.acerto); se os saldos
+    mudaram desde então, nada é quitado. Responde JSON se o cliente pedir.
+    """
+
+    def post(self, request, *args, **kwargs):
+        json = request.get_preferred_type(['text/html', 'application/json']) == 'application/json'
+        membresia = permissoes.membresia(request)
+        if not membresia.eh_adm:
+            if json:
+                return JsonResponse({'erro': 'sem permissão'}, status=403)
+            messages.error(request, 'Você não tem permissão para esta ação.')
+            return redirect('gestao:dashboard')
+
+        quitadas = transicoes.quitar_acerto(request.user, membresia.republica_id, request.POST.get('assinatura', ''))
+        if json:
+            if quitadas is None:
+                return JsonResponse({'erro': 'plano desatualizado'}, status=409)
+            return JsonResponse({'quitadas': quitadas})
+
+        if quitadas is None:
+            messages.warning(request, 'Os saldos mudaram desde que o plano foi calculado. Confira o novo plano.')
+        else:
+            messages.success(request, f'Acerto confirmado! {quitadas} participação(ões) quitada(s).')
+        return redirect('gestao:dashboard')
+
+
+class DashboardApiView(LoginRequiredAsyncMixin, View):
+    """
+    Os dados da dashboard em JSON. Sem 'secao', devolve a primeira página
+    de tudo; com 'secao' ('pendencias' ou 'confirmacoes') e '?cursor=',
+    as páginas seguintes daquela lista.
+
+    Responde 304 (sem nenhuma query) quando o cliente manda o ETag atual
+    em If-None-Match.
+    """
+    raise_exception = True # API: 403 em vez de redirecionar para o login
+
+    async def get(self, request, *args, **kwargs):
+        etag = api.etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        try:
+            limite = max(1, min(int(request.GET.get('limite', api.LIMITE_PADRAO)), api.LIMITE_MAXIMO))
+        except ValueError:
+            return JsonResponse({'erro': 'limite inválido'}, status=400)
+
+        secao = self.kwargs.get('secao')
+        try:
+            if secao is None:
+                dados = await api.adashboard(request.user, limite)
+            elif secao in api.ASECOES:
+                dados = await api.ASECOES[secao](request.user, request.GET.get('cursor'), limite)
+            else:
+                return JsonResponse({'erro': 'seção desconhecida'}, status=404)
+        except CursorInvalido:
+            return JsonResponse({'erro': 'cursor inválido'}, status=400)
+
+        response = JsonResponse(dados, json_dumps_params={'separators': (',', ':')})
+        response['ETag'] = etag
+        # O cliente pode guardar, mas tem que revalidar (If-None-Match) sempre
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class AcertoApiView(LoginRequiredAsyncMixin, View):
+    """
+    O plano de acerto da república em JSON. Não tem ETag: ele muda com o
+    saldo de qualquer morador, não só com os dados do usuário ('versao_dados').
+    """
+    raise_exception = True
+
+    async def get(self, request, *args, **kwargs):
+        if not request.user.republica_id or request.user.status_associacao != Usuario.StatusAssociacao.APROVADO:
+            return JsonResponse({'erro': 'sem república'}, status=404)
+        response = JsonResponse(await api.aplano_de_acerto(request.user), json_dumps_params={'separators': (',', ':')})
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class MetricasView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """ Métricas por view (gestao.metricas) no formato texto do Prometheus. Só staff. """
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metricas.prometheus(metricas.coletar()), content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class EventosView(LoginRequiredAsyncMixin, View):
+    """
+    Server-Sent Events com as notificações do usuário (gestao.eventos): a
+    dashboard abre um EventSource aqui em vez de recarregar a página. No
+    ASGI o stream é async; no WSGI (runserver) ocupa uma thread por conexão.
+    """
+    raise_exception = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            ultimo_id = int(request.headers['Last-Event-ID'])
+        except (KeyError, ValueError):
+            ultimo_id = None
+        if isinstance(request, ASGIRequest):
+            conteudo = eventos.stream(request.user, ultimo_id)
+        else:
+            conteudo = eventos.stream_sincrono(request.user, ultimo_id)
+        response = StreamingHttpResponse(conteudo, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # nginx: não segurar o stream no buffer
+        return response